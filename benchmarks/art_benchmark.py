@@ -0,0 +1,134 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import argparse
+import logging
+import os
+import os.path
+import random
+import struct
+import tempfile
+import timeit
+from glob import glob
+
+from bloom import rff
+from bloom.tiles import art
+
+logging.basicConfig(
+    level="INFO",
+    format="%(asctime)s [%(levelname)s] %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+_TILES_PER_FILE = 256
+
+
+def _scan_for_art(art_files, tile_number: int):
+    for art_file in art_files:
+        if art_file.has_tile(tile_number):
+            return art_file
+    raise ValueError(f"Tile {tile_number} not available")
+
+
+def _scanned_lookups(art_files, tile_numbers):
+    for tile_number in tile_numbers:
+        _scan_for_art(art_files, tile_number).get_tile_dimensions(tile_number)
+        _scan_for_art(art_files, tile_number).get_tile_offsets(tile_number)
+        _scan_for_art(art_files, tile_number).get_tile_animation_data(tile_number)
+
+
+def _table_lookups(art_manager: art.ArtManager, tile_numbers):
+    for tile_number in tile_numbers:
+        art_manager.get_tile_dimensions(tile_number)
+        art_manager.get_tile_offsets(tile_number)
+        art_manager.get_tile_animation_data(tile_number)
+
+
+def _write_tile_set(directory: str, file_count: int):
+    with rff.RFFWriter(os.path.join(directory, "BLOOD.RFF")) as writer:
+        writer.add_entry("BLOOD.PAL", bytes(768))
+
+    for file_index in range(file_count):
+        sizes = [
+            (random.randint(1, 64), random.randint(1, 64))
+            for _ in range(_TILES_PER_FILE)
+        ]
+        tile_start = file_index * _TILES_PER_FILE
+        with open(os.path.join(directory, f"TILES{file_index:03}.ART"), "wb") as file:
+            file.write(
+                struct.pack("<4I", 1, 0, tile_start, tile_start + _TILES_PER_FILE - 1)
+            )
+            file.write(b"".join(struct.pack("<H", width) for width, _ in sizes))
+            file.write(b"".join(struct.pack("<H", height) for _, height in sizes))
+            file.write(bytes(4 * _TILES_PER_FILE))
+            file.write(bytes(sum(width * height for width, height in sizes)))
+
+
+def _benchmark(blood_path: str, lookups: int, repeat: int):
+    with rff.RFF(os.path.join(blood_path, "BLOOD.RFF")) as blood:
+        art_manager = art.ArtManager(
+            blood, sorted(glob(f"{blood_path}/*.[aA][rR][tT]"))
+        )
+        art_files = art_manager._art
+        tile_numbers = [
+            random.choice(art_manager.get_tile_indices()) for _ in range(lookups)
+        ]
+
+        scan_time = min(
+            timeit.repeat(
+                lambda: _scanned_lookups(art_files, tile_numbers),
+                number=1,
+                repeat=repeat,
+            )
+        )
+        table_time = min(
+            timeit.repeat(
+                lambda: _table_lookups(art_manager, tile_numbers),
+                number=1,
+                repeat=repeat,
+            )
+        )
+
+    logger.info(
+        f"{len(art_files)} ART files, {lookups} tiles: "
+        f"scan {scan_time * 1000:.2f}ms, table {table_time * 1000:.2f}ms "
+        f"({scan_time / table_time:.1f}x)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare scanning ART files with the picnum indexed tile table"
+    )
+    parser.add_argument(
+        "--blood-path",
+        help="Directory holding BLOOD.RFF and TILES0xx.ART, a synthetic set is used otherwise",
+    )
+    parser.add_argument(
+        "--files",
+        type=int,
+        default=18,
+        help="ART files to generate when no Blood directory is given",
+    )
+    parser.add_argument("--lookups", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    arguments = parser.parse_args()
+
+    if arguments.blood_path:
+        _benchmark(arguments.blood_path, arguments.lookups, arguments.repeat)
+        return
+
+    working_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            os.mkdir("cache")
+            _write_tile_set(directory, arguments.files)
+            _benchmark(directory, arguments.lookups, arguments.repeat)
+        finally:
+            os.chdir(working_directory)
+
+
+if __name__ == "__main__":
+    main()
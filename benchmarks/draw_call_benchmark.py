@@ -0,0 +1,121 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import argparse
+import logging
+import time
+import typing
+from unittest import mock
+
+import numpy
+from panda3d import core
+
+from bloom import constants, game_map
+from bloom.editor import map_objects, sector_geometry, undo_stack
+from bloom.tiles import manager
+
+logging.basicConfig(
+    level="INFO",
+    format="%(asctime)s [%(levelname)s] %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+_TILE_SIZES = [(64, 64), (128, 128), (32, 32), (64, 128), (256, 256), (128, 64)]
+
+
+class _SyntheticArtManager:
+    """Stands in for the ART files, which are not shipped with the editor."""
+
+    def __init__(self, *_):
+        pass
+
+    def get_tile_dimensions(self, picnum: int):
+        return _TILE_SIZES[picnum % len(_TILE_SIZES)]
+
+    def get_tile_offsets(self, picnum: int):
+        return (0, 0)
+
+    def get_tile_animation_data(self, picnum: int):
+        return mock.Mock(count=0)
+
+    def get_tile_variant_signature(self, picnum: int, lookup: int):
+        return bytes([lookup & 0xFF])
+
+    def load_tile_image(self, picnum: int, lookup: int):
+        width, height = self.get_tile_dimensions(picnum)
+        return numpy.zeros((height, width, 4), dtype=numpy.uint8)
+
+
+def _has_pending_tiles(scene: core.NodePath):
+    return any(
+        node_path.has_python_tag(manager.Manager._PENDING_TILE_TAG)
+        for node_path in scene.find_all_matches("**/+GeomNode")
+    )
+
+
+def _count_draw_calls(scene: core.NodePath):
+    draw_calls = 0
+    textures = set()
+    for node_path in scene.find_all_matches("**/+GeomNode"):
+        state = node_path.get_net_state()
+        texture_attrib = state.get_attrib(core.TextureAttrib)
+        if texture_attrib is None or texture_attrib.is_off():
+            continue
+
+        texture = texture_attrib.get_texture()
+        if texture is None:
+            continue
+
+        textures.add(texture)
+        draw_calls += node_path.node().get_num_geoms()
+    return draw_calls, len(textures)
+
+
+def _build_map(map_path: str, batched: bool):
+    with open(map_path, "rb") as file:
+        map_to_load, _ = game_map.Map.load(map_path, file.read())
+
+    scene = core.NodePath("scene")
+    with mock.patch.object(constants, "BATCHED_GEOMETRY", batched), mock.patch.object(
+        manager.art, "ArtManager", _SyntheticArtManager
+    ):
+        tile_manager = manager.Manager("", mock.Mock(), mock.MagicMock())
+        geometry_factory = sector_geometry.SectorGeometryFactory(scene, tile_manager)
+        sectors = map_objects.SectorCollection(
+            map_to_load,
+            mock.Mock(),
+            mock.Mock(),
+            geometry_factory,
+            mock.Mock(),
+            undo_stack.UndoStack(mock.Mock()),
+        )
+        for sector in sectors.sectors:
+            sector.show()
+            sector.reset_geometry_if_necessary()
+
+        # Bind every tile that was decoded in the background.
+        deadline = time.time() + 60
+        while _has_pending_tiles(scene) and time.time() < deadline:
+            tile_manager._process_loading_tiles()
+            time.sleep(0.001)
+        tile_manager.shutdown()
+
+    return _count_draw_calls(scene)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Count textured draw calls with and without batched geometry"
+    )
+    parser.add_argument("--map", default="bloom/examples/BMDEMO.MAP")
+    arguments = parser.parse_args()
+
+    for batched in [False, True]:
+        draw_calls, textures = _build_map(arguments.map, batched)
+        mode = "batched" if batched else "per tile"
+        logger.info(f"{mode}: {draw_calls} draw calls, {textures} textures")
+
+
+if __name__ == "__main__":
+    main()
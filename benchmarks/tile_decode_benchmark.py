@@ -0,0 +1,151 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import argparse
+import logging
+import os
+import os.path
+import random
+import struct
+import tempfile
+import timeit
+from glob import glob
+
+from panda3d import core
+
+from bloom import rff
+from bloom.tiles import art
+
+logging.basicConfig(
+    level="INFO",
+    format="%(asctime)s [%(levelname)s] %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+_TILES_PER_FILE = 256
+
+
+def _upload(image_data, width: int, height: int):
+    texture = core.Texture()
+    texture.setup_2d_texture(
+        width, height, core.Texture.T_unsigned_byte, core.Texture.F_rgba8
+    )
+    texture.set_ram_image(image_data)
+
+
+def _fancy_index_decode(art_manager: art.ArtManager, tiles, lookups):
+    palettes = art_manager.palettes
+    for tile_number in tiles:
+        width, height = art_manager.get_tile_dimensions(tile_number)
+        for lookup in lookups:
+            palette_lookup = palettes.get_lookup(lookup)[0]
+            indices = art_manager.load_tile_indices(tile_number)
+            image = palettes.default_palette[palette_lookup[indices]]
+            _upload(image.tobytes(), width, height)
+
+
+def _colour_table_decode(art_manager: art.ArtManager, tiles, lookups):
+    for tile_number in tiles:
+        width, height = art_manager.get_tile_dimensions(tile_number)
+        for lookup in lookups:
+            _upload(art_manager.load_tile_image(tile_number, lookup), width, height)
+
+
+def _write_tile_set(directory: str, file_count: int):
+    with rff.RFFWriter(os.path.join(directory, "BLOOD.RFF")) as writer:
+        writer.add_entry("BLOOD.PAL", os.urandom(768))
+        for lookup in range(art.PaletteSet.LOOKUP_COUNT):
+            writer.add_entry(f"{lookup}.PLU", os.urandom(64 * 256), index=lookup)
+
+    for file_index in range(file_count):
+        sizes = [
+            (random.choice([16, 32, 64, 128]), random.choice([16, 32, 64, 128]))
+            for _ in range(_TILES_PER_FILE)
+        ]
+        tile_start = file_index * _TILES_PER_FILE
+        with open(os.path.join(directory, f"TILES{file_index:03}.ART"), "wb") as file:
+            file.write(
+                struct.pack("<4I", 1, 0, tile_start, tile_start + _TILES_PER_FILE - 1)
+            )
+            file.write(b"".join(struct.pack("<H", width) for width, _ in sizes))
+            file.write(b"".join(struct.pack("<H", height) for _, height in sizes))
+            file.write(bytes(4 * _TILES_PER_FILE))
+            file.write(os.urandom(sum(width * height for width, height in sizes)))
+
+
+def _benchmark(blood_path: str, tile_count: int, repeat: int):
+    with rff.RFF(os.path.join(blood_path, "BLOOD.RFF")) as blood:
+        art_manager = art.ArtManager(
+            blood, sorted(glob(f"{blood_path}/*.[aA][rR][tT]"))
+        )
+        tiles = [
+            tile_number
+            for tile_number in art_manager.get_tile_indices()
+            if min(art_manager.get_tile_dimensions(tile_number)) > 0
+        ]
+        tiles = random.sample(tiles, min(tile_count, len(tiles)))
+        lookups = list(range(0, art.PaletteSet.LOOKUP_COUNT, 16))
+        decodes = len(tiles) * len(lookups)
+
+        # Warm the lookups and colour tables so only decoding is measured.
+        _colour_table_decode(art_manager, tiles[:1], lookups)
+
+        fancy_index_time = min(
+            timeit.repeat(
+                lambda: _fancy_index_decode(art_manager, tiles, lookups),
+                number=1,
+                repeat=repeat,
+            )
+        )
+        colour_table_time = min(
+            timeit.repeat(
+                lambda: _colour_table_decode(art_manager, tiles, lookups),
+                number=1,
+                repeat=repeat,
+            )
+        )
+
+    logger.info(
+        f"{decodes} tile decodes: "
+        f"fancy index {fancy_index_time * 1e6 / decodes:.1f}us per tile, "
+        f"colour table {colour_table_time * 1e6 / decodes:.1f}us per tile "
+        f"({fancy_index_time / colour_table_time:.1f}x)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare per tile decode time of the fancy index and colour table paths"
+    )
+    parser.add_argument(
+        "--blood-path",
+        help="Directory holding BLOOD.RFF and TILES0xx.ART, a synthetic set is used otherwise",
+    )
+    parser.add_argument(
+        "--files",
+        type=int,
+        default=4,
+        help="ART files to generate when no Blood directory is given",
+    )
+    parser.add_argument("--tiles", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    arguments = parser.parse_args()
+
+    if arguments.blood_path:
+        _benchmark(arguments.blood_path, arguments.tiles, arguments.repeat)
+        return
+
+    working_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            os.mkdir("cache")
+            _write_tile_set(directory, arguments.files)
+            _benchmark(directory, arguments.tiles, arguments.repeat)
+        finally:
+            os.chdir(working_directory)
+
+
+if __name__ == "__main__":
+    main()
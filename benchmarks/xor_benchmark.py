@@ -0,0 +1,124 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import argparse
+import logging
+import os
+import timeit
+
+from bloom import data_loading, game_map, rff
+from bloom.map_data import headers, sector, sprite, wall
+
+logging.basicConfig(
+    level="INFO",
+    format="%(asctime)s [%(levelname)s] %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+
+def _python_xor(data: bytes, key: int, shift=0):
+    result = bytearray(data)
+    for index in range(len(result)):
+        result[index] ^= (key + (index >> shift)) & 0xFF
+    return bytes(result)
+
+
+def _report(name: str, python_time: float, numpy_time: float):
+    logger.info(
+        f"{name}: python {python_time * 1000:.2f}ms, vectorised {numpy_time * 1000:.2f}ms "
+        f"({python_time / numpy_time:.1f}x)"
+    )
+
+
+def _benchmark_directory(directory: bytes, key: int, repeat: int):
+    python_time = min(
+        timeit.repeat(lambda: _python_xor(directory, key, 1), number=1, repeat=repeat)
+    )
+    numpy_time = min(
+        timeit.repeat(
+            lambda: data_loading.xor_bytes(directory, key, 1), number=1, repeat=repeat
+        )
+    )
+    _report(
+        f"RFF directory ({len(directory) // rff.Entry.size()} entries)",
+        python_time,
+        numpy_time,
+    )
+
+
+def _benchmark_rff(path: str, repeat: int):
+    with open(path, "rb") as file:
+        unpacker = data_loading.Unpacker(file.read())
+    header = unpacker.read_struct(rff.Header)
+    unpacker.seek(header.directory_offset)
+    directory = unpacker.get_bytes(rff.Entry.size() * header.number_of_entries)
+    _benchmark_directory(directory, header.directory_offset & 0xFF, repeat)
+
+
+def _benchmark_map(path: str, repeat: int):
+    with open(path, "rb") as file:
+        map_data = file.read()
+    loaded_map, _ = game_map.Map.load(path, map_data)
+    header_3: headers.MapHeader3 = loaded_map._header_3
+
+    records = [
+        (sector.BuildSector.size(), header_3.sector_count),
+        (wall.BuildWall.size(), header_3.wall_count),
+        (sprite.BuildSprite.size(), header_3.sprite_count),
+    ]
+    blocks = [bytes(map_data[:size]) for size, count in records for _ in range(count)]
+
+    python_time = min(
+        timeit.repeat(
+            lambda: [_python_xor(block, 0x4D) for block in blocks],
+            number=1,
+            repeat=repeat,
+        )
+    )
+    numpy_time = min(
+        timeit.repeat(
+            lambda: [data_loading.xor_bytes(block, 0x4D) for block in blocks],
+            number=1,
+            repeat=repeat,
+        )
+    )
+    _report(f"Map records ({os.path.basename(path)})", python_time, numpy_time)
+
+    python_time = min(
+        timeit.repeat(lambda: _python_xor(map_data, 0x4D), number=1, repeat=repeat)
+    )
+    numpy_time = min(
+        timeit.repeat(
+            lambda: data_loading.xor_bytes(map_data, 0x4D), number=1, repeat=repeat
+        )
+    )
+    _report(f"Whole map buffer ({len(map_data)} bytes)", python_time, numpy_time)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare pure Python and vectorised XOR decryption"
+    )
+    parser.add_argument("--rff", help="Path to an RFF archive such as BLOOD.RFF")
+    parser.add_argument(
+        "--entries",
+        type=int,
+        default=8192,
+        help="Directory entries to simulate when no RFF is given",
+    )
+    parser.add_argument("--map", default="bloom/examples/BMDEMO.MAP")
+    parser.add_argument("--repeat", type=int, default=5)
+    arguments = parser.parse_args()
+
+    if arguments.rff:
+        _benchmark_rff(arguments.rff, arguments.repeat)
+    else:
+        directory = os.urandom(rff.Entry.size() * arguments.entries)
+        _benchmark_directory(directory, 0x1F, arguments.repeat)
+
+    _benchmark_map(arguments.map, arguments.repeat)
+
+
+if __name__ == "__main__":
+    main()
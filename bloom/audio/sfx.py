@@ -26,7 +26,7 @@ class Sound:
         else:
             raise ValueError("Unsupported SFX")
 
-        raw_name = unpacker.read_remaining().decode().rstrip("\x00").upper()
+        raw_name = unpacker.read_remaining().tobytes().decode().rstrip("\x00").upper()
         self._raw = sounds_rff.data_for_entry(f"{raw_name}.RAW")
 
     @staticmethod
@@ -0,0 +1,239 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import argparse
+import fnmatch
+import json
+import logging
+import os
+import os.path
+import timeit
+import typing
+import zlib
+from concurrent import futures
+from glob import glob
+
+import numpy
+
+from .. import data_loading, game_map, rff
+from ..map_data import columnar
+
+logger = logging.getLogger(__name__)
+
+
+class MapJob(typing.NamedTuple):
+    name: str
+    map_data: typing.Optional[bytes]
+    output_path: typing.Optional[str]
+
+
+def find_map_jobs(
+    paths: typing.List[str], output_directory: typing.Optional[str] = None
+) -> typing.Iterable[MapJob]:
+    for path in paths:
+        if os.path.isdir(path):
+            for map_path in sorted(glob(os.path.join(path, "*"))):
+                if map_path.upper().endswith(".MAP"):
+                    yield _file_job(map_path, output_directory)
+        elif fnmatch.fnmatch(path.upper(), "*.RFF"):
+            with rff.RFF(path) as archive:
+                for map_name in archive.find_matching_entries("*.MAP"):
+                    yield MapJob(
+                        f"{path}:{map_name}",
+                        bytes(archive.data_for_entry(map_name)),
+                        _output_path(output_directory, map_name),
+                    )
+        else:
+            yield _file_job(path, output_directory)
+
+
+def _file_job(path: str, output_directory: typing.Optional[str]):
+    # Loose files are read by the workers, archives are read up front so
+    # each worker does not have to open them again.
+    return MapJob(path, None, _output_path(output_directory, os.path.basename(path)))
+
+
+def _output_path(output_directory: typing.Optional[str], map_name: str):
+    if output_directory is None:
+        return None
+    return os.path.join(output_directory, map_name)
+
+
+def summarise_map(job: MapJob) -> typing.Dict[str, typing.Any]:
+    try:
+        return _summarise_map(job)
+    except Exception as error:
+        return {"name": job.name, "error": f"{type(error).__name__}: {error}"}
+
+
+def _summarise_map(job: MapJob):
+    map_data = job.map_data
+    if map_data is None:
+        with open(job.name, "rb") as file:
+            map_data = file.read()
+
+    summary = game_map.Map.probe(map_data)
+    loaded_map, crc = game_map.Map.load(job.name, map_data, as_columns=True)
+    columns = loaded_map.columns
+
+    stored_crc_offset = len(map_data) - data_loading.UInt32.size()
+    crc_valid = zlib.crc32(map_data[:stored_crc_offset]) == crc
+
+    result = {
+        "name": job.name,
+        "version": f"{summary.major_version}.{summary.minor_version}",
+        "encrypted": summary.encrypted,
+        "revisions": summary.revisions,
+        "sectors": len(columns.sectors),
+        "walls": len(columns.walls),
+        "sprites": len(columns.sprites),
+    }
+    result.update(_x_usage(columns))
+    result["crc"] = {"stored": crc, "valid": crc_valid}
+    result["problems"] = _find_problems(columns, result, crc_valid)
+
+    if job.output_path is not None:
+        records_map, _ = game_map.Map.load(job.name, map_data)
+        saved_data, saved_crc = records_map.save(job.output_path)
+        with open(job.output_path, "wb") as file:
+            file.write(saved_data)
+        result["saved"] = {"path": job.output_path, "crc": saved_crc}
+
+    return result
+
+
+def _x_usage(columns: columnar.MapColumns):
+    return {
+        name: {"used": int(numpy.count_nonzero(records.has_data)), "limit": limit}
+        for name, records, limit in [
+            ("xsectors", columns.sectors, game_map.Map._MAX_XSECTORS),
+            ("xwalls", columns.walls, game_map.Map._MAX_XWALLS),
+            ("xsprites", columns.sprites, game_map.Map._MAX_XSPRITES),
+        ]
+    }
+
+
+def _find_problems(
+    columns: columnar.MapColumns, result: typing.Dict[str, typing.Any], crc_valid: bool
+):
+    problems: typing.List[str] = []
+    if not crc_valid:
+        problems.append("stored CRC does not match the map contents")
+
+    for name in ["xsectors", "xwalls", "xsprites"]:
+        used = result[name]["used"]
+        limit = result[name]["limit"]
+        if used > limit:
+            problems.append(f"{used} {name} used, only {limit} are available")
+
+    sector_count = len(columns.sectors)
+    wall_count = len(columns.walls)
+
+    wall_ends = (
+        columns.sectors["sector.first_wall_index"].astype(numpy.int64)
+        + columns.sectors["sector.wall_count"]
+    )
+    _add_index_problems(
+        problems,
+        "sectors",
+        "walls",
+        columns.sectors["sector.first_wall_index"],
+        0,
+        wall_count,
+    )
+    bad_sectors = numpy.flatnonzero(wall_ends > wall_count)
+    if len(bad_sectors) > 0:
+        problems.append(
+            f"{len(bad_sectors)} sectors have walls past the end of the wall list"
+            f" (first is sector {bad_sectors[0]})"
+        )
+
+    _add_index_problems(
+        problems,
+        "walls",
+        "point2 walls",
+        columns.walls["wall.point2_index"],
+        0,
+        wall_count,
+    )
+    _add_index_problems(
+        problems,
+        "walls",
+        "other side walls",
+        columns.walls["wall.other_side_wall_index"],
+        -1,
+        wall_count,
+    )
+    _add_index_problems(
+        problems,
+        "walls",
+        "other side sectors",
+        columns.walls["wall.other_side_sector_index"],
+        -1,
+        sector_count,
+    )
+    _add_index_problems(
+        problems,
+        "sprites",
+        "sectors",
+        columns.sprites["sprite.sector_index"],
+        0,
+        sector_count,
+    )
+    return problems
+
+
+def _add_index_problems(
+    problems: typing.List[str],
+    owner_name: str,
+    target_name: str,
+    indices: numpy.ndarray,
+    minimum: int,
+    count: int,
+):
+    bad = numpy.flatnonzero((indices < minimum) | (indices >= count))
+    if len(bad) > 0:
+        problems.append(
+            f"{len(bad)} {owner_name} reference missing {target_name}"
+            f" (first is {owner_name[:-1]} {bad[0]})"
+        )
+
+
+def main(arguments: typing.List[str] = None):
+    parser = argparse.ArgumentParser(
+        prog="python -m bloom.batch",
+        description="Validate and report on Blood maps without opening the editor",
+    )
+    parser.add_argument(
+        "paths",
+        nargs="+",
+        help="Map files, directories of maps or RFF archives to process",
+    )
+    parser.add_argument(
+        "--output-directory",
+        help="Re-save every map that loads into this directory",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes, defaults to the number of CPUs",
+    )
+    options = parser.parse_args(arguments)
+
+    if options.output_directory is not None:
+        os.makedirs(options.output_directory, exist_ok=True)
+
+    start_time = timeit.default_timer()
+    jobs = find_map_jobs(options.paths, options.output_directory)
+    map_count = 0
+    failed = False
+    with futures.ProcessPoolExecutor(max_workers=options.workers) as executor:
+        for result in executor.map(summarise_map, jobs):
+            map_count += 1
+            failed = failed or "error" in result or bool(result["problems"])
+            print(json.dumps(result), flush=True)
+
+    elapsed = timeit.default_timer() - start_time
+    logger.info(f"Processed {map_count} maps in {elapsed:.2f} seconds")
+    return 1 if failed else 0
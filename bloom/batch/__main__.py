@@ -0,0 +1,15 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import logging
+import sys
+
+from . import main
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level="INFO",
+        format="%(asctime)s [%(levelname)s] %(message)s",
+        handlers=[logging.StreamHandler()],
+    )
+    sys.exit(main())
@@ -4,6 +4,7 @@
 import distutils.spawn
 import logging
 import os.path
+import struct
 import tkinter
 import tkinter.filedialog
 import tkinter.messagebox
@@ -26,6 +27,7 @@ from . import (
     edit_mode,
     editor,
     game_map,
+    map_cache,
     tile_dialog,
     utils,
 )
@@ -218,8 +220,12 @@ class Bloom(ShowBase):
             self.win.request_properties(props)
 
     def _initialize(self, task):
-        self._rff = RFF(f"{self._blood_path}/BLOOD.RFF")
-        self._sounds_rff = RFF(f"{self._blood_path}/SOUNDS.RFF")
+        self._rff = RFF(
+            f"{self._blood_path}/BLOOD.RFF", cache_size=constants.RFF_CACHE_SIZE
+        )
+        self._sounds_rff = RFF(
+            f"{self._blood_path}/SOUNDS.RFF", cache_size=constants.RFF_CACHE_SIZE
+        )
         self._addon = addon.Addon(self._current_addon_path)
         self._seq_manager = seq_manager.Manager(self._rff)
         self._meta_data = {}
@@ -227,10 +233,12 @@ class Bloom(ShowBase):
         for path in self._recent:
             self._add_recent_menu_item(path)
 
-        for map_name in self._rff.find_matching_entries("*.MAP"):
-            map_name = map_name[: constants.MAP_EXTENSION_SKIP]
+        for map_entry_name in self._rff.find_matching_entries("*.MAP"):
+            map_name = map_entry_name[: constants.MAP_EXTENSION_SKIP]
+            map_header = self._rff.peek_entry(map_entry_name, game_map.Map.probe_size())
             self._open_from_rff_menu.add_command(
-                label=map_name, command=self._open_map_from_rff(map_name)
+                label=self._describe_map(map_name, map_header),
+                command=self._open_map_from_rff(map_name),
             )
 
         self._scene: core.NodePath = self.render.attach_new_node("scene")
@@ -274,6 +282,12 @@ class Bloom(ShowBase):
         self._tile_manager = manager.Manager(
             self._blood_path, self._rff, self._edit_mode_selector
         )
+        if constants.MAP_CACHE_ENABLED:
+            self._map_cache = map_cache.MapCache(
+                os.path.join(constants.CACHE_PATH, "maps")
+            )
+        else:
+            self._map_cache = None
         self._dialogs = dialogs.Dialogs(
             self.aspect2d,
             self._tile_manager,
@@ -384,6 +398,9 @@ class Bloom(ShowBase):
             self._seq_manager,
             self._tile_manager,
         )
+        # The editor keeps its own copy of the records, so a cached map does
+        # not need to hold on to its cache file.
+        map_to_load.close()
 
         self._setup_auto_save()
         self._mode_3d.set_editor(self._map_editor)
@@ -502,13 +519,38 @@ class Bloom(ShowBase):
         if path not in self._recent:
             self._recent.append(path)
             self._open_recent_menu.add_command(
-                label=path, command=self._open_map_from_path_callback(path)
+                label=self._describe_map(path, self._read_map_header(path)),
+                command=self._open_map_from_path_callback(path),
             )
 
     def _add_recent_menu_item(self, path: str):
         path = self._full_path(path)
         self._open_recent_menu.add_command(
-            label=path, command=self._open_map_from_path_callback(path)
+            label=self._describe_map(path, self._read_map_header(path)),
+            command=self._open_map_from_path_callback(path),
+        )
+
+    @staticmethod
+    def _read_map_header(path: str) -> typing.Optional[bytes]:
+        try:
+            with open(path, "rb") as file:
+                return file.read(game_map.Map.probe_size())
+        except OSError:
+            return None
+
+    @staticmethod
+    def _describe_map(name: str, map_header: typing.Optional[bytes]):
+        if map_header is None:
+            return name
+
+        try:
+            summary = game_map.Map.probe(map_header)
+        except (ValueError, struct.error):
+            return name
+
+        return (
+            f"{name} ({summary.sector_count} sectors, {summary.wall_count} walls, "
+            f"{summary.sprite_count} sprites)"
         )
 
     @staticmethod
@@ -520,7 +562,9 @@ class Bloom(ShowBase):
         def _callback():
             self._path = None
             map_to_load, crc = game_map.Map.load(
-                map_name, self._rff.data_for_entry(f"{map_name}.MAP")
+                map_name,
+                self._rff.data_for_entry(f"{map_name}.MAP"),
+                cache=self._map_cache,
             )
             self._load_map_into_editor(map_to_load)
 
@@ -533,10 +577,19 @@ class Bloom(ShowBase):
 
     def _do_open_map(self):
         with open(self._path, "rb") as file:
-            map_to_load, crc = game_map.Map.load(self._path, file.read())
+            map_to_load, crc = game_map.Map.load(
+                self._path, file.read(), cache=self._map_cache
+            )
         self._load_map_into_editor(map_to_load)
         self._log_info(f"Loaded map {self._path} (hash: {hex(crc)})")
 
+        variant_stats = self._tile_manager.variant_stats
+        logger.info(
+            f"Tile variants: {variant_stats.variants}, "
+            f"shared {variant_stats.shared_textures} textures "
+            f"({variant_stats.saved_bytes} bytes)"
+        )
+
         map_name = os.path.basename(self._path)[: constants.MAP_EXTENSION_SKIP]
         song_name = self._addon.song_for_map(map_name)
         self._audio_manager.load_song(song_name)
@@ -576,6 +629,7 @@ class Bloom(ShowBase):
 
     def _handle_exit(self):
         logger.info("Shutting down...")
+        self._tile_manager.shutdown()
         with open(self._CONFIG_PATH, "w+") as file:
             file.write(yaml.dump(self._config))
         with open(self._META_PATH, "w+") as file:
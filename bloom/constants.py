@@ -10,13 +10,20 @@ def env(name, default):
     return environ.get(name, default)
 
 
-def _create_vertex_format():
+def _create_vertex_format(with_layer=False):
     vertex_array_format = core.GeomVertexArrayFormat()
     vertex_array_format.add_column("vertex", 3, core.Geom.NT_float32, core.Geom.C_point)
     vertex_array_format.add_column("color", 4, core.Geom.NT_float32, core.Geom.C_color)
     vertex_array_format.add_column(
         "texcoord", 2, core.Geom.NT_float32, core.Geom.C_texcoord
     )
+    if with_layer:
+        vertex_array_format.add_column(
+            "layer", 1, core.Geom.NT_float32, core.Geom.C_other
+        )
+        vertex_array_format.add_column(
+            "tile_scale", 2, core.Geom.NT_float32, core.Geom.C_other
+        )
 
     vertex_format = core.GeomVertexFormat()
     vertex_format.add_array(vertex_array_format)
@@ -34,19 +41,26 @@ PORTALS_ENABLED = env("PORTALS_ENABLED", "true").lower() == "true"
 PORTALS_DEBUGGING_ENABLED = DEBUG or env("PORTAL_DEBUG", "false").lower() == "true"
 PORTAL_DEBUG_DEPTH = int(env("PORTAL_DEBUG_DEPTH", "0"))
 
+BATCHED_GEOMETRY = env("BATCHED_GEOMETRY", "false").lower() == "true"
+INDEXED_TEXTURES = env("INDEXED_TEXTURES", "false").lower() == "true"
+
 DYNAMIC_GEOMETRY_LOAD = env("DYNAMIC_GEOMETRY_LOAD", "false").lower() == "true"
 
-# MAP_CACHE_ENABLED = True
-MAP_CACHE_ENABLED = False
+MAP_CACHE_ENABLED = env("MAP_CACHE_ENABLED", "false").lower() == "true"
 
 CACHE_PATH = "cache"
 
+RFF_CACHE_SIZE = int(env("RFF_CACHE_SIZE", str(32 * 1024 * 1024)))
+TILE_IMAGE_CACHE_ENABLED = env("TILE_IMAGE_CACHE_ENABLED", "true").lower() == "true"
+TILE_CACHE_SIZE = int(env("TILE_CACHE_SIZE", str(256 * 1024 * 1024)))
+
 DOUBLE_CLICK_TIMEOUT = 0.25
 
 TICK_RATE = 1 / 35.0
 TICK_SCALE = 10240
 
 VERTEX_FORMAT = _create_vertex_format()
+BATCHED_VERTEX_FORMAT = _create_vertex_format(with_layer=True)
 
 HIGHLIGHT_DEPTH_OFFSET = 2
 DEPTH_OFFSET = 10
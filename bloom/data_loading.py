@@ -1,9 +1,10 @@
 # Copyright 2020 Thomas Rogers
 # SPDX-License-Identifier: Apache-2.0
 
+import functools
 import inspect
-import io
 import logging
+import re
 import struct
 import typing
 from collections.abc import Iterable
@@ -186,71 +187,327 @@ class PartialInteger:
 
         raise ValueError("Impossible to read partial integers")
 
+    def default(self):
+        return self._default
+
+
+_SMALL_XOR_SIZE = 256
+
+
+@functools.lru_cache(maxsize=64)
+def _xor_key_period(key: int, shift: int) -> numpy.ndarray:
+    # The stream repeats every 256 << shift bytes, so one period is all that
+    # needs caching whatever length is asked for.
+    result = ((key + (numpy.arange(256 << shift) >> shift)) & 0xFF).astype(numpy.uint8)
+    result.setflags(write=False)
+    return result
+
+
+def xor_key_stream(key: int, count: int, shift=0) -> numpy.ndarray:
+    period = _xor_key_period(key & 0xFF, shift)
+    if count <= len(period):
+        return period[:count]
+
+    result = numpy.tile(period, -(-count // len(period)))[:count]
+    result.setflags(write=False)
+    return result
+
+
+@functools.lru_cache(maxsize=256)
+def _xor_key_integer(key: int, count: int, shift: int) -> int:
+    # Only used for data up to _SMALL_XOR_SIZE bytes.
+    return int.from_bytes(xor_key_stream(key, count, shift).tobytes(), "little")
+
+
+def xor_in_place(buffer, key: int, shift=0):
+    if len(buffer) <= _SMALL_XOR_SIZE:
+        buffer[:] = xor_bytes(buffer, key, shift)
+        return
+
+    data = numpy.frombuffer(buffer, dtype=numpy.uint8)
+    period = _xor_key_period(key & 0xFF, shift)
+    whole = len(data) - len(data) % len(period)
+    data[:whole].reshape(-1, len(period))[:] ^= period
+    data[whole:] ^= period[: len(data) - whole]
+
+
+def xor_bytes(data: bytes, key: int, shift=0) -> bytes:
+    count = len(data)
+    if count <= _SMALL_XOR_SIZE:
+        value = int.from_bytes(data, "little") ^ _xor_key_integer(key, count, shift)
+        return value.to_bytes(count, "little")
+
+    result = bytearray(data)
+    xor_in_place(result, key, shift)
+    return bytes(result)
+
+
+class StructCodec:
+    _NUMPY_TYPES = {
+        b"b": "i1",
+        b"h": "<i2",
+        b"i": "<i4",
+        b"B": "u1",
+        b"H": "<u2",
+        b"I": "<u4",
+    }
+
+    _MEMBER = 0
+    _INTEGER = 1
+    _BITS = 2
+    _STRUCT = 3
+
+    def __init__(self, struct_type: type, skip_members=0):
+        self._struct_type = struct_type
+
+        self._value_formats: typing.List[bytes] = []
+        self._plan = self._compile(struct_type, skip_members, self._value_formats)
+        self._format_string = b"<" + b"".join(self._value_formats)
+        self._struct = struct.Struct(self._format_string)
+        self._dtype: numpy.dtype = None
+
+    @property
+    def size(self):
+        return self._struct.size
+
+    @property
+    def dtype(self) -> numpy.dtype:
+        if self._dtype is None:
+            self._dtype = numpy.dtype(
+                [
+                    (f"_{value_index}", self._numpy_type(value_format))
+                    for value_index, value_format in enumerate(self._value_formats)
+                ]
+            )
+        return self._dtype
+
+    @property
+    def format_string(self) -> bytes:
+        return self._format_string
+
+    def unpack_from(self, buffer, offset=0) -> T:
+        values = self._struct.unpack_from(buffer, offset)
+        return self._decode(self._struct_type, self._plan, values)
+
+    def unpack_into(self, result: T, buffer, offset=0):
+        values = self._struct.unpack_from(buffer, offset)
+        self._decode_into(result.__dict__, self._plan, values)
+
+    def decode_columns(
+        self, records: numpy.ndarray, prefix=""
+    ) -> typing.Dict[str, numpy.ndarray]:
+        raw = numpy.ascontiguousarray(records, dtype=numpy.uint8).reshape(-1)
+        raw = raw.view(self.dtype)
+
+        columns: typing.Dict[str, numpy.ndarray] = {}
+        self._decode_column_plan(columns, self._plan, raw, prefix)
+        return columns
+
+    def pack(self, structure: T) -> bytes:
+        values = self._encode(structure)
+        try:
+            return self._struct.pack(*values)
+        except struct.error:
+            self._log_bad_member(structure)
+            raise
+
+    def pack_into(self, buffer, offset: int, structure: T):
+        values = self._encode(structure)
+        try:
+            self._struct.pack_into(buffer, offset, *values)
+        except struct.error:
+            self._log_bad_member(structure)
+            raise
+
+    @staticmethod
+    def _compile(
+        struct_type: type,
+        skip_members: int,
+        value_formats: typing.List[bytes],
+    ):
+        plan = []
+
+        hints = list(struct_type.type_hints().items())[skip_members:]
+        hint_types = [hint_type for _, hint_type in hints]
+        index = 0
+        while index < len(hints):
+            count, integer_type = PartialInteger.next_required_for_full_integer(
+                hint_types, index
+            )
+            if integer_type is not None:
+                bit_plan = []
+                for member_name, hint in hints[index : index + count]:
+                    bit_plan.append(
+                        (
+                            member_name,
+                            hint._bits,
+                            hint._bit_shift - 1,
+                            hint._bit_shift,
+                            hint._sign_mask if hint._signed else 0,
+                        )
+                    )
+                plan.append((StructCodec._BITS, None, len(value_formats), bit_plan))
+                value_formats.append(integer_type.format_string())
+                index += count
+                continue
+
+            member_name, hint_type = hints[index]
+            if inspect.isclass(hint_type) and issubclass(hint_type, CustomStruct):
+                sub_plan = StructCodec._compile(hint_type, 0, value_formats)
+                plan.append((StructCodec._STRUCT, member_name, hint_type, sub_plan))
+            else:
+                start = len(value_formats)
+                value_formats.extend(
+                    StructCodec._split_format(hint_type.format_string())
+                )
+                if isinstance(hint_type, FixedSizeInteger):
+                    plan.append((StructCodec._INTEGER, member_name, start, None))
+                else:
+                    plan.append(
+                        (
+                            StructCodec._MEMBER,
+                            member_name,
+                            hint_type,
+                            (start, len(value_formats)),
+                        )
+                    )
+            index += 1
+
+        return plan
+
     @staticmethod
-    def read_values(
-        type_hints: typing.List["PartialInteger"], read_value: int
-    ) -> typing.List[int]:
+    def _split_format(member_format: bytes) -> typing.List[bytes]:
         result = []
-        for hint in type_hints:
-            value = read_value & (hint._bit_shift - 1)
-            read_value >>= hint._bits
+        for part in re.findall(rb"\d*[a-zA-Z]", member_format):
+            count, code = part[:-1], part[-1:]
+            if code == b"s" or not count:
+                result.append(part)
+            else:
+                result.extend([code] * int(count))
+        return result
 
-            if hint._signed:
-                if value & hint._sign_mask != 0:
-                    value = value - hint._bit_shift
+    @staticmethod
+    def _numpy_type(value_format: bytes) -> str:
+        if value_format.endswith(b"s"):
+            return f"S{int(value_format[:-1])}"
+        return StructCodec._NUMPY_TYPES[value_format]
 
-            result.append(value)
+    @staticmethod
+    def _decode(struct_type: type, plan, values) -> T:
+        result = struct_type.__new__(struct_type)
+        StructCodec._decode_into(result.__dict__, plan, values)
         return result
 
     @staticmethod
-    def write_value(
-        type_hints: typing.List["PartialInteger"], values: typing.List[int]
-    ) -> int:
-        result = 0
-        bits = 0
-        for hint, value in zip(type_hints, values):
-            if hint._signed and value < 0:
-                value = value + hint._bit_shift
+    def _decode_into(members: typing.Dict[str, typing.Any], plan, values):
+        for kind, member_name, argument, details in plan:
+            if kind == StructCodec._INTEGER:
+                members[member_name] = values[argument]
+            elif kind == StructCodec._BITS:
+                read_value = values[argument]
+                for bit_member_name, bits, mask, bit_shift, sign_mask in details:
+                    value = read_value & mask
+                    read_value >>= bits
+                    if value & sign_mask:
+                        value -= bit_shift
+                    members[bit_member_name] = value
+            elif kind == StructCodec._STRUCT:
+                members[member_name] = StructCodec._decode(argument, details, values)
+            else:
+                start, end = details
+                members[member_name] = argument.flatten(values[start:end])
 
-            truncated_value = value & (hint._bit_shift - 1)
+    @staticmethod
+    def _decode_column_plan(
+        columns: typing.Dict[str, numpy.ndarray],
+        plan,
+        raw: numpy.ndarray,
+        prefix: str,
+    ):
+        for kind, member_name, argument, details in plan:
+            if kind == StructCodec._INTEGER:
+                columns[f"{prefix}{member_name}"] = raw[f"_{argument}"]
+            elif kind == StructCodec._BITS:
+                read_value = raw[f"_{argument}"].astype(numpy.int64)
+                bit_offset = 0
+                for bit_member_name, bits, mask, bit_shift, sign_mask in details:
+                    value = (read_value >> bit_offset) & mask
+                    if sign_mask:
+                        value = numpy.where(value & sign_mask, value - bit_shift, value)
+                    columns[f"{prefix}{bit_member_name}"] = value
+                    bit_offset += bits
+            elif kind == StructCodec._STRUCT:
+                StructCodec._decode_column_plan(
+                    columns, details, raw, f"{prefix}{member_name}."
+                )
+            else:
+                start, end = details
+                if isinstance(argument, SizedType) and end - start > 1:
+                    columns[f"{prefix}{member_name}"] = numpy.stack(
+                        [raw[f"_{index}"] for index in range(start, end)], axis=1
+                    )
+                else:
+                    columns[f"{prefix}{member_name}"] = raw[f"_{start}"]
 
-            result |= truncated_value << bits
-            bits += hint._bits
-        return result
+    def _encode(self, structure: T) -> typing.List[typing.Any]:
+        values = []
+        self._encode_into(values, self._plan, structure.__dict__)
+        return values
 
-    def default(self):
-        return self._default
+    @staticmethod
+    def _encode_into(values: typing.List[typing.Any], plan, members):
+        for kind, member_name, argument, details in plan:
+            if kind == StructCodec._INTEGER:
+                values.append(members[member_name])
+            elif kind == StructCodec._BITS:
+                write_value = 0
+                bit_offset = 0
+                for bit_member_name, bits, mask, bit_shift, sign_mask in details:
+                    value = members[bit_member_name]
+                    if sign_mask and value < 0:
+                        value += bit_shift
+                    write_value |= (value & mask) << bit_offset
+                    bit_offset += bits
+                values.append(write_value)
+            elif kind == StructCodec._STRUCT:
+                StructCodec._encode_into(values, details, members[member_name].__dict__)
+            else:
+                values.extend(argument.unflatten(members[member_name]))
+
+    def _log_bad_member(self, structure: T):
+        for member_name, hint_type in structure.type_hints().items():
+            if inspect.isclass(hint_type) and issubclass(hint_type, CustomStruct):
+                hint_type.codec()._log_bad_member(getattr(structure, member_name))
+                continue
+
+            if isinstance(hint_type, PartialInteger):
+                continue
+
+            member_value = getattr(structure, member_name)
+            try:
+                struct.pack(
+                    b"<" + hint_type.format_string(),
+                    *hint_type.unflatten(member_value),
+                )
+            except struct.error:
+                logger.error(
+                    f"Error saving {member_name} value {member_value} as {hint_type}"
+                )
 
 
 class Unpacker:
     def __init__(self, buffer: bytes):
-        self._buffer = buffer
+        self._buffer = memoryview(buffer)
         self._offset = 0
 
     def read_struct(self, struct_type: type, skip_members=0) -> T:
-        hints: typing.Dict[str, typing.Any] = struct_type.type_hints()
-        result = struct_type()
-
-        index = 0
-        hint_member_names = list(hints.keys())
-        hint_hint_types = list(hints.values())
-        index += skip_members
-        while index < len(hint_hint_types):
-            index = self._read_bits(
-                result, struct_type, hint_member_names, hint_hint_types, index
-            )
-            if index >= len(hint_hint_types):
-                break
-
-            member_name = hint_member_names[index]
-            hint_type = hint_hint_types[index]
-
-            if inspect.isclass(hint_type) and issubclass(hint_type, CustomStruct):
-                member_value = self.read_struct(hint_type)
-            else:
-                member_value = self.read_member(hint_type)
-            setattr(result, member_name, member_value)
-            index += 1
+        codec: StructCodec = struct_type.codec(skip_members)
+        if skip_members > 0:
+            result = struct_type()
+            codec.unpack_into(result, self._buffer, self._offset)
+        else:
+            result = codec.unpack_from(self._buffer, self._offset)
+        self._offset += codec.size
 
         return result
 
@@ -274,6 +531,10 @@ class Unpacker:
     def offset(self):
         return self._offset
 
+    @property
+    def buffer(self) -> memoryview:
+        return self._buffer
+
     @property
     def data_left(self):
         return len(self._buffer) - self._offset
@@ -284,20 +545,17 @@ class Unpacker:
     def seek_incrementally(self, amount: int):
         self._offset += amount
 
-    def get_bytes(self, count: int) -> bytes:
+    def get_bytes(self, count: int) -> memoryview:
         data = self._buffer[self._offset : self._offset + count]
         self._offset += count
 
         return data
 
-    def read_remaining(self) -> bytes:
+    def read_remaining(self) -> memoryview:
         return self.get_bytes(self.data_left)
 
     def get_xor_encrypted_bytes(self, count: int, key: int) -> bytes:
-        data = bytearray(self.get_bytes(count))
-        for index in range(count):
-            data[index] ^= (key + index) & 0xFF
-        return bytes(data)
+        return xor_bytes(self.get_bytes(count), key)
 
     def read_xor_encrypted_member(self, hint_type, key: int) -> T:
         data = self.get_xor_encrypted_bytes(hint_type.size(), key)
@@ -319,79 +577,38 @@ class Unpacker:
         data = self.get_xor_encrypted_bytes(struct_type.size() * count, key)
         return Unpacker(data).read_multiple(struct_type, count)
 
-    def _read_bits(
-        self, result, struct_type, hint_member_names, hint_hint_types, index
-    ):
-        while True:
-            count, integer_type = struct_type.next_required_for_full_integer(index)
-
-            if integer_type is None:
-                break
-
-            bit_member_values = PartialInteger.read_values(
-                hint_hint_types[index : index + count], self.read_member(integer_type)
-            )
-            for bit_type_index in range(count):
-                setattr(
-                    result,
-                    hint_member_names[index + bit_type_index],
-                    bit_member_values[bit_type_index],
-                )
-
-            index += count
-
-        return index
-
 
 class Packer:
-    def __init__(self):
-        self._stream = io.BytesIO()
+    def __init__(self, size=0):
+        self._buffer = bytearray(size)
+        self._offset = 0
+        self._length = 0
 
     def get_bytes(self):
-        return bytes(self._stream.getbuffer())
+        return bytes(self.view())
+
+    def get_buffer(self) -> bytearray:
+        if len(self._buffer) > self._length:
+            del self._buffer[self._length :]
+        return self._buffer
+
+    def view(self) -> memoryview:
+        return memoryview(self._buffer)[: self._length]
 
     def seek(self, offset):
-        self._stream.seek(offset)
+        self._offset = offset
 
     def seek_incrementally(self, amount: int):
         self.seek(self.offset + amount)
 
     @property
     def offset(self):
-        return self._stream.tell()
+        return self._offset
 
     def write_struct(self, structure: T):
-        hints: typing.Dict[str, typing.Any] = structure.type_hints()
-
-        index = 0
-        hint_member_names = list(hints.keys())
-        hint_hint_types = list(hints.values())
-        while index < len(hint_hint_types):
-            index = self._write_bits(
-                structure,
-                structure.__class__,
-                hint_member_names,
-                hint_hint_types,
-                index,
-            )
-            if index >= len(hint_hint_types):
-                break
-
-            member_name = hint_member_names[index]
-            hint_type = hint_hint_types[index]
-            member_value = getattr(structure, member_name)
-
-            if inspect.isclass(hint_type) and issubclass(hint_type, CustomStruct):
-                self.write_struct(member_value)
-            else:
-                try:
-                    self.write_member(hint_type, member_value)
-                except struct.error as error:
-                    logger.error(
-                        f"Error saving {member_name} value {member_value} as {hint_type}"
-                    )
-                    raise
-            index += 1
+        codec: StructCodec = structure.codec()
+        start = self._reserve(codec.size)
+        codec.pack_into(self._buffer, start, structure)
 
     def write_multiple_members(self, hint_type, members: typing.List[T]):
         for member in members:
@@ -401,69 +618,59 @@ class Packer:
         format_string = hint_type.format_string()
 
         size = struct.calcsize(format_string)
-        serialized_struct = struct.pack(
-            format_string, *hint_type.unflatten(member_value)
+        start = self._reserve(size)
+        struct.pack_into(
+            format_string, self._buffer, start, *hint_type.unflatten(member_value)
         )
-        self._stream.write(serialized_struct)
 
     def write_multiple(self, structures: typing.List[T]):
         for structure in structures:
             self.write_struct(structure)
 
-    def _write_bits(
-        self, structure, struct_type, hint_member_names, hint_hint_types, index
-    ):
-        while True:
-            count, integer_type = struct_type.next_required_for_full_integer(index)
-
-            if integer_type is None:
-                break
-
-            values = []
-            for bit_type_index in range(count):
-                member_value = getattr(
-                    structure, hint_member_names[index + bit_type_index]
-                )
-                values.append(member_value)
-
-            write_value = PartialInteger.write_value(
-                hint_hint_types[index : index + count], values
-            )
-            self.write_member(integer_type, write_value)
-            index += count
-
-        return index
-
     def write_bytes(self, data: bytes):
-        self._stream.write(data)
+        start = self._reserve(len(data))
+        self._buffer[start : self._offset] = data
 
     def write_xor_encrypted_bytes(self, data: bytes, key: int):
-        encrypted_data = bytearray(data)
-        for index in range(len(encrypted_data)):
-            encrypted_data[index] ^= (key + index) & 0xFF
-        self._stream.write(encrypted_data)
+        start = self.offset
+        self.write_bytes(data)
+        self._xor_encrypt_from(start, key)
 
     def write_xor_encrypted_member(self, hint_type, member_value: T, key: int):
-        packer = Packer()
-        packer.write_member(hint_type, member_value)
-        self.write_xor_encrypted_bytes(packer.get_bytes(), key)
+        start = self.offset
+        self.write_member(hint_type, member_value)
+        self._xor_encrypt_from(start, key)
 
     def write_multiple_xor_encrypted_members(
         self, hint_type, members: typing.List[T], key: int
     ):
-        packer = Packer()
-        packer.write_multiple_members(hint_type, members)
-        self.write_xor_encrypted_bytes(packer.get_bytes(), key)
+        start = self.offset
+        self.write_multiple_members(hint_type, members)
+        self._xor_encrypt_from(start, key)
 
     def write_xor_encrypted_struct(self, structure: T, key: int):
-        packer = Packer()
-        packer.write_struct(structure)
-        self.write_xor_encrypted_bytes(packer.get_bytes(), key)
+        start = self.offset
+        self.write_struct(structure)
+        self._xor_encrypt_from(start, key)
 
     def write_xor_encrypted_multiple(self, structures: typing.List[T], key: int):
         for structure in structures:
             self.write_xor_encrypted_struct(structure, key)
 
+    def _reserve(self, count: int) -> int:
+        start = self._offset
+        end = start + count
+        if end > len(self._buffer):
+            self._buffer.extend(bytes(max(end - len(self._buffer), len(self._buffer))))
+
+        self._offset = end
+        if end > self._length:
+            self._length = end
+        return start
+
+    def _xor_encrypt_from(self, start: int, key: int):
+        xor_in_place(memoryview(self._buffer)[start : self._offset], key)
+
 
 class CustomStruct:
     def __init__(self, **kwargs):
@@ -491,25 +698,15 @@ class CustomStruct:
         return hints
 
     @classmethod
-    def type_hints_list(cls):
-        hints = getattr(cls, "_type_hints_list", None)
-        if hints is None:
-            cls._type_hints_list = list(cls.type_hints().values())
-            cls._type_hints_list_bits_cache = [None] * len(cls._type_hints_list)
-            return cls._type_hints_list
-        return hints
-
-    @classmethod
-    def next_required_for_full_integer(cls, index):
-        hints = cls.type_hints_list()
-        if index >= len(hints):
-            return 0, None
+    def codec(cls, skip_members=0) -> StructCodec:
+        codecs = cls.__dict__.get("_codecs")
+        if codecs is None:
+            codecs = {}
+            cls._codecs = codecs
 
-        if cls._type_hints_list_bits_cache[index] is None:
-            cls._type_hints_list_bits_cache[
-                index
-            ] = PartialInteger.next_required_for_full_integer(hints, index)
-        return cls._type_hints_list_bits_cache[index]
+        if skip_members not in codecs:
+            codecs[skip_members] = StructCodec(cls, skip_members)
+        return codecs[skip_members]
 
     def is_default(self):
         hints: typing.Dict[str, typing.Any] = self.type_hints()
@@ -547,6 +744,8 @@ class CustomStruct:
     def __eq__(self, other):
         if not isinstance(other, self.__class__):
             return False
+        if self.__dict__ == other.__dict__:
+            return True
 
         hints: typing.Dict[str, typing.Any] = self.type_hints()
         for key in hints.keys():
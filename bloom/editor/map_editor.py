@@ -19,9 +19,16 @@ from .. import (
     map_data,
     seq,
 )
+from ..map_data import encoded_records
 from ..tiles import manager
 from ..utils import sky
-from . import grid_snapper, sector_geometry, undo_stack, view_clipping
+from . import (
+    grid_snapper,
+    sector_geometry,
+    tile_prefetcher,
+    undo_stack,
+    view_clipping,
+)
 from .map_objects import EditorSector, EditorSprite, EditorWall, SectorCollection
 
 logger = logging.getLogger(__name__)
@@ -46,6 +53,8 @@ class MapEditor:
             "3d_view"
         )
         self._tile_manager = tile_manager
+        self._tile_prefetcher = tile_prefetcher.TilePrefetcher(self._tile_manager)
+        self._encoded_records = encoded_records.EncodedRecords()
         self._texture_stage = core.TextureStage.get_default()
         self._last_hit_position = core.Vec3()
         self._ticks = 0
@@ -232,6 +241,9 @@ class MapEditor:
         map_to_save.walls[:] = walls
         map_to_save.sprites[:] = sprites
 
+        # Records that did not change since the last save reuse its bytes.
+        map_to_save.set_encoded_records(self._encoded_records)
+
         position_x = round(builder_position.x)
         position_y = round(builder_position.y)
         position_z = editor.to_build_height(builder_position.z)
@@ -303,6 +315,7 @@ class MapEditor:
                 self._builder_sector, self._camera_collection, self._clipping_debug
             )
             clipper.clip()
+            self._tile_prefetcher.prefetch(clipper.visible_sectors)
             for editor_sector in self._sectors.sectors:
                 if editor_sector in clipper.visible_sectors:
                     editor_sector.show()
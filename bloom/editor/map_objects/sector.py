@@ -272,7 +272,7 @@ class EditorSector(empty_object.EmptyObject):
             ) % animation_data.animation_count
             new_picnum = animation_data.picnum + offset
 
-            node_path.set_texture(art_manager.get_tile(new_picnum, lookup))
+            art_manager.set_tile(node_path, new_picnum, lookup)
 
         for wall in self._walls:
             wall.update(ticks)
@@ -443,6 +443,14 @@ class EditorSector(empty_object.EmptyObject):
     def get_data(self):
         return self._sector.data
 
+    def get_tile_references(self) -> typing.Iterable[typing.Tuple[int, int]]:
+        yield self._sector.sector.floor_picnum, self._sector.sector.floor_palette
+        yield self._sector.sector.ceiling_picnum, self._sector.sector.ceiling_palette
+        for editor_wall in self._walls:
+            yield from editor_wall.get_tile_references()
+        for editor_sprite in self._sprites:
+            yield from editor_sprite.get_tile_references()
+
     def get_stat_for_part(self, part: str):
         if part == self.FLOOR_PART:
             return self._sector.sector.floor_stat
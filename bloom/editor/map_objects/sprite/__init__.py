@@ -58,6 +58,9 @@ class EditorSprite(empty_object.EmptyObject):
     def get_data(self):
         return self._sprite.data
 
+    def get_tile_references(self) -> typing.Iterable[typing.Tuple[int, int]]:
+        yield self.get_picnum(None), self._sprite.sprite.palette
+
     def get_stat_for_part(self, part: str):
         return self._sprite.sprite.stat
 
@@ -361,7 +364,7 @@ class EditorSprite(empty_object.EmptyObject):
             frame = self._seq.frames[frame_index]
 
             self._set_display_size(frame.stat.tile)
-            node_path.set_texture(art_manager.get_tile(frame.stat.tile, frame.palette))
+            art_manager.set_tile(node_path, frame.stat.tile, frame.palette)
 
         elif animation_data_and_lookup is not None:
             animation_data: manager.AnimationData = animation_data_and_lookup[0]
@@ -372,7 +375,7 @@ class EditorSprite(empty_object.EmptyObject):
             new_picnum = animation_data.picnum + offset
 
             self._set_display_size(new_picnum)
-            node_path.set_texture(art_manager.get_tile(new_picnum, lookup))
+            art_manager.set_tile(node_path, new_picnum, lookup)
 
     def update_ambient_sound(self):
         if (
@@ -470,6 +470,11 @@ class EditorWall(empty_object.EmptyObject):
     def get_data(self):
         return self._wall.data
 
+    def get_tile_references(self) -> typing.Iterable[typing.Tuple[int, int]]:
+        yield self._wall.wall.picnum, self._wall.wall.palette
+        if self._has_wall_mask:
+            yield self._wall.wall.over_picnum, self._wall.wall.palette
+
     def get_stat_for_part(self, part: str):
         if self._is_lower_swapped_part(part):
             return self._definite_other_side_wall._wall.wall.stat
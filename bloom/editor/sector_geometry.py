@@ -17,6 +17,9 @@ class GeometryPart:
         self.pannable = pannable
         self.part = part
         self.node: core.PandaNode = None
+        # Batched parts share their node with the rest of the batch, they only
+        # know the rows of its vertex data that are theirs.
+        self.batch_rows: typing.Optional[typing.Tuple[int, int]] = None
 
     @property
     def is_floor(self):
@@ -33,6 +36,11 @@ class GeometryPart:
         return self.node.get_python_tag("node_path")
 
 
+class _BatchedGeometry(typing.NamedTuple):
+    geometry: core.Geom
+    part: GeometryPart
+
+
 class SectorGeometry:
     def __init__(self, scene: core.NodePath, name: str, tile_manager: manager.Manager):
         self._scene = scene
@@ -40,6 +48,7 @@ class SectorGeometry:
 
         self._nodes: typing.Dict[int, typing.Dict[int, core.GeomNode]] = {}
         self._pannable_nodes: typing.List[core.GeomNode] = []
+        self._batched_geometry: typing.List[_BatchedGeometry] = []
         self._tile_manager = tile_manager
         self._node_2d = core.GeomNode(f"{self._name}_2d")
 
@@ -99,6 +108,10 @@ class SectorGeometry:
         return highlight_display
 
     def add_geometry(self, geometry: core.Geom, part: GeometryPart):
+        if self._can_batch(part):
+            self._batched_geometry.append(_BatchedGeometry(geometry, part))
+            return
+
         if part.pannable:
             node = core.GeomNode(f"pannable_geometry_{len(self._pannable_nodes)}")
             node.add_geom(geometry)
@@ -147,10 +160,12 @@ class SectorGeometry:
         return self._tile_manager.get_tile_dimensions(picnum)
 
     def build(self):
+        self._build_batched_geometry()
+
         for lookup, nodes in self._nodes.items():
             for picnum, node in nodes.items():
                 sector_shape: core.NodePath = self._display.attach_new_node(node)
-                sector_shape.set_texture(self._tile_manager.get_tile(picnum, lookup), 1)
+                self._tile_manager.set_tile_async(sector_shape, picnum, lookup, 1)
                 animation_data = self._tile_manager.get_animation_data(picnum)
                 if animation_data is not None:
                     sector_shape.set_name(f"animated_geometry_{lookup}_{picnum}")
@@ -165,7 +180,7 @@ class SectorGeometry:
             lookup = node.get_python_tag("lookup")
 
             sector_shape: core.NodePath = self._display.attach_new_node(node)
-            sector_shape.set_texture(self._tile_manager.get_tile(picnum, lookup), 1)
+            self._tile_manager.set_tile_async(sector_shape, picnum, lookup, 1)
 
             node.set_python_tag("node_path", sector_shape)
 
@@ -173,6 +188,93 @@ class SectorGeometry:
 
         return self._display
 
+    def _can_batch(self, part: GeometryPart):
+        return (
+            self._tile_manager.batched_geometry
+            and not part.pannable
+            and self._tile_manager.get_animation_data(part.picnum) is None
+        )
+
+    def _build_batched_geometry(self):
+        batches: typing.Dict[
+            core.Texture, typing.List[typing.Tuple[_BatchedGeometry, int, core.Vec2]]
+        ] = {}
+        for batched in self._batched_geometry:
+            part = batched.part
+            tile_layer = self._tile_manager.get_tile_layer(part.picnum, part.lookup)
+            if tile_layer is None:
+                node = self._get_node_for_picnum(part.picnum, part.lookup)
+                node.add_geom(batched.geometry)
+                part.node = node
+                continue
+
+            texture, layer, tile_scale = tile_layer
+            batches.setdefault(texture, []).append((batched, layer, tile_scale))
+
+        for texture, parts in batches.items():
+            name = f"batched_geometry_{texture.get_name()}"
+            vertex_data = core.GeomVertexData(
+                name, constants.BATCHED_VERTEX_FORMAT, core.Geom.UH_static
+            )
+            triangles = core.GeomTriangles(core.Geom.UH_static)
+            for batched, layer, tile_scale in parts:
+                first_row = vertex_data.get_num_rows()
+                self._add_to_batch(
+                    vertex_data, triangles, batched.geometry, layer, tile_scale
+                )
+                batched.part.batch_rows = (
+                    first_row,
+                    vertex_data.get_num_rows() - first_row,
+                )
+
+            # Every part shares one state, so the batch is a single draw call.
+            geometry = core.Geom(vertex_data)
+            geometry.add_primitive(triangles)
+            node = core.GeomNode(name)
+            node.add_geom(geometry)
+
+            batch_shape: core.NodePath = self._display.attach_new_node(node)
+            self._tile_manager.set_tile_array(batch_shape, texture, 1)
+            node.set_python_tag("node_path", batch_shape)
+
+    @staticmethod
+    def _add_to_batch(
+        vertex_data: core.GeomVertexData,
+        triangles: core.GeomTriangles,
+        geometry: core.Geom,
+        layer: int,
+        tile_scale: core.Vec2,
+    ):
+        part_data = geometry.get_vertex_data().convert_to(
+            constants.BATCHED_VERTEX_FORMAT
+        )
+        first_row = vertex_data.get_num_rows()
+        row_count = part_data.get_num_rows()
+        stride = constants.BATCHED_VERTEX_FORMAT.get_array(0).get_stride()
+
+        vertex_data.set_num_rows(first_row + row_count)
+        vertex_data.modify_array_handle(0).copy_subdata_from(
+            first_row * stride,
+            row_count * stride,
+            part_data.get_array_handle(0),
+            0,
+            row_count * stride,
+        )
+
+        layer_writer = core.GeomVertexWriter(vertex_data, "layer")
+        layer_writer.set_row(first_row)
+        tile_scale_writer = core.GeomVertexWriter(vertex_data, "tile_scale")
+        tile_scale_writer.set_row(first_row)
+        for _ in range(row_count):
+            layer_writer.set_data1f(layer)
+            tile_scale_writer.set_data2f(tile_scale)
+
+        for primitive in geometry.get_primitives():
+            primitive = primitive.decompose()
+            for index in range(primitive.get_num_vertices()):
+                triangles.add_vertex(first_row + primitive.get_vertex(index))
+        triangles.close_primitive()
+
     @staticmethod
     def _create_2d_vertex_segments(point: core.Point2, colour: core.Vec4):
         segments = core.LineSegs("2d_vertex")
@@ -89,7 +89,7 @@ class SpriteGeometry:
         display: core.NodePath = parent_display.attach_new_node(
             self._card_maker.generate()
         )
-        display.set_texture(self._tile_manager.get_tile(picnum, lookup), 1)
+        self._tile_manager.set_tile_async(display, picnum, lookup, 1)
         animation_data = self._tile_manager.get_animation_data(picnum)
         if animation_data is not None:
             display.set_python_tag("animation_data", (animation_data, lookup))
@@ -0,0 +1,45 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import typing
+
+from ..tiles import manager
+from .map_objects.sector import EditorSector
+
+
+class TilePrefetcher:
+    _MAX_HOPS = 2
+
+    def __init__(self, tile_manager: manager.Manager):
+        self._tile_manager = tile_manager
+        self._visible_sectors: typing.FrozenSet[EditorSector] = frozenset()
+
+    def prefetch(self, visible_sectors: typing.Iterable[EditorSector]):
+        visible_sectors = frozenset(visible_sectors)
+        if visible_sectors == self._visible_sectors:
+            return 0
+        self._visible_sectors = visible_sectors
+
+        requested = 0
+        for hops, editor_sector in self._sectors_ahead(visible_sectors):
+            for picnum, lookup in editor_sector.get_tile_references():
+                # Sectors that are fewer portals away are likely to be seen first.
+                if self._tile_manager.prefetch_tile(picnum, lookup, hops):
+                    requested += 1
+        return requested
+
+    def _sectors_ahead(
+        self, visible_sectors: typing.FrozenSet[EditorSector]
+    ) -> typing.Iterable[typing.Tuple[int, EditorSector]]:
+        seen = set(visible_sectors)
+        frontier = visible_sectors
+        for hops in range(1, self._MAX_HOPS + 1):
+            next_frontier = set()
+            for editor_sector in frontier:
+                for adjacent_sector in editor_sector.adjacent_sectors():
+                    if adjacent_sector in seen:
+                        continue
+                    seen.add(adjacent_sector)
+                    next_frontier.add(adjacent_sector)
+                    yield hops, adjacent_sector
+            frontier = next_frontier
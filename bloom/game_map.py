@@ -1,13 +1,26 @@
 # Copyright 2020 Thomas Rogers
 # SPDX-License-Identifier: Apache-2.0
 
-import os.path
-import pickle
+import itertools
+import mmap
 import typing
 import zlib
 
-from . import constants, data_loading
-from .map_data import headers, sector, sprite, wall
+from . import data_loading, map_cache
+from .map_data import columnar, encoded_records, headers, sector, sprite, wall
+
+
+class MapSummary(typing.NamedTuple):
+    major_version: int
+    minor_version: int
+    encrypted: bool
+    revisions: int
+    sector_count: int
+    wall_count: int
+    sprite_count: int
+    player_position: typing.Tuple[int, int, int]
+    player_theta: int
+    player_sector: int
 
 
 class Map:
@@ -30,14 +43,54 @@ class Map:
         self._sectors: typing.List[sector.Sector] = []
         self._walls: typing.List[wall.Wall] = []
         self._sprites: typing.List[sprite.Sprite] = []
+        self._columns: columnar.MapColumns = None
+        self._mapping: typing.Optional[mmap.mmap] = None
         self._crc: int = None
+        self._encoded_records: typing.Optional[encoded_records.EncodedRecords] = None
 
     @staticmethod
-    def load(map_path: str, map_data: bytes):
+    def load(
+        map_path: str,
+        map_data: bytes,
+        as_columns=False,
+        cache: map_cache.MapCache = None,
+    ):
         result = Map()
-        result._load(map_path, map_data)
+        result._load(map_data, as_columns, cache)
         return result, result._crc
 
+    @staticmethod
+    def probe(map_data: bytes) -> MapSummary:
+        # Only the headers are decoded, records and the checksum are never
+        # touched so listings can describe many maps cheaply.
+        result = Map()
+        result._decode_headers(data_loading.Unpacker(map_data))
+        return MapSummary(
+            major_version=result._header_0.major_version,
+            minor_version=result._header_0.minor_version,
+            encrypted=result._encrypted,
+            revisions=result._header_3.revisions,
+            sector_count=result._header_3.sector_count,
+            wall_count=result._header_3.wall_count,
+            sprite_count=result._header_3.sprite_count,
+            player_position=tuple(result._header_1.player_position),
+            player_theta=result._header_1.player_theta,
+            player_sector=result._header_1.player_sector,
+        )
+
+    @staticmethod
+    def probe_size():
+        return sum(
+            header_type.size()
+            for header_type in [
+                headers.MapHeader0,
+                headers.MapHeader1,
+                headers.MapHeader2,
+                headers.MapHeader3,
+                headers.MapHeader4,
+            ]
+        )
+
     def new(self):
         new_sector = sector.Sector()
         new_sector.sector.floor_z = self._DEFAULT_MAP_SIZE * 16
@@ -97,53 +150,111 @@ class Map:
 
         self._header_1.player_sector = 0
 
-    @staticmethod
-    def _get_cache_name(map_path: str):
-        map_name = os.path.basename(map_path)
-        return os.path.join(constants.CACHE_PATH, f"{map_name}.mapcache")
-
-    def _load_from_cache(self, map_path) -> bool:
-        if not constants.MAP_CACHE_ENABLED:
-            return False
-
-        cache_path = self._get_cache_name(map_path)
-        if os.path.exists(cache_path):
-            with open(cache_path, "rb") as file:
-                self._header_0 = pickle.load(file)
-                self._encrypted = pickle.load(file)
-                self._header_1 = pickle.load(file)
-                self._header_2 = pickle.load(file)
-                self._header_3 = pickle.load(file)
-                self._header_4 = pickle.load(file)
-                self._sky_offsets = pickle.load(file)
-                self._sectors = pickle.load(file)
-                self._walls = pickle.load(file)
-                self._sprites = pickle.load(file)
-            return True
-        return False
-
-    def _save_to_cache(self, map_path):
-        if not constants.MAP_CACHE_ENABLED:
+    def _load(
+        self,
+        map_data: bytes,
+        as_columns: bool,
+        cache: typing.Optional[map_cache.MapCache],
+    ):
+        if cache is None:
+            self._decode(map_data, as_columns)
             return
 
-        cache_path = self._get_cache_name(map_path)
-        with open(cache_path, "w+b") as file:
-            pickle.dump(self._header_0, file)
-            pickle.dump(self._encrypted, file)
-            pickle.dump(self._header_1, file)
-            pickle.dump(self._header_2, file)
-            pickle.dump(self._header_3, file)
-            pickle.dump(self._header_4, file)
-            pickle.dump(self._sky_offsets, file)
-            pickle.dump(self._sectors, file)
-            pickle.dump(self._walls, file)
-            pickle.dump(self._sprites, file)
-
-    def _load(self, map_path: str, map_data: bytes):
-        if self._load_from_cache(map_path):
+        # Cached maps come back as columns mapped straight from the cache
+        # file, records are only built if something asks for them.
+        cached = cache.load(map_data)
+        if cached is None:
+            self._decode(map_data, True)
+            cache.store(map_data, self._to_cache())
+        else:
+            self._load_from_cache(cached)
+
+    def close(self):
+        """
+        Release the cache file a cached map was mapped from, the records are
+        built first so the map stays usable afterwards.
+        """
+        if self._columns is None:
             return
 
+        self.sectors
+        self.walls
+        self.sprites
+        self._columns = None
+
+        if self._mapping is not None:
+            try:
+                self._mapping.close()
+            except BufferError:
+                # Columns handed out earlier still point into the mapping,
+                # it is closed once they are gone.
+                pass
+            self._mapping = None
+
+    def _load_from_cache(self, cached: map_cache.CachedMap):
+        self._encrypted = cached.encrypted
+        self._header_0 = cached.header_0
+        self._header_1 = cached.header_1
+        self._header_2 = cached.header_2
+        self._header_3 = cached.header_3
+        self._header_4 = cached.header_4
+        self._sky_offsets = cached.sky_offsets
+        self._columns = cached.columns
+        self._mapping = cached.mapping
+        self._sectors = None
+        self._walls = None
+        self._sprites = None
+        self._crc = cached.crc
+
+    def _to_cache(self):
+        return map_cache.CachedMap(
+            encrypted=self._encrypted,
+            header_0=self._header_0,
+            header_1=self._header_1,
+            header_2=self._header_2,
+            header_3=self._header_3,
+            header_4=self._header_4,
+            sky_offsets=self._sky_offsets,
+            columns=self._columns,
+            crc=self._crc,
+        )
+
+    def _decode(self, map_data: bytes, as_columns: bool):
         unpacker = data_loading.Unpacker(map_data)
+        self._decode_headers(unpacker)
+
+        if self._encrypted:
+            sky_offsets_size = unpacker.get_xor_encrypted_bytes(2, 0x00)
+            unpacker.seek_incrementally(-2)
+            self._sky_offsets = unpacker.read_multiple_xor_encrypted_members(
+                data_loading.Int16, sky_offsets_size[0] // 2, sky_offsets_size[0]
+            )
+        else:
+            self._sky_offsets = unpacker.read_multiple_members(data_loading.Int16, 16)
+
+        if not self._header_2.has_sky:
+            self._sky_offsets = [0]
+
+        if as_columns:
+            self._columns = columnar.MapColumns(
+                sector.load_sector_columns(unpacker, self._encrypted, self._header_3),
+                wall.load_wall_columns(unpacker, self._encrypted, self._header_3),
+                sprite.load_sprite_columns(unpacker, self._encrypted, self._header_3),
+            )
+            self._sectors = None
+            self._walls = None
+            self._sprites = None
+        else:
+            self._sectors = sector.load_sectors(
+                unpacker, self._encrypted, self._header_3
+            )
+            self._walls = wall.load_walls(unpacker, self._encrypted, self._header_3)
+            self._sprites = sprite.load_sprites(
+                unpacker, self._encrypted, self._header_3
+            )
+        self._crc = unpacker.read_member(data_loading.UInt32)
+
+    def _decode_headers(self, unpacker: data_loading.Unpacker):
         self._header_0 = unpacker.read_struct(headers.MapHeader0)
 
         if self._header_0.major_version == 6 and self._header_0.minor_version == 3:
@@ -178,25 +289,6 @@ class Map:
         else:
             self._header_4 = None
 
-        if self._encrypted:
-            sky_offsets_size = unpacker.get_xor_encrypted_bytes(2, 0x00)
-            unpacker.seek_incrementally(-2)
-            self._sky_offsets = unpacker.read_multiple_xor_encrypted_members(
-                data_loading.Int16, sky_offsets_size[0] // 2, sky_offsets_size[0]
-            )
-        else:
-            self._sky_offsets = unpacker.read_multiple_members(data_loading.Int16, 16)
-
-        if not self._header_2.has_sky:
-            self._sky_offsets = [0]
-
-        self._sectors = sector.load_sectors(unpacker, self._encrypted, self._header_3)
-        self._walls = wall.load_walls(unpacker, self._encrypted, self._header_3)
-        self._sprites = sprite.load_sprites(unpacker, self._encrypted, self._header_3)
-        self._crc = unpacker.read_member(data_loading.UInt32)
-
-        self._save_to_cache(map_path)
-
     def set_builder_position(
         self,
         start_position_x: int,
@@ -218,12 +310,15 @@ class Map:
         else:
             self._header_2.has_sky = 0
 
-    def save(self, map_path: str) -> typing.Tuple[bytes, int]:
-        packer = data_loading.Packer()
+    def set_encoded_records(self, encoded: encoded_records.EncodedRecords):
+        self._encoded_records = encoded
 
+    def save(self, map_path: str) -> typing.Tuple[bytes, int]:
         reverse_counter = self._MAX_XSPRITES
-        for sprite_index, map_sprite in enumerate(self._sprites):
-            if map_sprite.sprite.tags[0] < 1 and map_sprite.data.is_default():
+        for sprite_index, map_sprite in enumerate(self.sprites):
+            if map_sprite.sprite.tags[0] < 1 and self._data_is_default(
+                sprite.ENCODED_LAYOUT, map_sprite
+            ):
                 map_sprite.sprite.tags[2] = -1
                 map_sprite.data.sprite_actor_index = 0
             else:
@@ -232,16 +327,20 @@ class Map:
                 map_sprite.data.sprite_actor_index = sprite_index
 
         reverse_counter = self._MAX_XWALLS
-        for map_wall in self._walls:
-            if map_wall.wall.tags[0] < 1 and map_wall.data.is_default():
+        for map_wall in self.walls:
+            if map_wall.wall.tags[0] < 1 and self._data_is_default(
+                wall.ENCODED_LAYOUT, map_wall
+            ):
                 map_wall.wall.tags[2] = -1
             else:
                 reverse_counter -= 1
                 map_wall.wall.tags[2] = reverse_counter
 
         reverse_counter = self._MAX_XSECTORS
-        for map_sector in self._sectors:
-            if map_sector.sector.tags[0] < 1 and map_sector.data.is_default():
+        for map_sector in self.sectors:
+            if map_sector.sector.tags[0] < 1 and self._data_is_default(
+                sector.ENCODED_LAYOUT, map_sector
+            ):
                 map_sector.sector.tags[2] = -1
             else:
                 reverse_counter -= 1
@@ -251,9 +350,9 @@ class Map:
         self._header_3.sector_count = len(self._sectors)
         self._header_3.wall_count = len(self._walls)
         self._header_3.sprite_count = len(self._sprites)
+        self.close()
 
-        self._save_to_cache(map_path)
-
+        packer = data_loading.Packer(self._saved_size())
         packer.write_struct(self._header_0)
 
         if self._encrypted:
@@ -284,25 +383,86 @@ class Map:
         else:
             packer.write_multiple_members(data_loading.UInt16, self._sky_offsets)
 
-        sector.save_sectors(packer, self._encrypted, self._header_3, self._sectors)
-        wall.save_walls(packer, self._encrypted, self._header_3, self._walls)
-        sprite.save_sprites(packer, self._encrypted, self._header_3, self._sprites)
+        sector.save_sectors(
+            packer,
+            self._encrypted,
+            self._header_3,
+            self._sectors,
+            self._encoded_records,
+        )
+        wall.save_walls(
+            packer, self._encrypted, self._header_3, self._walls, self._encoded_records
+        )
+        sprite.save_sprites(
+            packer,
+            self._encrypted,
+            self._header_3,
+            self._sprites,
+            self._encoded_records,
+        )
+        if self._encoded_records is not None:
+            self._encoded_records.prune(
+                itertools.chain(self._sectors, self._walls, self._sprites)
+            )
 
-        self._crc = zlib.crc32(packer.get_bytes())
+        with packer.view() as saved_data:
+            self._crc = zlib.crc32(saved_data)
         packer.write_member(data_loading.UInt32, self._crc)
 
         return packer.get_bytes(), self._crc
 
+    def _data_is_default(self, layout: encoded_records.RecordLayout, record):
+        if self._encoded_records is None:
+            return layout.data(record).is_default()
+        return self._encoded_records.data_is_default(layout, record)
+
+    def _saved_size(self):
+        header_types = [
+            headers.MapHeader0,
+            headers.MapHeader1,
+            headers.MapHeader2,
+            headers.MapHeader3,
+        ]
+        if self._header_4 is not None:
+            header_types.append(headers.MapHeader4)
+        size = sum(header_type.size() for header_type in header_types)
+        size += data_loading.UInt16.size() * len(self._sky_offsets)
+
+        size += sector.BuildSector.size() * len(self._sectors)
+        size += sector.BloodSectorData.size() * sum(
+            1 for map_sector in self._sectors if map_sector.sector.tags[2] > 0
+        )
+        size += wall.BuildWall.size() * len(self._walls)
+        size += wall.BloodWallData.size() * sum(
+            1 for map_wall in self._walls if map_wall.wall.tags[2] > 0
+        )
+        size += sprite.BuildSprite.size() * len(self._sprites)
+        size += sprite.BloodSpriteData.size() * sum(
+            1 for map_sprite in self._sprites if map_sprite.sprite.tags[2] > 0
+        )
+
+        return size + data_loading.UInt32.size()
+
+    @property
+    def columns(self) -> columnar.MapColumns:
+        return self._columns
+
     @property
     def sectors(self) -> typing.List[sector.Sector]:
+        if self._sectors is None:
+            self._sectors = self._columns.sectors.records()
         return self._sectors
 
     @property
     def walls(self) -> typing.List[wall.Wall]:
+        if self._walls is None:
+            self._walls = self._columns.walls.records()
         return self._walls
 
     @property
     def sprites(self) -> typing.List[sprite.Sprite]:
+        if self._sprites is None:
+            self._sprites = self._columns.sprites.records()
         return self._sprites
 
     @property
@@ -0,0 +1,230 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import hashlib
+import logging
+import mmap
+import os
+import os.path
+import threading
+import typing
+
+import numpy
+
+from . import data_loading
+from .map_data import columnar, headers, sector, sprite, wall
+
+logger = logging.getLogger(__name__)
+
+
+class Header(data_loading.CustomStruct):
+    magic: data_loading.Magic
+    version: data_loading.UInt32
+    digest: data_loading.SizedType(bytes, 16)
+    encrypted: data_loading.UInt8
+    has_header_4: data_loading.UInt8
+    sky_offset_count: data_loading.UInt16
+    sector_count: data_loading.UInt32
+    wall_count: data_loading.UInt32
+    sprite_count: data_loading.UInt32
+    crc: data_loading.UInt32
+
+
+class CachedMap(typing.NamedTuple):
+    encrypted: bool
+    header_0: headers.MapHeader0
+    header_1: headers.MapHeader1
+    header_2: headers.MapHeader2
+    header_3: headers.MapHeader3
+    header_4: typing.Optional[headers.MapHeader4]
+    sky_offsets: typing.List[int]
+    columns: columnar.MapColumns
+    crc: int
+    mapping: typing.Optional[mmap.mmap] = None
+
+
+class CacheStats(typing.NamedTuple):
+    hits: int
+    misses: int
+    rejected_files: int
+
+
+_HEADER_TYPES = [
+    headers.MapHeader0,
+    headers.MapHeader1,
+    headers.MapHeader2,
+    headers.MapHeader3,
+    headers.MapHeader4,
+]
+_RECORD_TYPES = [sector.Sector, wall.Wall, sprite.Sprite]
+
+
+def _record_sizes(record_type: type) -> typing.Tuple[int, int]:
+    (_, build_type), (_, data_type) = record_type.type_hints().items()
+    return build_type.size(), data_type.size()
+
+
+class MapCache:
+    MAGIC = b"BMPC"
+    VERSION = 1
+
+    def __init__(self, directory: str):
+        self._directory = directory
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._rejected_files = 0
+
+    @property
+    def stats(self):
+        with self._lock:
+            return CacheStats(self._hits, self._misses, self._rejected_files)
+
+    def load(self, map_data: bytes) -> typing.Optional[CachedMap]:
+        digest = self._digest(map_data)
+        path = self._path(digest)
+
+        cached = None
+        if os.path.exists(path):
+            cached = self._map(path, digest)
+            if cached is None:
+                logger.info(f"Map cache {path} does not match its map, rebuilding")
+                with self._lock:
+                    self._rejected_files += 1
+
+        with self._lock:
+            if cached is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return cached
+
+    def store(self, map_data: bytes, cached: CachedMap):
+        digest = self._digest(map_data)
+        path = self._path(digest)
+        os.makedirs(self._directory, exist_ok=True)
+
+        header = Header(
+            magic=self.MAGIC,
+            version=self.VERSION,
+            digest=digest,
+            encrypted=int(cached.encrypted),
+            has_header_4=int(cached.header_4 is not None),
+            sky_offset_count=len(cached.sky_offsets),
+            sector_count=len(cached.columns.sectors),
+            wall_count=len(cached.columns.walls),
+            sprite_count=len(cached.columns.sprites),
+            crc=cached.crc,
+        )
+        map_headers = [
+            cached.header_0,
+            cached.header_1,
+            cached.header_2,
+            cached.header_3,
+            cached.header_4 or headers.MapHeader4.default(),
+        ]
+
+        # Write next to the destination and swap it in, so a concurrent
+        # launch never maps a half written file.
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(header.codec().pack(header))
+            for map_header in map_headers:
+                file.write(map_header.codec().pack(map_header))
+            file.write(numpy.array(cached.sky_offsets, dtype="<i2").tobytes())
+            for records in cached.columns:
+                file.write(numpy.ascontiguousarray(records.build_records).tobytes())
+                file.write(numpy.ascontiguousarray(records.data_records).tobytes())
+                file.write(records.has_data.astype(numpy.bool_).tobytes())
+        os.replace(temporary_path, path)
+
+    def _path(self, digest: bytes):
+        return os.path.join(self._directory, f"{digest.hex()}.mapcache")
+
+    def _digest(self, map_data: bytes):
+        # Fold the record layouts in as well, so a cache written by a build
+        # with different structures is never read back.
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.VERSION.to_bytes(4, "little"))
+        for record_type in _RECORD_TYPES:
+            for size in _record_sizes(record_type):
+                digest.update(size.to_bytes(4, "little"))
+        digest.update(map_data)
+        return digest.digest()
+
+    def _map(self, path: str, digest: bytes) -> typing.Optional[CachedMap]:
+        with open(path, "rb") as file:
+            header_data = file.read(Header.size())
+            if len(header_data) < Header.size():
+                return None
+
+            header = Header.codec().unpack_from(header_data)
+            if (
+                header.magic != self.MAGIC
+                or header.version != self.VERSION
+                or header.digest != digest
+            ):
+                return None
+
+            counts = [header.sector_count, header.wall_count, header.sprite_count]
+            if os.fstat(file.fileno()).st_size != self._expected_size(
+                header.sky_offset_count, counts
+            ):
+                return None
+
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        offset = Header.size()
+        map_headers = []
+        for header_type in _HEADER_TYPES:
+            map_headers.append(header_type.codec().unpack_from(mapping, offset))
+            offset += header_type.size()
+
+        sky_offsets = numpy.frombuffer(
+            mapping, dtype="<i2", count=header.sky_offset_count, offset=offset
+        ).tolist()
+        offset += data_loading.Int16.size() * header.sky_offset_count
+
+        columns = []
+        for record_type, count in zip(_RECORD_TYPES, counts):
+            build_size, data_size = _record_sizes(record_type)
+            build_records = numpy.frombuffer(
+                mapping, dtype=numpy.uint8, count=count * build_size, offset=offset
+            ).reshape((count, build_size))
+            offset += count * build_size
+            data_records = numpy.frombuffer(
+                mapping, dtype=numpy.uint8, count=count * data_size, offset=offset
+            ).reshape((count, data_size))
+            offset += count * data_size
+            has_data = numpy.frombuffer(
+                mapping, dtype=numpy.bool_, count=count, offset=offset
+            )
+            offset += count
+            columns.append(
+                columnar.RecordColumns(
+                    record_type, build_records, data_records, has_data
+                )
+            )
+
+        return CachedMap(
+            encrypted=bool(header.encrypted),
+            header_0=map_headers[0],
+            header_1=map_headers[1],
+            header_2=map_headers[2],
+            header_3=map_headers[3],
+            header_4=map_headers[4] if header.has_header_4 else None,
+            sky_offsets=sky_offsets,
+            columns=columnar.MapColumns(*columns),
+            crc=header.crc,
+            mapping=mapping,
+        )
+
+    @staticmethod
+    def _expected_size(sky_offset_count: int, counts: typing.List[int]):
+        size = Header.size()
+        size += sum(header_type.size() for header_type in _HEADER_TYPES)
+        size += data_loading.Int16.size() * sky_offset_count
+        for record_type, count in zip(_RECORD_TYPES, counts):
+            build_size, data_size = _record_sizes(record_type)
+            size += count * (build_size + data_size + 1)
+        return size
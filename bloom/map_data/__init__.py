@@ -1,4 +1,4 @@
 # Copyright 2020 Thomas Rogers
 # SPDX-License-Identifier: Apache-2.0
 
-from . import sector, sprite, wall
+from . import columnar, sector, sprite, wall
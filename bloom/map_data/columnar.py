@@ -0,0 +1,172 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import typing
+
+import numpy
+
+from .. import data_loading
+
+T = typing.TypeVar("T")
+
+_X_INDEX_SIZE = data_loading.Int16.size()
+
+
+class RecordColumns:
+    def __init__(
+        self,
+        record_type: type,
+        build_records: numpy.ndarray,
+        data_records: numpy.ndarray,
+        has_data: numpy.ndarray,
+    ):
+        self._record_type = record_type
+        (self._build_name, self._build_type), (
+            self._data_name,
+            self._data_type,
+        ) = record_type.type_hints().items()
+
+        self._build_records = build_records
+        self._data_records = data_records
+        self._has_data = has_data
+        self._columns: typing.Dict[str, numpy.ndarray] = None
+
+    def __len__(self):
+        return len(self._build_records)
+
+    def __getitem__(self, column_name: str) -> numpy.ndarray:
+        return self.columns[column_name]
+
+    @property
+    def record_type(self):
+        return self._record_type
+
+    @property
+    def build_records(self) -> numpy.ndarray:
+        return self._build_records
+
+    @property
+    def data_records(self) -> numpy.ndarray:
+        return self._data_records
+
+    @property
+    def has_data(self) -> numpy.ndarray:
+        return self._has_data
+
+    @property
+    def columns(self) -> typing.Dict[str, numpy.ndarray]:
+        if self._columns is None:
+            self._columns = self._build_type.codec().decode_columns(
+                self._build_records, f"{self._build_name}."
+            )
+            self._columns.update(
+                self._data_type.codec().decode_columns(
+                    self._data_records, f"{self._data_name}."
+                )
+            )
+        return self._columns
+
+    def record(self, index: int) -> T:
+        build = self._build_type.codec().unpack_from(self._build_records[index])
+        data = self._data_type.codec().unpack_from(self._data_records[index])
+        return self._record_type(**{self._build_name: build, self._data_name: data})
+
+    def records(self) -> typing.List[T]:
+        return [self.record(index) for index in range(len(self))]
+
+
+class MapColumns(typing.NamedTuple):
+    sectors: RecordColumns
+    walls: RecordColumns
+    sprites: RecordColumns
+
+
+def from_records(records: typing.List[T], record_type: type) -> RecordColumns:
+    (build_name, build_type), (data_name, data_type) = record_type.type_hints().items()
+    build_codec = build_type.codec()
+    data_codec = data_type.codec()
+
+    build_records = numpy.frombuffer(
+        b"".join(build_codec.pack(getattr(record, build_name)) for record in records),
+        dtype=numpy.uint8,
+    ).reshape((len(records), build_type.size()))
+    data_records = numpy.frombuffer(
+        b"".join(data_codec.pack(getattr(record, data_name)) for record in records),
+        dtype=numpy.uint8,
+    ).reshape((len(records), data_type.size()))
+    has_data = numpy.array(
+        [getattr(record, build_name).tags[2] > 0 for record in records],
+        dtype=numpy.bool_,
+    ).reshape(-1)
+
+    return RecordColumns(record_type, build_records, data_records, has_data)
+
+
+def load_records(
+    unpacker: data_loading.Unpacker, record_type: type, count: int, key: int
+) -> RecordColumns:
+    (build_name, build_type), (_, data_type) = record_type.type_hints().items()
+    build_size = build_type.size()
+    data_size = data_type.size()
+
+    build_offsets, data_offsets = _find_record_offsets(
+        unpacker, build_name, build_size, data_size, count, key
+    )
+
+    source = numpy.frombuffer(unpacker.buffer, dtype=numpy.uint8)
+    build_records = source[build_offsets[:, None] + numpy.arange(build_size)]
+    if key is not None:
+        build_records ^= data_loading.xor_key_stream(key, build_size)
+
+    has_data = data_offsets >= 0
+    default_data = numpy.frombuffer(data_type.codec().pack(data_type()), numpy.uint8)
+    data_records = numpy.empty((count, data_size), dtype=numpy.uint8)
+    data_records[:] = default_data
+    data_records[has_data] = source[
+        data_offsets[has_data][:, None] + numpy.arange(data_size)
+    ]
+
+    return RecordColumns(record_type, build_records, data_records, has_data)
+
+
+def _find_record_offsets(
+    unpacker: data_loading.Unpacker,
+    build_name: str,
+    build_size: int,
+    data_size: int,
+    count: int,
+    key: int,
+):
+    x_index_offset = build_size - _X_INDEX_SIZE
+    if key is None:
+        low_key = 0
+        high_key = 0
+    else:
+        low_key, high_key = data_loading.xor_key_stream(key, build_size)[
+            x_index_offset:
+        ].tolist()
+
+    buffer = unpacker.buffer
+    offset = unpacker.offset
+    build_offsets = []
+    data_offsets = []
+    for _ in range(count):
+        build_offsets.append(offset)
+        x_index = (buffer[offset + x_index_offset] ^ low_key) | (
+            (buffer[offset + x_index_offset + 1] ^ high_key) << 8
+        )
+        offset += build_size
+
+        if 0 < x_index < 0x8000:
+            data_offsets.append(offset)
+            offset += data_size
+        elif x_index == 0 or x_index == 0xFFFF:
+            data_offsets.append(-1)
+        else:
+            raise ValueError(f"Unable to parse {build_name} data")
+
+    unpacker.seek(offset)
+    return (
+        numpy.array(build_offsets, dtype=numpy.int64).reshape(-1),
+        numpy.array(data_offsets, dtype=numpy.int64).reshape(-1),
+    )
@@ -0,0 +1,221 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import inspect
+import threading
+import typing
+
+import numpy
+
+from .. import data_loading
+
+
+class _EncodedRecord(typing.NamedTuple):
+    record: typing.Any
+    build: bytes
+    data: typing.Optional[bytes]
+    data_is_default: typing.Optional[bool]
+    build_values: data_loading.CustomStruct
+    data_values: data_loading.CustomStruct
+
+
+class EncodeStats(typing.NamedTuple):
+    reused: int
+    encoded: int
+
+
+class RecordLayout:
+    """
+    Describes how the build and data parts of a record are encoded.
+
+    The bytes of each part are encoded from a copy of its values, the copy is
+    compared to the record on the next save and the part only encoded again
+    when they differ.
+    """
+
+    def __init__(self, record_type: type, x_name: str):
+        (self._build_name, build_type), (self._data_name, data_type) = (
+            record_type.type_hints().items()
+        )
+        self._build_size = build_type.size()
+        self._default_data = data_type.codec().pack(data_type.default())
+        self._build_copy_plan = self._copy_plan(build_type)
+        self._data_copy_plan = self._copy_plan(data_type)
+        self._x_name = x_name
+
+    @property
+    def build_size(self):
+        return self._build_size
+
+    @property
+    def x_name(self):
+        return self._x_name
+
+    def build(self, record) -> data_loading.CustomStruct:
+        return getattr(record, self._build_name)
+
+    def data(self, record) -> data_loading.CustomStruct:
+        return getattr(record, self._data_name)
+
+    def encode(self, record) -> _EncodedRecord:
+        build_values = self._copy_values(self.build(record), self._build_copy_plan)
+        encoded = _EncodedRecord(
+            record,
+            build_values.codec().pack(build_values),
+            None,
+            None,
+            build_values,
+            self._copy_values(self.data(record), self._data_copy_plan),
+        )
+        return self._with_data(encoded)
+
+    def refresh(self, encoded: _EncodedRecord) -> _EncodedRecord:
+        build = self.build(encoded.record)
+        if build.__dict__ != encoded.build_values.__dict__:
+            build_values = self._copy_values(build, self._build_copy_plan)
+            encoded = encoded._replace(
+                build=build_values.codec().pack(build_values),
+                build_values=build_values,
+            )
+
+        if not self.data_is_current(encoded):
+            encoded = encoded._replace(
+                data=None,
+                data_is_default=None,
+                data_values=self._copy_values(
+                    self.data(encoded.record), self._data_copy_plan
+                ),
+            )
+
+        return self._with_data(encoded)
+
+    def data_is_current(self, encoded: _EncodedRecord) -> bool:
+        return self.data(encoded.record).__dict__ == encoded.data_values.__dict__
+
+    def _with_data(self, encoded: _EncodedRecord) -> _EncodedRecord:
+        # Data is only written for records with an x index, like full saves
+        # only encode it when it is needed.
+        if encoded.data is not None or encoded.build_values.tags[2] < 1:
+            return encoded
+
+        data = encoded.data_values.codec().pack(encoded.data_values)
+        return encoded._replace(data=data, data_is_default=data == self._default_data)
+
+    @staticmethod
+    def _copy_plan(struct_type: type):
+        plan = []
+        for name, hint_type in struct_type.type_hints().items():
+            if inspect.isclass(hint_type) and issubclass(
+                hint_type, data_loading.CustomStruct
+            ):
+                plan.append((name, RecordLayout._copy_plan(hint_type)))
+            elif isinstance(hint_type, data_loading.SizedType):
+                plan.append((name, None))
+        return plan
+
+    @staticmethod
+    def _copy_values(structure: data_loading.CustomStruct, plan):
+        # Records are edited in place, so keep our own copy to compare to and
+        # encode from, the bytes then always match the values they came from.
+        result = structure.__class__.__new__(structure.__class__)
+        values = result.__dict__
+        values.update(structure.__dict__)
+        for name, inner_plan in plan:
+            value = values[name]
+            if inner_plan is not None:
+                values[name] = RecordLayout._copy_values(value, inner_plan)
+            elif isinstance(value, list):
+                values[name] = list(value)
+        return result
+
+
+class EncodedRecords:
+    """
+    Remembers the encoded bytes of every record written by a save.
+
+    Each save compares records to the values they were last encoded from and
+    only encodes the ones that changed, so edits never need to be reported.
+
+    Saves may run on a background thread, the remembered records are only
+    read and stored under a lock.
+    """
+
+    def __init__(self):
+        self._records: typing.Dict[int, _EncodedRecord] = {}
+        self._lock = threading.Lock()
+        self._reused = 0
+        self._encoded = 0
+
+    @property
+    def stats(self):
+        return EncodeStats(self._reused, self._encoded)
+
+    def data_is_default(self, layout: RecordLayout, record) -> bool:
+        with self._lock:
+            encoded = self._get(record)
+            if encoded is None or not layout.data_is_current(encoded):
+                return layout.data(record).is_default()
+
+            if encoded.data_is_default is None:
+                encoded = encoded._replace(
+                    data_is_default=encoded.data_values.is_default()
+                )
+                self._records[id(record)] = encoded
+            return encoded.data_is_default
+
+    def write(
+        self,
+        packer: data_loading.Packer,
+        layout: RecordLayout,
+        records: typing.List[typing.Any],
+        key: typing.Optional[int],
+    ):
+        encoded_records: typing.List[_EncodedRecord] = []
+        with self._lock:
+            for record in records:
+                previous = self._get(record)
+                if previous is None:
+                    encoded = layout.encode(record)
+                else:
+                    encoded = layout.refresh(previous)
+
+                if encoded is previous:
+                    self._reused += 1
+                else:
+                    self._encoded += 1
+                    self._records[id(record)] = encoded
+                encoded_records.append(encoded)
+
+        builds = numpy.frombuffer(
+            b"".join(encoded.build for encoded in encoded_records), dtype=numpy.uint8
+        ).reshape((len(records), layout.build_size))
+        if key is not None:
+            builds = builds ^ data_loading.xor_key_stream(key, layout.build_size)
+        build_data = builds.tobytes()
+
+        pieces = []
+        for index, encoded in enumerate(encoded_records):
+            start = index * layout.build_size
+            pieces.append(build_data[start : start + layout.build_size])
+
+            x_index = encoded.build_values.tags[2]
+            if x_index > 0:
+                pieces.append(encoded.data)
+            elif x_index < -1:
+                raise Exception(f"Ran out of {layout.x_name}!")
+        packer.write_bytes(b"".join(pieces))
+
+    def prune(self, records: typing.Iterable[typing.Any]):
+        kept = {id(record) for record in records}
+        with self._lock:
+            self._records = {
+                record_id: encoded
+                for record_id, encoded in self._records.items()
+                if record_id in kept
+            }
+
+    def _get(self, record) -> typing.Optional[_EncodedRecord]:
+        encoded = self._records.get(id(record))
+        if encoded is None or encoded.record is not record:
+            return None
+        return encoded
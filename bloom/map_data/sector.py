@@ -4,7 +4,7 @@
 import typing
 
 from .. import data_loading
-from . import headers
+from . import columnar, encoded_records, headers
 
 
 class Stat(data_loading.CustomStruct):
@@ -145,6 +145,9 @@ class Sector(data_loading.CustomStruct):
     data: BloodSectorData
 
 
+ENCODED_LAYOUT = encoded_records.RecordLayout(Sector, "XSectors")
+
+
 def load_sectors(
     unpacker: data_loading.Unpacker, encrypted: bool, header_3: headers.MapHeader3
 ):
@@ -171,14 +174,30 @@ def load_sectors(
     return result
 
 
+def load_sector_columns(
+    unpacker: data_loading.Unpacker, encrypted: bool, header_3: headers.MapHeader3
+) -> columnar.RecordColumns:
+    if encrypted:
+        key = (header_3.revisions * BuildSector.size()) & 0xFF
+    else:
+        key = None
+
+    return columnar.load_records(unpacker, Sector, header_3.sector_count, key)
+
+
 def save_sectors(
     packer: data_loading.Packer,
     encrypted: bool,
     header_3: headers.MapHeader3,
     sectors: typing.List[Sector],
+    encoded: typing.Optional[encoded_records.EncodedRecords] = None,
 ):
     key = (header_3.revisions * BuildSector.size()) & 0xFF
 
+    if encoded is not None:
+        encoded.write(packer, ENCODED_LAYOUT, sectors, key if encrypted else None)
+        return
+
     for sector in sectors:
         if encrypted:
             packer.write_xor_encrypted_struct(sector.sector, key)
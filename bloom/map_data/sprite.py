@@ -4,7 +4,7 @@
 import typing
 
 from .. import data_loading
-from . import headers
+from . import columnar, encoded_records, headers
 
 
 class Stat(data_loading.CustomStruct):
@@ -138,6 +138,9 @@ class Sprite(data_loading.CustomStruct):
         return new_blood_sprite
 
 
+ENCODED_LAYOUT = encoded_records.RecordLayout(Sprite, "XSprites")
+
+
 def load_sprites(
     unpacker: data_loading.Unpacker, encrypted: bool, header_3: headers.MapHeader3
 ):
@@ -163,14 +166,30 @@ def load_sprites(
     return result
 
 
+def load_sprite_columns(
+    unpacker: data_loading.Unpacker, encrypted: bool, header_3: headers.MapHeader3
+) -> columnar.RecordColumns:
+    if encrypted:
+        key = ((header_3.revisions * BuildSprite.size()) | 0x4D) & 0xFF
+    else:
+        key = None
+
+    return columnar.load_records(unpacker, Sprite, header_3.sprite_count, key)
+
+
 def save_sprites(
     packer: data_loading.Packer,
     encrypted: bool,
     header_3: headers.MapHeader3,
     sprites: typing.List[Sprite],
+    encoded: typing.Optional[encoded_records.EncodedRecords] = None,
 ):
     key = ((header_3.revisions * BuildSprite.size()) | 0x4D) & 0xFF
 
+    if encoded is not None:
+        encoded.write(packer, ENCODED_LAYOUT, sprites, key if encrypted else None)
+        return
+
     for sprite in sprites:
         if encrypted:
             packer.write_xor_encrypted_struct(sprite.sprite, key)
@@ -4,7 +4,7 @@
 import typing
 
 from .. import data_loading
-from . import headers, sector
+from . import columnar, encoded_records, headers, sector
 
 
 class Stat(data_loading.CustomStruct):
@@ -90,6 +90,9 @@ class Wall(data_loading.CustomStruct):
     data: BloodWallData
 
 
+ENCODED_LAYOUT = encoded_records.RecordLayout(Wall, "XWalls")
+
+
 def load_walls(
     unpacker: data_loading.Unpacker, encrypted: bool, header_3: headers.MapHeader3
 ):
@@ -115,14 +118,30 @@ def load_walls(
     return result
 
 
+def load_wall_columns(
+    unpacker: data_loading.Unpacker, encrypted: bool, header_3: headers.MapHeader3
+) -> columnar.RecordColumns:
+    if encrypted:
+        key = ((header_3.revisions * sector.BuildSector.size()) | 0x4D) & 0xFF
+    else:
+        key = None
+
+    return columnar.load_records(unpacker, Wall, header_3.wall_count, key)
+
+
 def save_walls(
     packer: data_loading.Packer,
     encrypted: bool,
     header_3: headers.MapHeader3,
     walls: typing.List[Wall],
+    encoded: typing.Optional[encoded_records.EncodedRecords] = None,
 ):
     key = ((header_3.revisions * sector.BuildSector.size()) | 0x4D) & 0xFF
 
+    if encoded is not None:
+        encoded.write(packer, ENCODED_LAYOUT, walls, key if encrypted else None)
+        return
+
     for wall in walls:
         if encrypted:
             packer.write_xor_encrypted_struct(wall.wall, key)
@@ -0,0 +1,168 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import argparse
+import sys
+import typing
+
+import numpy
+
+from . import game_map
+from .map_data import columnar, sector, sprite, wall
+
+
+class FieldChange(typing.NamedTuple):
+    name: str
+    old_value: typing.Any
+    new_value: typing.Any
+
+    def __str__(self):
+        return f"{self.name} -> {self.old_value} != {self.new_value}"
+
+
+class RecordChange(typing.NamedTuple):
+    index: int
+    fields: typing.List[FieldChange]
+
+
+class RecordDiff(typing.NamedTuple):
+    added: typing.List[int]
+    removed: typing.List[int]
+    modified: typing.List[RecordChange]
+
+    def is_empty(self):
+        return not (self.added or self.removed or self.modified)
+
+
+class MapDiff(typing.NamedTuple):
+    sectors: RecordDiff
+    walls: RecordDiff
+    sprites: RecordDiff
+
+    def is_empty(self):
+        return all(record_diff.is_empty() for record_diff in self)
+
+
+def diff_maps(old_map: game_map.Map, new_map: game_map.Map) -> MapDiff:
+    # Maps loaded as columns are compared straight from their columns, maps
+    # built from records are packed into columns first.
+    old_columns = _columns_for(old_map)
+    new_columns = _columns_for(new_map)
+    return MapDiff(
+        *(
+            diff_records(old_records, new_records)
+            for old_records, new_records in zip(old_columns, new_columns)
+        )
+    )
+
+
+def diff_records(
+    old_records: columnar.RecordColumns, new_records: columnar.RecordColumns
+) -> RecordDiff:
+    """
+    Compares records by index, the same way CustomStruct.diff compares members.
+
+    Rows are compared as raw bytes first, only rows that differ are decoded
+    into columns to find which fields changed.
+    """
+    common_count = min(len(old_records), len(new_records))
+    changed_rows = numpy.flatnonzero(
+        _changed_rows(
+            old_records.build_records, new_records.build_records, common_count
+        )
+        | _changed_rows(
+            old_records.data_records, new_records.data_records, common_count
+        )
+    )
+
+    old_columns = _decode_rows(old_records, changed_rows)
+    new_columns = _decode_rows(new_records, changed_rows)
+    changed_fields: typing.List[typing.List[FieldChange]] = [
+        [] for _ in range(len(changed_rows))
+    ]
+    for name, old_column in old_columns.items():
+        new_column = new_columns[name]
+        different = old_column != new_column
+        if different.ndim > 1:
+            different = different.any(axis=tuple(range(1, different.ndim)))
+
+        for row in numpy.flatnonzero(different).tolist():
+            changed_fields[row].append(
+                FieldChange(name, old_column[row].tolist(), new_column[row].tolist())
+            )
+
+    return RecordDiff(
+        added=list(range(common_count, len(new_records))),
+        removed=list(range(common_count, len(old_records))),
+        modified=[
+            RecordChange(index, fields)
+            for index, fields in zip(changed_rows.tolist(), changed_fields)
+        ],
+    )
+
+
+def format_diff(map_diff: MapDiff) -> typing.Iterable[str]:
+    for record_name, record_diff in zip(MapDiff._fields, map_diff):
+        singular_name = record_name[:-1]
+        for index in record_diff.removed:
+            yield f"- {singular_name} {index}"
+        for index in record_diff.added:
+            yield f"+ {singular_name} {index}"
+        for change in record_diff.modified:
+            yield f"~ {singular_name} {change.index}"
+            for field in change.fields:
+                yield f"    {field}"
+
+
+def _columns_for(map_to_diff: game_map.Map) -> columnar.MapColumns:
+    if map_to_diff.columns is not None:
+        return map_to_diff.columns
+
+    return columnar.MapColumns(
+        columnar.from_records(map_to_diff.sectors, sector.Sector),
+        columnar.from_records(map_to_diff.walls, wall.Wall),
+        columnar.from_records(map_to_diff.sprites, sprite.Sprite),
+    )
+
+
+def _changed_rows(old_rows: numpy.ndarray, new_rows: numpy.ndarray, count: int):
+    return (old_rows[:count] != new_rows[:count]).any(axis=1)
+
+
+def _decode_rows(records: columnar.RecordColumns, rows: numpy.ndarray):
+    (build_name, build_type), (data_name, data_type) = (
+        records.record_type.type_hints().items()
+    )
+    columns = build_type.codec().decode_columns(
+        records.build_records[rows], f"{build_name}."
+    )
+    columns.update(
+        data_type.codec().decode_columns(records.data_records[rows], f"{data_name}.")
+    )
+    return columns
+
+
+def main(arguments: typing.List[str] = None):
+    parser = argparse.ArgumentParser(
+        prog="python -m bloom.map_diff",
+        description="Show which sectors, walls and sprites differ between two maps",
+    )
+    parser.add_argument("old_path", help="Map to compare from, e.g. a backup")
+    parser.add_argument("new_path", help="Map to compare to")
+    options = parser.parse_args(arguments)
+
+    maps = []
+    for path in [options.old_path, options.new_path]:
+        with open(path, "rb") as file:
+            loaded_map, _ = game_map.Map.load(path, file.read(), as_columns=True)
+        maps.append(loaded_map)
+
+    map_diff = diff_maps(*maps)
+    for line in format_diff(map_diff):
+        print(line)
+
+    return 0 if map_diff.is_empty() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,15 @@
+#version 130
+
+// Each layer holds one tile, repeated to fill it when the tile is smaller
+// than the layer. Wrapping is done here so tiles repeat at their own size.
+uniform sampler2DArray p3d_Texture0;
+uniform vec4 p3d_ColorScale;
+
+in vec2 texcoord;
+in vec3 tile;
+in vec4 colour;
+
+void main() {
+    vec3 layer_texcoord = vec3(fract(texcoord) * tile.xy, tile.z);
+    gl_FragColor = texture(p3d_Texture0, layer_texcoord) * colour * p3d_ColorScale;
+}
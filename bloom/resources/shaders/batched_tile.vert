@@ -0,0 +1,21 @@
+#version 130
+
+uniform mat4 p3d_ModelViewProjectionMatrix;
+uniform mat4 p3d_TextureMatrix[1];
+
+in vec4 p3d_Vertex;
+in vec4 p3d_Color;
+in vec2 p3d_MultiTexCoord0;
+in float layer;
+in vec2 tile_scale;
+
+out vec2 texcoord;
+out vec3 tile;
+out vec4 colour;
+
+void main() {
+    gl_Position = p3d_ModelViewProjectionMatrix * p3d_Vertex;
+    texcoord = (p3d_TextureMatrix[0] * vec4(p3d_MultiTexCoord0, 0, 1)).xy;
+    tile = vec3(tile_scale, layer);
+    colour = p3d_Color;
+}
@@ -0,0 +1,27 @@
+#version 120
+
+// Tiles are uploaded as 8-bit palette indices. The PLU texture holds one
+// row per shade level (64 rows of 256 remapped indices) and the palette
+// texture maps the remapped index to BGRA.
+uniform sampler2D p3d_Texture0;
+uniform sampler2D palette;
+uniform sampler2D lookup;
+uniform vec4 p3d_ColorScale;
+
+varying vec2 texcoord;
+varying vec4 colour;
+
+const float SHADE_COUNT = 64.0;
+
+void main() {
+    float index = texture2D(p3d_Texture0, texcoord).r * 255.0;
+
+    // Geometry brightness is 1 - shade / 64, so recover the shade row from it.
+    float shade = clamp(floor((1.0 - colour.r) * SHADE_COUNT), 0.0, SHADE_COUNT - 1.0);
+    float remapped = texture2D(
+        lookup, vec2((index + 0.5) / 256.0, (shade + 0.5) / SHADE_COUNT)
+    ).r * 255.0;
+
+    vec4 tile_colour = texture2D(palette, vec2((remapped + 0.5) / 256.0, 0.5));
+    gl_FragColor = vec4(tile_colour.rgb, tile_colour.a * colour.a) * p3d_ColorScale;
+}
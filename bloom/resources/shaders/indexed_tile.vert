@@ -0,0 +1,17 @@
+#version 120
+
+uniform mat4 p3d_ModelViewProjectionMatrix;
+uniform mat4 p3d_TextureMatrix[1];
+
+attribute vec4 p3d_Vertex;
+attribute vec4 p3d_Color;
+attribute vec2 p3d_MultiTexCoord0;
+
+varying vec2 texcoord;
+varying vec4 colour;
+
+void main() {
+    gl_Position = p3d_ModelViewProjectionMatrix * p3d_Vertex;
+    texcoord = (p3d_TextureMatrix[0] * vec4(p3d_MultiTexCoord0, 0, 1)).xy;
+    colour = p3d_Color;
+}
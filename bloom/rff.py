@@ -1,9 +1,16 @@
 # Copyright 2020 Thomas Rogers
 # SPDX-License-Identifier: Apache-2.0
 
+import bisect
+import fnmatch
+import functools
+import mmap
+import os
+import os.path
+import re
+import threading
 import typing
-from collections import defaultdict
-from fnmatch import fnmatch
+from collections import OrderedDict, defaultdict
 
 from . import data_loading
 
@@ -27,39 +34,105 @@ class Entry(data_loading.CustomStruct):
     indexer: data_loading.UInt32
 
 
+_WILDCARDS = re.compile(r"[*?\[]")
+_EXTENSION_QUERY = re.compile(r"([^*?\[\]]*)\*\.([^*?\[\]]+)\Z")
+
+
+@functools.lru_cache(maxsize=128)
+def _compile_pattern(fnmatcher: str) -> typing.Pattern:
+    return re.compile(fnmatch.translate(fnmatcher))
+
+
+class CacheStats(typing.NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    resident_bytes: int
+    capacity: int
+
+
 class RFF:
     _FLAG_ENCRYPTED = 1 << 4
+    _ENCRYPTED_SIZE = 256
 
-    def __init__(self, path: str):
-        with open(path, "rb") as file:
-            data = file.read()
-        self._unpacker = data_loading.Unpacker(data)
-        self._header = self._unpacker.read_struct(Header)
+    def __init__(self, path: str, cache_size=0):
+        self._cache_size = cache_size
+        self._cache: "OrderedDict[int, bytes]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_bytes = 0
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._cache_evictions = 0
 
-        self._unpacker.seek(self._header.directory_offset)
-        entry_bytesize = Entry.size() * self._header.number_of_entries
-        encrypted_entries = bytearray(self._unpacker.get_bytes(entry_bytesize))
+        with open(path, "rb") as file:
+            self._mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._data = memoryview(self._mapping)
 
-        self._crypto_byte = self._header.directory_offset & 0xFF
+        unpacker = data_loading.Unpacker(self._data)
+        self._header = unpacker.read_struct(Header)
 
-        for index in range(0, len(encrypted_entries), 2):
-            encrypted_entries[index] ^= self._crypto_byte
-            encrypted_entries[index + 1] ^= self._crypto_byte
-            self._crypto_byte = (self._crypto_byte + 1) & 0xFF
+        unpacker.seek(self._header.directory_offset)
+        entry_bytesize = Entry.size() * self._header.number_of_entries
+        encrypted_entries = unpacker.get_bytes(entry_bytesize)
+        decrypted_entries = data_loading.xor_bytes(
+            encrypted_entries, self._header.directory_offset & 0xFF, shift=1
+        )
 
-        entries = data_loading.Unpacker(encrypted_entries).read_multiple(
+        entries = data_loading.Unpacker(decrypted_entries).read_multiple(
             Entry, self._header.number_of_entries
         )
         self._entries: typing.Dict[str, Entry] = {}
         self._indexed_entries: typing.Dict[str, typing.Dict[int, Entry]] = defaultdict(
             lambda: {}
         )
+        self._entry_positions: typing.Dict[str, int] = {}
+        self._names_by_extension: typing.Dict[str, typing.List[str]] = defaultdict(
+            lambda: []
+        )
         for entry in entries:
             file_name = entry.name.rstrip("\x00")
-            extension = file_name[0:3]
+            extension = file_name[0:3].rstrip("\x00")
             file_name = f"{file_name[3:]}.{extension}"
             self._entries[file_name] = entry
             self._indexed_entries[extension][entry.indexer] = entry
+            if file_name not in self._entry_positions:
+                self._entry_positions[file_name] = len(self._entry_positions)
+                self._names_by_extension[extension].append(file_name)
+
+        self._sorted_names_by_extension = {
+            extension: sorted(names)
+            for extension, names in self._names_by_extension.items()
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        with self._cache_lock:
+            self._cache.clear()
+            self._cache_bytes = 0
+
+        try:
+            self._data.release()
+            self._mapping.close()
+        except BufferError:
+            # Something still holds a buffer into the archive, the mapping is
+            # released once that is gone.
+            pass
+
+    @property
+    def cache_stats(self):
+        with self._cache_lock:
+            return CacheStats(
+                self._cache_hits,
+                self._cache_misses,
+                self._cache_evictions,
+                self._cache_bytes,
+                self._cache_size,
+            )
 
     def file_listing(self) -> typing.List[str]:
         return list(self._entries.keys())
@@ -75,30 +148,248 @@ class RFF:
             yield entry_name, entry.indexer
 
     def _matching_entries(self, fnmatcher: str) -> typing.Iterable[Entry]:
-        fnmatcher = fnmatcher.upper()
-        for entry_name, value in self._entries.items():
-            if fnmatch(entry_name, fnmatcher):
-                yield entry_name, value
+        for entry_name in self._matching_names(fnmatcher.upper()):
+            yield entry_name, self._entries[entry_name]
+
+    def _matching_names(self, fnmatcher: str) -> typing.List[str]:
+        if _WILDCARDS.search(fnmatcher) is None:
+            if fnmatcher in self._entries:
+                return [fnmatcher]
+            return []
 
-    def data_for_entry(self, file_name: str) -> bytes:
+        extension_query = _EXTENSION_QUERY.match(fnmatcher)
+        if extension_query is None:
+            pattern = _compile_pattern(fnmatcher)
+            return [name for name in self._entries if pattern.match(name)]
+
+        prefix, extension = extension_query.groups()
+        if not prefix:
+            return list(self._names_by_extension.get(extension, []))
+
+        names = self._sorted_names_by_extension.get(extension, [])
+        result = []
+        for name in names[bisect.bisect_left(names, prefix) :]:
+            if not name.startswith(prefix):
+                break
+            result.append(name)
+        return sorted(result, key=self._entry_positions.__getitem__)
+
+    def data_for_entry(self, file_name: str) -> typing.Union[bytes, memoryview]:
         if file_name not in self._entries:
             return None
 
         entry = self._entries[file_name]
         return self._decrypted_entry(entry)
 
-    def data_for_entry_by_index(self, extension: str, index: int) -> bytes:
-        if index not in self._indexed_entries[extension]:
+    def peek_entry(self, file_name: str, count: int) -> typing.Union[bytes, memoryview]:
+        if file_name not in self._entries:
+            return None
+
+        # Reads the start of an entry without decrypting or caching the rest.
+        entry = self._entries[file_name]
+        data = self._data[entry.offset : entry.offset + min(count, entry.size)]
+        if (entry.flags & self._FLAG_ENCRYPTED) == 0:
+            return data
+        return self._decrypt(data)
+
+    def data_for_entry_by_index(
+        self, extension: str, index: int
+    ) -> typing.Union[bytes, memoryview]:
+        entry = self._indexed_entries.get(extension, {}).get(index)
+        if entry is None:
             return None
 
-        entry = self._indexed_entries[extension][index]
         return self._decrypted_entry(entry)
 
     def _decrypted_entry(self, entry: Entry):
-        self._unpacker.seek(entry.offset)
-        data = bytearray(self._unpacker.get_bytes(entry.size))
-        if (entry.flags & self._FLAG_ENCRYPTED) != 0:
-            for index in range(min(256, entry.size)):
-                data[index] ^= index >> 1
+        data = self._data[entry.offset : entry.offset + entry.size]
+        if (entry.flags & self._FLAG_ENCRYPTED) == 0:
+            return data
+
+        if self._cache_size < 1:
+            return self._decrypt(data)
+
+        with self._cache_lock:
+            cached = self._cache.get(entry.offset)
+            if cached is not None:
+                self._cache.move_to_end(entry.offset)
+                self._cache_hits += 1
+                return cached
+            self._cache_misses += 1
+
+        decrypted = self._decrypt(data)
+        self._add_to_cache(entry.offset, decrypted)
+        return decrypted
 
-        return bytes(data)
+    def _decrypt(self, data: memoryview) -> bytes:
+        encrypted_size = min(self._ENCRYPTED_SIZE, len(data))
+        return (
+            data_loading.xor_bytes(data[:encrypted_size], 0, shift=1)
+            + data[encrypted_size:]
+        )
+
+    def _add_to_cache(self, key: int, data: bytes):
+        if len(data) > self._cache_size:
+            return
+
+        with self._cache_lock:
+            if key in self._cache:
+                return
+
+            self._cache[key] = data
+            self._cache_bytes += len(data)
+            while self._cache_bytes > self._cache_size:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted)
+                self._cache_evictions += 1
+
+
+class RFFWriter:
+    _MAGIC = b"RFF\x1a"
+    _VERSION = 0x301
+    _CHUNK_SIZE = 1 << 20
+    _MAX_NAME_SIZE = 8
+    _MAX_EXTENSION_SIZE = 3
+
+    def __init__(self, path: str):
+        # The archive is written next to the destination and only swapped in
+        # once it is complete, so a failed write never leaves a broken RFF.
+        self._path = path
+        self._temporary_path = f"{path}.{os.getpid()}.tmp"
+        self._file = open(self._temporary_path, "w+b")
+        self._file.write(bytes(Header.size()))
+        self._entries: typing.List[Entry] = []
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, *_):
+        if error_type is None:
+            self.close()
+        else:
+            self._discard()
+
+    def add_entry(self, file_name: str, data: bytes, index=0, encrypted=False):
+        offset = self._file.tell()
+        self._write_chunk(memoryview(data), encrypted)
+        self._add_directory_entry(file_name, offset, len(data), index, encrypted, 0)
+
+    def add_file(self, path: str, file_name: str = None, index=0, encrypted=False):
+        if file_name is None:
+            file_name = os.path.basename(path)
+
+        offset = self._file.tell()
+        size = 0
+        with open(path, "rb") as file:
+            while True:
+                chunk = file.read(self._CHUNK_SIZE)
+                if not chunk:
+                    break
+                self._write_chunk(memoryview(chunk), encrypted and size == 0)
+                size += len(chunk)
+
+        self._add_directory_entry(
+            file_name, offset, size, index, encrypted, int(os.path.getmtime(path))
+        )
+
+    def add_directory(
+        self,
+        directory: str,
+        encrypted_extensions: typing.Iterable[str] = (),
+        indexes: typing.Dict[str, int] = None,
+    ):
+        encrypted_extensions = {extension.upper() for extension in encrypted_extensions}
+        indexes = {name.upper(): index for name, index in (indexes or {}).items()}
+
+        for file_name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, file_name)
+            if not os.path.isfile(path):
+                continue
+
+            file_name = file_name.upper()
+            extension = os.path.splitext(file_name)[1][1:]
+            self.add_file(
+                path,
+                file_name,
+                index=indexes.get(file_name, 0),
+                encrypted=extension in encrypted_extensions,
+            )
+
+    def close(self):
+        if self._closed:
+            return
+
+        try:
+            self._write_directory()
+            self._file.close()
+            os.replace(self._temporary_path, self._path)
+        except BaseException:
+            self._discard()
+            raise
+        self._closed = True
+
+    def _discard(self):
+        if self._closed:
+            return
+
+        self._closed = True
+        self._file.close()
+        try:
+            os.remove(self._temporary_path)
+        except FileNotFoundError:
+            pass
+
+    def _write_directory(self):
+        directory_offset = self._file.tell()
+
+        packer = data_loading.Packer(Entry.size() * len(self._entries))
+        packer.write_multiple(self._entries)
+        directory = packer.get_buffer()
+        data_loading.xor_in_place(directory, directory_offset & 0xFF, shift=1)
+        self._file.write(directory)
+
+        header = Header(
+            magic=self._MAGIC,
+            version=self._VERSION,
+            directory_offset=directory_offset,
+            number_of_entries=len(self._entries),
+        )
+        self._file.seek(0)
+        self._file.write(header.codec().pack(header))
+
+    def _write_chunk(self, data: memoryview, encrypted: bool):
+        if encrypted:
+            encrypted_size = min(RFF._ENCRYPTED_SIZE, len(data))
+            self._file.write(data_loading.xor_bytes(data[:encrypted_size], 0, shift=1))
+            data = data[encrypted_size:]
+        self._file.write(data)
+
+    def _add_directory_entry(
+        self,
+        file_name: str,
+        offset: int,
+        size: int,
+        index: int,
+        encrypted: bool,
+        time: int,
+    ):
+        name, _, extension = file_name.upper().rpartition(".")
+        if (
+            not name
+            or len(name) > self._MAX_NAME_SIZE
+            or len(extension) > self._MAX_EXTENSION_SIZE
+        ):
+            raise ValueError(f"Unable to store {file_name} in an RFF")
+
+        self._entries.append(
+            Entry(
+                unknown0=bytes(16),
+                offset=offset,
+                size=size,
+                time=time,
+                flags=RFF._FLAG_ENCRYPTED if encrypted else 0,
+                name=extension.ljust(self._MAX_EXTENSION_SIZE, "\x00") + name,
+                indexer=index,
+            )
+        )
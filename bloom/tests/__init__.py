@@ -10,3 +10,21 @@ from .test_wall_split import TestWallSplit
 from .test_wall_join import TestWallJoin
 from .test_sector_flip import TestSectorFlip
 from .test_sector_fill import TestSectorFill
+from .test_data_loading import (
+    TestPacker,
+    TestStructCodec,
+    TestUnpacker,
+    TestXorEncryption,
+)
+from .test_map_columns import TestMapColumns
+from .test_map_probe import TestMapProbe
+from .test_rff import TestRFF, TestRFFCache, TestRFFMatching, TestRFFWriter
+from .test_art import TestArtManager, TestPaletteSet, TestTileImageCache
+from .test_texture_cache import TestTextureCache
+from .test_tile_manager import TestTileManager
+from .test_tile_array import TestTileArray
+from .test_tile_prefetcher import TestTilePrefetcher
+from .test_map_cache import TestMapCache
+from .test_encoded_records import TestEditorSaves, TestEncodedRecords
+from .test_batch import TestBatch
+from .test_map_diff import TestMapDiff
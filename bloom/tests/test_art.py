@@ -0,0 +1,265 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import os.path
+import struct
+import tempfile
+import typing
+import unittest
+from unittest import mock
+
+import numpy
+
+from .. import rff
+from ..tiles import art, image_cache
+
+
+def write_test_art(
+    path: str, tile_start: int, tiles: typing.List[typing.Tuple[int, int, int, int]]
+):
+    widths = b"".join(struct.pack("<H", width) for width, _, _, _ in tiles)
+    heights = b"".join(struct.pack("<H", height) for _, height, _, _ in tiles)
+    animation_data = b"".join(
+        struct.pack("<BbbB", count, offset_x, -offset_x, 0)
+        for _, _, offset_x, count in tiles
+    )
+    pixels = b"".join(
+        bytes((tile_start + index + pixel) & 0xFF for pixel in range(width * height))
+        for index, (width, height, _, _) in enumerate(tiles)
+    )
+    with open(path, "wb") as file:
+        file.write(struct.pack("<4I", 1, 0, tile_start, tile_start + len(tiles) - 1))
+        file.write(widths + heights + animation_data + pixels)
+
+
+class TestPaletteSet(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._directory.name, "TEST.RFF")
+        self._palette_data = os.urandom(768)
+        self._lookup_data = os.urandom(64 * 256)
+        with rff.RFFWriter(self._path) as writer:
+            writer.add_entry("BLOOD.PAL", self._palette_data)
+            writer.add_entry("WATER.PAL", os.urandom(768))
+            writer.add_entry("NORMAL.PLU", self._lookup_data, index=1)
+        self._rff = rff.RFF(self._path)
+
+    def tearDown(self):
+        self._rff.close()
+        self._directory.cleanup()
+
+    def test_palettes_are_bgra(self):
+        palettes = art.PaletteSet(self._rff)
+
+        rgb = numpy.frombuffer(self._palette_data, dtype=numpy.uint8).reshape((256, 3))
+        b, g, r = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+        a = [255] * 255 + [0]
+        expected = numpy.array(list(zip(r, g, b, a))).astype("uint8")
+
+        numpy.testing.assert_array_equal(expected, palettes.default_palette)
+        self.assertEqual((256, 4), palettes.get_palette("WATER.PAL").shape)
+
+    def test_lookups_are_loaded_once_on_demand(self):
+        palettes = art.PaletteSet(self._rff)
+        self.assertEqual(0, palettes.loaded_lookup_count)
+
+        lookup = palettes.get_lookup(1)
+        self.assertIs(lookup, palettes.get_lookup(1))
+        self.assertEqual(1, palettes.loaded_lookup_count)
+
+        expected = numpy.frombuffer(self._lookup_data, dtype=numpy.uint8).reshape(
+            (64, 256)
+        )
+        numpy.testing.assert_array_equal(expected[:, :255], lookup[:, :255])
+        self.assertTrue((lookup[:, 255] == 255).all())
+
+    def test_colour_tables_combine_palette_and_lookup(self):
+        palettes = art.PaletteSet(self._rff)
+
+        colour_table = palettes.get_colour_table(1)
+        self.assertIs(colour_table, palettes.get_colour_table(1))
+
+        expected = palettes.default_palette[palettes.get_lookup(1)[0]]
+        numpy.testing.assert_array_equal(
+            expected, colour_table.view(numpy.uint8).reshape((256, 4))
+        )
+
+    def test_missing_lookups_fall_back(self):
+        palettes = art.PaletteSet(self._rff)
+
+        self.assertFalse(palettes.get_lookup(2).any())
+        self.assertIs(
+            palettes.get_lookup(0), palettes.get_lookup(art.PaletteSet.LOOKUP_COUNT)
+        )
+
+
+class TestArtManager(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._working_directory = os.getcwd()
+        os.chdir(self._directory.name)
+        os.mkdir("cache")
+
+        with rff.RFFWriter("TEST.RFF") as writer:
+            writer.add_entry("BLOOD.PAL", bytes(768))
+        self._rff = rff.RFF("TEST.RFF")
+
+        write_test_art("TILES000.ART", 0, [(2, 3, 1, 0), (4, 1, -2, 5)])
+        write_test_art("TILES001.ART", 4, [(1, 1, 0, 0), (3, 2, 7, 2)])
+        self._art_manager = art.ArtManager(self._rff, ["TILES000.ART", "TILES001.ART"])
+
+    def tearDown(self):
+        self._rff.close()
+        os.chdir(self._working_directory)
+        self._directory.cleanup()
+
+    def test_tiles_are_looked_up_by_picnum(self):
+        self.assertEqual((4, 1), self._art_manager.get_tile_dimensions(1))
+        self.assertEqual((3, 2), self._art_manager.get_tile_dimensions(5))
+        self.assertEqual((7, -7), self._art_manager.get_tile_offsets(5))
+        self.assertEqual(5, self._art_manager.get_tile_animation_data(1).count)
+
+    def test_table_holds_every_tile(self):
+        table = self._art_manager.table
+
+        art_files = self._art_manager._art
+        self.assertEqual(
+            [art_files[0], art_files[0], None, None, art_files[1], art_files[1]],
+            table.art,
+        )
+        self.assertEqual([(2, 3), (4, 1), None, None, (1, 1), (3, 2)], table.dimensions)
+        self.assertEqual(
+            [0, 5, None, None, 0, 2],
+            [data and data.count for data in table.animation_data],
+        )
+
+    def test_missing_tiles_are_rejected(self):
+        for tile_number in [-1, 2, 6, 4096]:
+            with self.assertRaises(ValueError):
+                self._art_manager.get_tile_dimensions(tile_number)
+
+    def test_identity_is_only_hashed_when_the_file_changes(self):
+        identity = self._art_manager.table.art[0].identity
+        with mock.patch.object(art.hashlib, "blake2b") as blake2b:
+            art_manager = art.ArtManager(self._rff, ["TILES000.ART"])
+        self.assertEqual(identity, art_manager.table.art[0].identity)
+        blake2b.assert_not_called()
+
+        write_test_art("TILES000.ART", 0, [(3, 3, 1, 0), (4, 1, -2, 5)])
+        art_manager = art.ArtManager(self._rff, ["TILES000.ART"])
+        self.assertNotEqual(identity, art_manager.table.art[0].identity)
+
+    def test_tiles_load_from_the_right_file(self):
+        indices = self._art_manager.load_tile_indices(5)
+
+        self.assertEqual((2, 3), indices.shape)
+        numpy.testing.assert_array_equal([[5, 7, 9], [6, 8, 10]], indices)
+
+    def test_decoded_images_are_contiguous_rows(self):
+        palettes = self._art_manager.palettes
+        image = self._art_manager.load_tile_image(5, 0)
+
+        self.assertEqual((2, 3, 4), image.shape)
+        self.assertTrue(image.flags.c_contiguous)
+        expected = palettes.default_palette[
+            palettes.get_lookup(0)[0][self._art_manager.load_tile_indices(5)]
+        ]
+        numpy.testing.assert_array_equal(expected, image)
+
+
+class TestTileImageCache(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._working_directory = os.getcwd()
+        os.chdir(self._directory.name)
+        os.mkdir("cache")
+
+        with rff.RFFWriter("TEST.RFF") as writer:
+            writer.add_entry("BLOOD.PAL", bytes(range(256)) * 3)
+            writer.add_entry("NORMAL.PLU", bytes(reversed(range(256))) * 64, index=1)
+        self._rff = rff.RFF("TEST.RFF")
+
+        write_test_art("TILES000.ART", 0, [(2, 3, 1, 0), (4, 1, -2, 5)])
+
+    def tearDown(self):
+        self._rff.close()
+        os.chdir(self._working_directory)
+        self._directory.cleanup()
+
+    def _new_art_manager(self):
+        return art.ArtManager(self._rff, ["TILES000.ART"], "cache/tiles")
+
+    def test_cached_images_match_decoded_images(self):
+        art_manager = self._new_art_manager()
+        uncached = art.ArtManager(self._rff, ["TILES000.ART"])
+
+        for tile_number in [0, 1]:
+            for lookup in [0, 1]:
+                numpy.testing.assert_array_equal(
+                    uncached.load_tile_image(tile_number, lookup),
+                    art_manager.load_tile_image(tile_number, lookup),
+                )
+        self.assertEqual((2, 2, 0, 4), art_manager.image_cache.stats)
+
+    def test_second_launch_maps_existing_cache(self):
+        self._new_art_manager().load_tile_image(1, 1)
+
+        art_manager = self._new_art_manager()
+        image = art_manager.load_tile_image(1, 1)
+
+        self.assertEqual((1, 4, 4), image.shape)
+        self.assertEqual((1, 0, 0, 0), art_manager.image_cache.stats)
+
+    def test_tiles_are_appended_as_they_are_decoded(self):
+        cache_path = "cache/tiles/TILES000.ART.1.tiles"
+        art_manager = self._new_art_manager()
+        art_manager.load_tile_image(1, 1)
+        # No room is set aside for the tile that was not asked for.
+        data_start = image_cache.Header.size() + 2 * 8
+        self.assertLess(os.path.getsize(cache_path), data_start + 16 + 24)
+
+        art_manager.load_tile_image(0, 1)
+        self.assertGreaterEqual(os.path.getsize(cache_path), data_start + 16 + 24)
+
+        uncached = art.ArtManager(self._rff, ["TILES000.ART"])
+        art_manager = self._new_art_manager()
+        for tile_number in [0, 1]:
+            numpy.testing.assert_array_equal(
+                uncached.load_tile_image(tile_number, 1),
+                art_manager.load_tile_image(tile_number, 1),
+            )
+        self.assertEqual((1, 0, 0, 0), art_manager.image_cache.stats)
+
+    def test_tiles_are_decoded_as_they_are_requested(self):
+        self._new_art_manager().load_tile_image(1, 1)
+
+        art_manager = self._new_art_manager()
+        uncached = art.ArtManager(self._rff, ["TILES000.ART"])
+        numpy.testing.assert_array_equal(
+            uncached.load_tile_image(0, 1), art_manager.load_tile_image(0, 1)
+        )
+        art_manager.load_tile_image(1, 1)
+
+        self.assertEqual((1, 0, 0, 1), art_manager.image_cache.stats)
+
+    def test_stale_entries_are_rebuilt(self):
+        self._new_art_manager().load_tile_image(0, 0)
+
+        write_test_art("TILES000.ART", 0, [(3, 3, 1, 0), (4, 1, -2, 5)])
+        art_manager = self._new_art_manager()
+        image = art_manager.load_tile_image(0, 0)
+
+        self.assertEqual((3, 3, 4), image.shape)
+        self.assertEqual((1, 1, 1, 1), art_manager.image_cache.stats)
+
+    def test_truncated_entries_are_rebuilt(self):
+        self._new_art_manager().load_tile_image(0, 0)
+        with open("cache/tiles/TILES000.ART.0.tiles", "r+b") as file:
+            file.truncate(image_cache.Header.size() + 2)
+
+        art_manager = self._new_art_manager()
+        image = art_manager.load_tile_image(1, 0)
+
+        self.assertEqual((1, 4, 4), image.shape)
+        self.assertEqual((1, 1, 1, 1), art_manager.image_cache.stats)
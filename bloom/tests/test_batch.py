@@ -0,0 +1,75 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import contextlib
+import io
+import json
+import os.path
+import tempfile
+import unittest
+
+from .. import batch, game_map, rff
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        with open("bloom/examples/BMDEMO.MAP", "rb") as file:
+            self._map_data = file.read()
+
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+
+    def test_summarises_maps(self):
+        result = batch.summarise_map(batch.MapJob("BMDEMO.MAP", self._map_data, None))
+
+        self.assertEqual(837, result["sectors"])
+        self.assertEqual(6345, result["walls"])
+        self.assertEqual(1045, result["sprites"])
+        self.assertEqual({"used": 6, "limit": 512}, result["xwalls"])
+        self.assertTrue(result["crc"]["valid"])
+        self.assertEqual([], result["problems"])
+
+    def test_reports_damaged_maps(self):
+        loaded_map, _ = game_map.Map.load("BMDEMO.MAP", self._map_data)
+        loaded_map.sprites[0].sprite.sector_index = 5000
+        saved_data, _ = loaded_map.save("BMDEMO.MAP")
+        saved_data = bytearray(saved_data)
+        saved_data[-1] ^= 0xFF
+
+        result = batch.summarise_map(batch.MapJob("BMDEMO.MAP", saved_data, None))
+
+        self.assertFalse(result["crc"]["valid"])
+        self.assertEqual(
+            [
+                "stored CRC does not match the map contents",
+                "1 sprites reference missing sectors (first is sprite 0)",
+            ],
+            result["problems"],
+        )
+
+    def test_reports_maps_that_do_not_load(self):
+        result = batch.summarise_map(batch.MapJob("BAD.MAP", b"BLM\x1a", None))
+
+        self.assertIn("error", result)
+
+    def test_processes_maps_in_archives(self):
+        archive_path = os.path.join(self._directory.name, "TEST.RFF")
+        with rff.RFFWriter(archive_path) as writer:
+            writer.add_entry("E1M1.MAP", self._map_data, encrypted=True)
+            writer.add_entry("E1M2.MAP", self._map_data)
+        output_directory = os.path.join(self._directory.name, "saved")
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            exit_code = batch.main(
+                [archive_path, "--output-directory", output_directory, "--workers", "2"]
+            )
+
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(0, exit_code)
+        self.assertEqual(
+            [f"{archive_path}:E1M1.MAP", f"{archive_path}:E1M2.MAP"],
+            [result["name"] for result in results],
+        )
+        self.assertTrue(os.path.exists(os.path.join(output_directory, "E1M1.MAP")))
+        self.assertTrue(os.path.exists(os.path.join(output_directory, "E1M2.MAP")))
@@ -0,0 +1,190 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import struct
+import unittest
+
+from .. import data_loading, game_map, map_data
+
+
+class _Bits(data_loading.CustomStruct):
+    low: data_loading.PartialInteger(data_loading.Int16, 3)
+    flag: data_loading.PartialInteger(data_loading.Int16, 1)
+    high: data_loading.PartialInteger(data_loading.Int16, 12)
+
+
+class _Record(data_loading.CustomStruct):
+    magic: data_loading.Magic
+    name: data_loading.FixedLengthString(4)
+    value: data_loading.Int32
+    bits: _Bits
+    small: data_loading.PartialInteger(data_loading.UInt8, 5)
+    tiny: data_loading.PartialInteger(data_loading.UInt8, 3)
+    values: data_loading.SizedType(data_loading.UInt16, 3)
+
+
+class TestStructCodec(unittest.TestCase):
+    def test_codec_matches_struct_size(self):
+        for struct_type in [
+            _Record,
+            map_data.sector.BuildSector,
+            map_data.sector.BloodSectorData,
+            map_data.wall.BuildWall,
+            map_data.wall.BloodWallData,
+            map_data.sprite.BuildSprite,
+            map_data.sprite.BloodSpriteData,
+        ]:
+            self.assertEqual(struct_type.size(), struct_type.codec().size)
+
+    def test_can_round_trip_struct(self):
+        record = _Record(
+            magic=b"TEST",
+            name="abcd",
+            value=-1234567,
+            bits=_Bits(low=-3, flag=1, high=-100),
+            small=17,
+            tiny=5,
+            values=[1, 2, 65535],
+        )
+
+        packer = data_loading.Packer()
+        packer.write_struct(record)
+        data = packer.get_bytes()
+
+        self.assertEqual(_Record.size(), len(data))
+        self.assertEqual(
+            struct.pack(
+                "<4s4siHB3H", b"TEST", b"abcd", -1234567, 0xF9CD, 0xB1, 1, 2, 65535
+            ),
+            data,
+        )
+
+        unpacker = data_loading.Unpacker(data)
+        self.assertEqual(record, unpacker.read_struct(_Record))
+        self.assertEqual(len(data), unpacker.offset)
+
+    def test_example_map_round_trips(self):
+        with open("bloom/examples/BMDEMO.MAP", "rb") as file:
+            map_data_bytes = file.read()
+
+        loaded_map, crc = game_map.Map.load("BMDEMO.MAP", map_data_bytes)
+        self.assertEqual(struct.unpack("<I", map_data_bytes[-4:])[0], crc)
+
+        saved_data, _ = loaded_map.save("BMDEMO.MAP")
+        reloaded_map, _ = game_map.Map.load("BMDEMO.MAP", saved_data)
+
+        self.assertEqual(loaded_map.sectors, reloaded_map.sectors)
+        self.assertEqual(loaded_map.walls, reloaded_map.walls)
+        self.assertEqual(loaded_map.sprites, reloaded_map.sprites)
+
+
+class TestXorEncryption(unittest.TestCase):
+    @staticmethod
+    def _python_xor(data: bytes, key: int, shift=0):
+        result = bytearray(data)
+        for index in range(len(result)):
+            result[index] ^= (key + (index >> shift)) & 0xFF
+        return bytes(result)
+
+    def test_matches_byte_by_byte_xor(self):
+        for size in [0, 1, 40, 256, 257, 1000, 4096]:
+            data = os.urandom(size)
+            for key in [0, 0x4D, 0xFF]:
+                for shift in [0, 1]:
+                    self.assertEqual(
+                        self._python_xor(data, key, shift),
+                        data_loading.xor_bytes(data, key, shift),
+                    )
+
+    def test_key_streams_share_one_cached_period(self):
+        data_loading._xor_key_period.cache_clear()
+        for count in [10, 512, 5000]:
+            self.assertEqual(
+                self._python_xor(bytes(count), 0x4D, 1),
+                data_loading.xor_key_stream(0x4D, count, shift=1).tobytes(),
+            )
+        self.assertEqual(1, data_loading._xor_key_period.cache_info().currsize)
+
+    def test_can_xor_in_place(self):
+        data = bytearray(os.urandom(1000))
+        expected = self._python_xor(data[:256], 0, 1) + data[256:]
+
+        data_loading.xor_in_place(memoryview(data)[:256], 0, shift=1)
+        self.assertEqual(expected, bytes(data))
+
+    def test_encrypted_members_round_trip(self):
+        packer = data_loading.Packer()
+        packer.write_xor_encrypted_struct(
+            map_data.wall.BuildWall(position_x=12, position_y=-34), 0x4D
+        )
+        packer.write_multiple_xor_encrypted_members(data_loading.UInt16, [1, 2, 3], 6)
+
+        unpacker = data_loading.Unpacker(packer.get_bytes())
+        wall = unpacker.read_xor_encrypted_struct(map_data.wall.BuildWall, 0x4D)
+        self.assertEqual(12, wall.position_x)
+        self.assertEqual(-34, wall.position_y)
+        self.assertEqual(
+            [1, 2, 3],
+            unpacker.read_multiple_xor_encrypted_members(data_loading.UInt16, 3, 6),
+        )
+
+
+class TestPacker(unittest.TestCase):
+    def test_grows_past_preallocated_size(self):
+        packer = data_loading.Packer(2)
+        packer.write_member(data_loading.UInt32, 0x01020304)
+        packer.write_bytes(b"abc")
+
+        self.assertEqual(b"\x04\x03\x02\x01abc", packer.get_bytes())
+        self.assertEqual(7, packer.offset)
+
+    def test_can_overwrite_after_seeking(self):
+        packer = data_loading.Packer()
+        packer.write_bytes(b"abcdef")
+        packer.seek(2)
+        packer.write_bytes(b"XY")
+
+        self.assertEqual(4, packer.offset)
+        self.assertEqual(b"abXYef", packer.get_bytes())
+
+    def test_buffer_is_trimmed_to_written_data(self):
+        packer = data_loading.Packer(64)
+        packer.write_xor_encrypted_bytes(b"\x00" * 4, 0x10)
+
+        buffer = packer.get_buffer()
+        self.assertIsInstance(buffer, bytearray)
+        self.assertEqual(b"\x10\x11\x12\x13", bytes(buffer))
+
+    def test_encrypts_large_writes_in_place(self):
+        data = os.urandom(1000)
+        packer = data_loading.Packer(10)
+        packer.write_bytes(b"header")
+        packer.write_xor_encrypted_bytes(data, 0x4D)
+
+        self.assertEqual(
+            b"header" + data_loading.xor_bytes(data, 0x4D), packer.get_bytes()
+        )
+
+
+class TestUnpacker(unittest.TestCase):
+    def test_hands_out_views_of_the_buffer(self):
+        buffer = bytearray(b"abcdef")
+        unpacker = data_loading.Unpacker(buffer)
+        unpacker.seek(2)
+
+        data = unpacker.get_bytes(2)
+        self.assertIsInstance(data, memoryview)
+        self.assertEqual(b"cd", data)
+
+        buffer[2] = ord("X")
+        self.assertEqual(b"Xd", data)
+        self.assertEqual(b"ef", unpacker.read_remaining())
+
+    def test_decrypted_bytes_are_copies(self):
+        buffer = bytearray(data_loading.xor_bytes(b"abcdef", 0x4D))
+        unpacker = data_loading.Unpacker(buffer)
+
+        data = unpacker.get_xor_encrypted_bytes(6, 0x4D)
+        buffer[0] = 0
+        self.assertEqual(b"abcdef", data)
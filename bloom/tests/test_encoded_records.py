@@ -0,0 +1,134 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import unittest
+from unittest import mock
+
+from panda3d import core
+
+from .. import constants, game_map
+from ..editor import map_editor
+from ..map_data import encoded_records
+
+
+class TestEncodedRecords(unittest.TestCase):
+    def setUp(self):
+        with open("bloom/examples/BMDEMO.MAP", "rb") as file:
+            map_data = file.read()
+
+        self._map, _ = game_map.Map.load("BMDEMO.MAP", map_data)
+        self._incremental_map, _ = game_map.Map.load("BMDEMO.MAP", map_data)
+        self._encoded = encoded_records.EncodedRecords()
+        self._incremental_map.set_encoded_records(self._encoded)
+
+    def _record_count(self):
+        return len(self._map.sectors) + len(self._map.walls) + len(self._map.sprites)
+
+    def _assert_saves_match(self):
+        self.assertEqual(
+            self._map.save("BMDEMO.MAP"), self._incremental_map.save("BMDEMO.MAP")
+        )
+
+    def test_incremental_saves_match_full_saves(self):
+        self._assert_saves_match()
+        self._assert_saves_match()
+
+        record_count = self._record_count()
+        self.assertEqual(
+            encoded_records.EncodeStats(record_count, record_count),
+            self._encoded.stats,
+        )
+
+    def test_edited_records_are_encoded_again(self):
+        self._assert_saves_match()
+
+        for edited_map in [self._map, self._incremental_map]:
+            edited_map.walls[3].wall.picnum += 1
+            edited_map.sectors[5].data.on_wave = 2
+            edited_map.sprites[7].sprite.position_z += 256
+            edited_map.sprites[8].sprite.stat.blocking = 1
+
+        self._assert_saves_match()
+        self.assertEqual(4, self._encoded.stats.encoded - self._record_count())
+
+    def test_indices_and_tags_are_encoded_again(self):
+        self._assert_saves_match()
+
+        for edited_map in [self._map, self._incremental_map]:
+            del edited_map.sprites[0]
+            edited_map.walls[0].wall.point2_index = 2
+            edited_map.walls[0].wall.tags[0] = 0
+            edited_map.sectors[0].sector.first_wall_index = 1
+            edited_map.sectors[1].data.rx_id = 9
+
+        self._assert_saves_match()
+
+
+class TestEditorSaves(unittest.TestCase):
+    def setUp(self):
+        with open("bloom/examples/BMDEMO.MAP", "rb") as file:
+            map_data = file.read()
+        map_to_load, _ = game_map.Map.load("BMDEMO.MAP", map_data)
+
+        camera_collection = mock.Mock()
+        camera_collection.scene = core.NodePath("scene")
+        camera_collection.builder = core.NodePath("builder")
+        tile_manager = mock.Mock()
+        tile_manager.get_tile.return_value = core.Texture()
+        tile_manager.get_tile_dimensions.return_value = core.Vec2(32, 32)
+        tile_manager.get_tile_offsets.return_value = core.Vec2(0, 0)
+
+        with mock.patch.object(constants, "DYNAMIC_GEOMETRY_LOAD", True):
+            self._editor = map_editor.MapEditor(
+                camera_collection, map_to_load, mock.Mock(), mock.Mock(), tile_manager
+            )
+
+    def _save(self):
+        saved_map = self._editor.to_game_map(core.Point3(0, 0, 0))
+        saved_data, _ = saved_map.save("BMDEMO.MAP")
+        loaded_map, _ = game_map.Map.load("BMDEMO.MAP", saved_data)
+        return loaded_map
+
+    def _saved_sprite_positions(self, saved_map: game_map.Map):
+        return {
+            (
+                blood_sprite.sprite.position_x,
+                blood_sprite.sprite.position_y,
+                blood_sprite.sprite.position_z,
+            )
+            for blood_sprite in saved_map.sprites
+        }
+
+    def test_moved_sprites_are_saved(self):
+        editor_sprite = next(
+            editor_sector.sprites[0]
+            for editor_sector in self._editor.sectors.sectors
+            if editor_sector.sprites
+        )
+        origin = editor_sprite.origin
+        self._save()
+
+        editor_sprite.move_to(origin + core.Vec3(16, 32, -64))
+        first_z = editor_sprite.sprite.sprite.position_z
+        saved_positions = self._saved_sprite_positions(self._save())
+        self.assertIn(
+            (int(origin.x) + 16, int(origin.y) + 32, first_z), saved_positions
+        )
+
+        editor_sprite.move_to(origin + core.Vec3(48, 64, -128))
+        second_z = editor_sprite.sprite.sprite.position_z
+        saved_positions = self._saved_sprite_positions(self._save())
+        self.assertIn(
+            (int(origin.x) + 48, int(origin.y) + 64, second_z), saved_positions
+        )
+        self.assertNotIn(
+            (int(origin.x) + 16, int(origin.y) + 32, first_z), saved_positions
+        )
+
+    def test_wall_types_set_in_place_are_saved(self):
+        editor_wall = self._editor.sectors.sectors[0].walls[0]
+        self._save()
+
+        editor_wall.blood_wall.wall.tags[0] = 500
+        saved_map = self._save()
+        self.assertIn(500, [blood_wall.wall.tags[0] for blood_wall in saved_map.walls])
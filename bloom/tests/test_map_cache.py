@@ -0,0 +1,79 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import glob
+import os.path
+import tempfile
+import unittest
+
+from .. import game_map, map_cache
+
+
+class TestMapCache(unittest.TestCase):
+    def setUp(self):
+        with open("bloom/examples/BMDEMO.MAP", "rb") as file:
+            self._map_data = file.read()
+
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self._cache = map_cache.MapCache(self._directory.name)
+
+    def _cache_paths(self):
+        return glob.glob(os.path.join(self._directory.name, "*.mapcache"))
+
+    def test_cached_maps_match_decoded_maps(self):
+        loaded_map, crc = game_map.Map.load("BMDEMO.MAP", self._map_data)
+        game_map.Map.load("BMDEMO.MAP", self._map_data, cache=self._cache)
+        cached_map, cached_crc = game_map.Map.load(
+            "BMDEMO.MAP", self._map_data, cache=self._cache
+        )
+
+        self.assertEqual(map_cache.CacheStats(1, 1, 0), self._cache.stats)
+        self.assertEqual(crc, cached_crc)
+        self.assertEqual(loaded_map.sectors, cached_map.sectors)
+        self.assertEqual(loaded_map.walls, cached_map.walls)
+        self.assertEqual(loaded_map.sprites, cached_map.sprites)
+        self.assertEqual(loaded_map.sky_offsets, cached_map.sky_offsets)
+        self.assertEqual(loaded_map.save("BMDEMO.MAP"), cached_map.save("BMDEMO.MAP"))
+
+    def test_caches_are_keyed_by_map_contents(self):
+        game_map.Map.load("BMDEMO.MAP", self._map_data, cache=self._cache)
+
+        loaded_map, _ = game_map.Map.load("BMDEMO.MAP", self._map_data)
+        loaded_map.sprites[0].sprite.picnum += 1
+        saved_data, _ = loaded_map.save("BMDEMO.MAP")
+        cached_map, _ = game_map.Map.load("BMDEMO.MAP", saved_data, cache=self._cache)
+
+        self.assertEqual(map_cache.CacheStats(0, 2, 0), self._cache.stats)
+        self.assertEqual(2, len(self._cache_paths()))
+        self.assertEqual(loaded_map.sprites[0], cached_map.sprites[0])
+
+    def test_damaged_caches_are_rebuilt(self):
+        game_map.Map.load("BMDEMO.MAP", self._map_data, cache=self._cache)
+        (cache_path,) = self._cache_paths()
+        with open(cache_path, "r+b") as file:
+            file.truncate(os.path.getsize(cache_path) - 1)
+
+        loaded_map, _ = game_map.Map.load(
+            "BMDEMO.MAP", self._map_data, cache=self._cache
+        )
+
+        self.assertEqual(map_cache.CacheStats(0, 2, 1), self._cache.stats)
+        self.assertEqual(
+            game_map.Map.load("BMDEMO.MAP", self._map_data)[0].walls, loaded_map.walls
+        )
+
+    def test_closed_maps_keep_their_records(self):
+        game_map.Map.load("BMDEMO.MAP", self._map_data, cache=self._cache)
+        cached_map, _ = game_map.Map.load(
+            "BMDEMO.MAP", self._map_data, cache=self._cache
+        )
+        mapping = cached_map._mapping
+
+        cached_map.close()
+
+        self.assertTrue(mapping.closed)
+        self.assertIsNone(cached_map.columns)
+        loaded_map, _ = game_map.Map.load("BMDEMO.MAP", self._map_data)
+        self.assertEqual(loaded_map.sectors, cached_map.sectors)
+        self.assertEqual(loaded_map.save("BMDEMO.MAP"), cached_map.save("BMDEMO.MAP"))
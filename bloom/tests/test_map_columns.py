@@ -0,0 +1,72 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import unittest
+
+from .. import game_map
+
+
+class TestMapColumns(unittest.TestCase):
+    def setUp(self):
+        with open("bloom/examples/BMDEMO.MAP", "rb") as file:
+            self._map_data = file.read()
+
+    def test_columns_match_records(self):
+        loaded_map, crc = game_map.Map.load("BMDEMO.MAP", self._map_data)
+        column_map, column_crc = game_map.Map.load(
+            "BMDEMO.MAP", self._map_data, as_columns=True
+        )
+
+        self.assertEqual(crc, column_crc)
+        columns = column_map.columns
+        self.assertEqual(len(loaded_map.walls), len(columns.walls))
+        self.assertEqual(
+            [map_wall.wall.position_x for map_wall in loaded_map.walls],
+            columns.walls["wall.position_x"].tolist(),
+        )
+        self.assertEqual(
+            [map_wall.wall.stat.blocking for map_wall in loaded_map.walls],
+            columns.walls["wall.stat.blocking"].tolist(),
+        )
+        self.assertEqual(
+            [map_sprite.data.rx_id for map_sprite in loaded_map.sprites],
+            columns.sprites["data.rx_id"].tolist(),
+        )
+        self.assertEqual(
+            [list(map_sector.sector.tags) for map_sector in loaded_map.sectors],
+            columns.sectors["sector.tags"].tolist(),
+        )
+        self.assertEqual(
+            [map_sprite.sprite.tags[2] > 0 for map_sprite in loaded_map.sprites],
+            columns.sprites.has_data.tolist(),
+        )
+
+    def test_records_materialise_on_demand(self):
+        loaded_map, _ = game_map.Map.load("BMDEMO.MAP", self._map_data)
+        column_map, _ = game_map.Map.load("BMDEMO.MAP", self._map_data, as_columns=True)
+
+        self.assertEqual(loaded_map.walls[10], column_map.columns.walls.record(10))
+        self.assertEqual(loaded_map.sectors, column_map.sectors)
+        self.assertEqual(loaded_map.walls, column_map.walls)
+        self.assertEqual(loaded_map.sprites, column_map.sprites)
+
+    def test_can_load_unencrypted_columns(self):
+        loaded_map, _ = game_map.Map.load("BMDEMO.MAP", self._map_data)
+        loaded_map._encrypted = False
+        loaded_map._header_0.major_version = 6
+        loaded_map._header_0.minor_version = 3
+        loaded_map._header_4 = None
+        unencrypted_data, _ = loaded_map.save("BMDEMO.MAP")
+
+        column_map, _ = game_map.Map.load(
+            "BMDEMO.MAP", unencrypted_data, as_columns=True
+        )
+        self.assertEqual(loaded_map.sprites, column_map.sprites)
+        self.assertEqual(loaded_map.walls, column_map.walls)
+
+    def test_saving_from_columns_matches_saving_from_records(self):
+        loaded_map, _ = game_map.Map.load("BMDEMO.MAP", self._map_data)
+        column_map, _ = game_map.Map.load("BMDEMO.MAP", self._map_data, as_columns=True)
+
+        self.assertEqual(loaded_map.save("BMDEMO.MAP"), column_map.save("BMDEMO.MAP"))
+        self.assertIsNone(column_map.columns)
@@ -0,0 +1,89 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import contextlib
+import io
+import os.path
+import tempfile
+import unittest
+
+from .. import game_map, map_diff
+
+
+class TestMapDiff(unittest.TestCase):
+    def setUp(self):
+        with open("bloom/examples/BMDEMO.MAP", "rb") as file:
+            self._map_data = file.read()
+
+        self._old_map, _ = game_map.Map.load(
+            "BMDEMO.MAP", self._map_data, as_columns=True
+        )
+
+    def _edited_map(self):
+        edited_map, _ = game_map.Map.load("BMDEMO.MAP", self._map_data)
+        edited_map.walls[10].wall.picnum += 1
+        edited_map.walls[10].wall.stat.blocking = 1
+        edited_map.sectors[1].sector.tags[0] = 5
+        edited_map.sprites[3].data.rx_id = 7
+        del edited_map.sprites[-1]
+        return edited_map
+
+    def test_identical_maps_have_no_differences(self):
+        new_map, _ = game_map.Map.load("BMDEMO.MAP", self._map_data)
+
+        self.assertTrue(map_diff.diff_maps(self._old_map, new_map).is_empty())
+
+    def test_reports_changed_fields(self):
+        old_wall = self._old_map.walls[10].wall
+        difference = map_diff.diff_maps(self._old_map, self._edited_map())
+
+        self.assertEqual([], difference.sectors.added)
+        self.assertEqual(
+            [
+                map_diff.RecordChange(
+                    10,
+                    [
+                        map_diff.FieldChange(
+                            "wall.stat.blocking", old_wall.stat.blocking, 1
+                        ),
+                        map_diff.FieldChange(
+                            "wall.picnum", old_wall.picnum, old_wall.picnum + 1
+                        ),
+                    ],
+                )
+            ],
+            difference.walls.modified,
+        )
+        self.assertEqual(
+            [map_diff.RecordChange(3, [map_diff.FieldChange("data.rx_id", 0, 7)])],
+            difference.sprites.modified,
+        )
+        self.assertEqual("sector.tags", difference.sectors.modified[0].fields[0].name)
+
+    def test_reports_added_and_removed_records(self):
+        edited_map = self._edited_map()
+        last_sprite = len(self._old_map.sprites) - 1
+
+        difference = map_diff.diff_maps(self._old_map, edited_map)
+        self.assertEqual([last_sprite], difference.sprites.removed)
+
+        difference = map_diff.diff_maps(edited_map, self._old_map)
+        self.assertEqual([last_sprite], difference.sprites.added)
+
+    def test_compares_map_files(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        old_path = os.path.join(directory.name, "OLD.MAP")
+        new_path = os.path.join(directory.name, "NEW.MAP")
+        with open(old_path, "wb") as file:
+            file.write(self._map_data)
+        with open(new_path, "wb") as file:
+            file.write(self._edited_map().save(new_path)[0])
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            exit_code = map_diff.main([old_path, new_path])
+
+        self.assertEqual(1, exit_code)
+        self.assertIn("~ wall 10\n", output.getvalue())
+        self.assertIn(f"- sprite {len(self._old_map.sprites) - 1}\n", output.getvalue())
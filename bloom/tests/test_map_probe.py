@@ -0,0 +1,41 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import unittest
+
+from .. import game_map
+
+
+class TestMapProbe(unittest.TestCase):
+    def setUp(self):
+        with open("bloom/examples/BMDEMO.MAP", "rb") as file:
+            self._map_data = file.read()
+
+    def test_probes_match_loaded_maps(self):
+        loaded_map, _ = game_map.Map.load("BMDEMO.MAP", self._map_data)
+        summary = game_map.Map.probe(self._map_data)
+
+        self.assertEqual((7, 0), (summary.major_version, summary.minor_version))
+        self.assertTrue(summary.encrypted)
+        self.assertEqual(len(loaded_map.sectors), summary.sector_count)
+        self.assertEqual(len(loaded_map.walls), summary.wall_count)
+        self.assertEqual(len(loaded_map.sprites), summary.sprite_count)
+        self.assertEqual(397, summary.player_sector)
+
+    def test_only_headers_are_needed(self):
+        header_data = self._map_data[: game_map.Map.probe_size()]
+
+        self.assertEqual(
+            game_map.Map.probe(self._map_data), game_map.Map.probe(header_data)
+        )
+
+    def test_probes_follow_saved_revisions(self):
+        loaded_map, _ = game_map.Map.load("BMDEMO.MAP", self._map_data)
+        revisions = game_map.Map.probe(self._map_data).revisions
+        saved_data, _ = loaded_map.save("BMDEMO.MAP")
+
+        self.assertEqual(revisions + 1, game_map.Map.probe(saved_data).revisions)
+
+    def test_rejects_unsupported_maps(self):
+        with self.assertRaises(ValueError):
+            game_map.Map.probe(b"BLM\x1a\x01\x05" + self._map_data[6:])
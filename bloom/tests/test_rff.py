@@ -0,0 +1,351 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import fnmatch
+import os
+import os.path
+import struct
+import tempfile
+import typing
+import unittest
+from concurrent import futures
+from unittest import mock
+
+from .. import data_loading, rff
+
+_FLAG_ENCRYPTED = 1 << 4
+
+
+def _entry(offset: int, size: int, flags: int, name: str, index: int):
+    base_name, extension = name.split(".")
+    return (
+        bytes(16)
+        + struct.pack("<IIIIB", offset, size, 0, 0, flags)
+        + f"{extension}{base_name}".encode().ljust(11, b"\0")
+        + struct.pack("<I", index)
+    )
+
+
+def write_test_archive(
+    path: str, files: typing.List[typing.Tuple[str, int, bool, bytes]]
+):
+    header_size = rff.Header.size()
+    body = b""
+    directory = b""
+    for name, index, encrypted, data in files:
+        if encrypted:
+            stored = data_loading.xor_bytes(data[:256], 0, shift=1) + data[256:]
+            flags = _FLAG_ENCRYPTED
+        else:
+            stored = data
+            flags = 0
+        directory += _entry(header_size + len(body), len(data), flags, name, index)
+        body += stored
+
+    directory_offset = header_size + len(body)
+    header = b"RFF\x1a" + struct.pack(
+        "<III4I", 0x301, directory_offset, len(files), 0, 0, 0, 0
+    )
+    with open(path, "wb") as file:
+        file.write(header)
+        file.write(body)
+        file.write(data_loading.xor_bytes(directory, directory_offset & 0xFF, 1))
+
+
+class TestRFF(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._directory.name, "TEST.RFF")
+        self._tile_palette = os.urandom(768)
+        self._sound = os.urandom(1000)
+        write_test_archive(
+            self._path,
+            [
+                ("BLOOD.PAL", 0, False, self._tile_palette),
+                ("SOUND.RAW", 7, True, self._sound),
+                ("SOUND.SFX", 7, False, b"descriptor"),
+            ],
+        )
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_can_read_entries(self):
+        with rff.RFF(self._path) as archive:
+            self.assertEqual(
+                ["BLOOD.PAL", "SOUND.RAW", "SOUND.SFX"], archive.file_listing()
+            )
+            self.assertEqual(self._tile_palette, archive.data_for_entry("BLOOD.PAL"))
+            self.assertEqual(self._sound, archive.data_for_entry("SOUND.RAW"))
+            self.assertEqual(b"descriptor", archive.data_for_entry_by_index("SFX", 7))
+            self.assertIsNone(archive.data_for_entry("MISSING.PAL"))
+            self.assertIsNone(archive.data_for_entry_by_index("SEQ", 7))
+
+    def test_can_peek_at_entries(self):
+        with rff.RFF(self._path) as archive:
+            self.assertEqual(self._sound[:300], archive.peek_entry("SOUND.RAW", 300))
+            self.assertEqual(b"desc", archive.peek_entry("SOUND.SFX", 4))
+            self.assertEqual(b"descriptor", archive.peek_entry("SOUND.SFX", 100))
+            self.assertIsNone(archive.peek_entry("MISSING.PAL", 4))
+
+    def test_can_read_from_many_threads(self):
+        with rff.RFF(self._path) as archive:
+
+            def _read(index: int):
+                if index % 2 == 0:
+                    return archive.data_for_entry("SOUND.RAW") == self._sound
+                return archive.data_for_entry("BLOOD.PAL") == self._tile_palette
+
+            with futures.ThreadPoolExecutor(max_workers=8) as executor:
+                self.assertTrue(all(executor.map(_read, range(1000))))
+
+    def test_views_outlive_the_archive(self):
+        archive = rff.RFF(self._path)
+        data = archive.data_for_entry("BLOOD.PAL")
+        archive.close()
+
+        self.assertEqual(self._tile_palette, data)
+
+    def test_can_close_while_buffers_are_exported(self):
+        archive = rff.RFF(self._path)
+        exported = struct.iter_unpack("B", archive._data)
+        archive.close()
+
+        self.assertEqual(os.path.getsize(self._path), len(list(exported)))
+
+
+class TestRFFCache(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._directory.name, "TEST.RFF")
+        self._files = {f"SOUND{index}.RAW": os.urandom(400) for index in range(4)}
+        write_test_archive(
+            self._path,
+            [
+                (name, index, True, data)
+                for index, (name, data) in enumerate(self._files.items())
+            ]
+            + [("LARGE.RAW", 10, True, os.urandom(2000))],
+        )
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_repeated_reads_are_served_from_cache(self):
+        with rff.RFF(self._path, cache_size=1000) as archive:
+            first = archive.data_for_entry("SOUND0.RAW")
+            second = archive.data_for_entry("SOUND0.RAW")
+
+            self.assertEqual(self._files["SOUND0.RAW"], second)
+            self.assertIs(first, second)
+            self.assertEqual(
+                rff.CacheStats(
+                    hits=1, misses=1, evictions=0, resident_bytes=400, capacity=1000
+                ),
+                archive.cache_stats,
+            )
+
+    def test_evicts_least_recently_used_entries(self):
+        with rff.RFF(self._path, cache_size=1000) as archive:
+            archive.data_for_entry("SOUND0.RAW")
+            archive.data_for_entry("SOUND1.RAW")
+            archive.data_for_entry("SOUND0.RAW")
+            archive.data_for_entry("SOUND2.RAW")
+
+            stats = archive.cache_stats
+            self.assertEqual(1, stats.evictions)
+            self.assertEqual(800, stats.resident_bytes)
+
+            archive.data_for_entry("SOUND0.RAW")
+            self.assertEqual(2, archive.cache_stats.hits)
+
+            archive.data_for_entry("SOUND1.RAW")
+            self.assertEqual(4, archive.cache_stats.misses)
+
+    def test_skips_entries_larger_than_the_cache(self):
+        with rff.RFF(self._path, cache_size=1000) as archive:
+            archive.data_for_entry("LARGE.RAW")
+            archive.data_for_entry("LARGE.RAW")
+
+            stats = archive.cache_stats
+            self.assertEqual(2, stats.misses)
+            self.assertEqual(0, stats.resident_bytes)
+
+    def test_cache_is_disabled_by_default(self):
+        with rff.RFF(self._path) as archive:
+            archive.data_for_entry("SOUND0.RAW")
+            archive.data_for_entry("SOUND0.RAW")
+
+            self.assertEqual(rff.CacheStats(0, 0, 0, 0, 0), archive.cache_stats)
+
+
+class TestRFFMatching(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._directory.name, "TEST.RFF")
+        self._names = [
+            "E1M1.MAP",
+            "BLOOD.PAL",
+            "E1M2.MAP",
+            "WATER.PAL",
+            "E2M1.MAP",
+            "BEAST.SFX",
+            "E1M10.MAP",
+            "BEAST.RAW",
+            "CP01.MAP",
+        ]
+        write_test_archive(
+            self._path,
+            [(name, index, False, b"x") for index, name in enumerate(self._names)],
+        )
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_matches_like_fnmatch(self):
+        with rff.RFF(self._path) as archive:
+            for pattern in [
+                "*.MAP",
+                "*.pal",
+                "E1*.MAP",
+                "E*.MAP",
+                "Z*.MAP",
+                "*.XYZ",
+                "BEAST.*",
+                "E?M1.MAP",
+                "[BW]*.PAL",
+                "*",
+                "BLOOD.PAL",
+                "MISSING.PAL",
+            ]:
+                expected = [
+                    name
+                    for name in self._names
+                    if fnmatch.fnmatchcase(name, pattern.upper())
+                ]
+                self.assertEqual(
+                    expected, list(archive.find_matching_entries(pattern)), pattern
+                )
+
+    def test_matches_with_indexes(self):
+        with rff.RFF(self._path) as archive:
+            self.assertEqual(
+                [("BLOOD.PAL", 1), ("WATER.PAL", 3)],
+                list(archive.find_matching_entries_with_indexes("*.PAL")),
+            )
+
+
+class TestRFFWriter(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._directory.name, "TEST.RFF")
+        self._source = os.path.join(self._directory.name, "source")
+        os.mkdir(self._source)
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def _write_source_file(self, name: str, data: bytes):
+        with open(os.path.join(self._source, name), "wb") as file:
+            file.write(data)
+
+    def test_round_trips_entries(self):
+        palette = os.urandom(768)
+        sound = os.urandom(1000)
+        with rff.RFFWriter(self._path) as writer:
+            writer.add_entry("blood.pal", palette)
+            writer.add_entry("SOUND.RAW", sound, index=7, encrypted=True)
+            writer.add_entry("SOUND.SFX", b"descriptor", index=7)
+
+        with rff.RFF(self._path) as archive:
+            self.assertEqual(
+                ["BLOOD.PAL", "SOUND.RAW", "SOUND.SFX"], archive.file_listing()
+            )
+            self.assertEqual(palette, archive.data_for_entry("BLOOD.PAL"))
+            self.assertEqual(sound, archive.data_for_entry_by_index("RAW", 7))
+            self.assertEqual(b"descriptor", archive.data_for_entry_by_index("SFX", 7))
+
+    def test_matches_reference_archive(self):
+        files = [
+            ("BLOOD.PAL", 0, False, os.urandom(768)),
+            ("SOUND.RAW", 7, True, os.urandom(1000)),
+            ("E1M1.MAP", 0, True, os.urandom(100)),
+        ]
+        reference_path = os.path.join(self._directory.name, "REFERENCE.RFF")
+        write_test_archive(reference_path, files)
+
+        with rff.RFFWriter(self._path) as writer:
+            for name, index, encrypted, data in files:
+                writer.add_entry(name, data, index=index, encrypted=encrypted)
+
+        with open(self._path, "rb") as file, open(reference_path, "rb") as reference:
+            self.assertEqual(reference.read(), file.read())
+
+    def test_streams_directories(self):
+        large = os.urandom(rff.RFFWriter._CHUNK_SIZE + 1000)
+        self._write_source_file("large.raw", large)
+        self._write_source_file("E1M1.MAP", b"map data")
+        self._write_source_file("BLOOD.PAL", b"palette")
+        os.mkdir(os.path.join(self._source, "nested"))
+
+        with rff.RFFWriter(self._path) as writer:
+            writer.add_directory(
+                self._source,
+                encrypted_extensions=["map", "RAW"],
+                indexes={"E1M1.MAP": 3},
+            )
+
+        with rff.RFF(self._path) as archive:
+            self.assertEqual(
+                ["BLOOD.PAL", "E1M1.MAP", "LARGE.RAW"], archive.file_listing()
+            )
+            self.assertEqual(large, archive.data_for_entry("LARGE.RAW"))
+            self.assertEqual(b"map data", archive.data_for_entry_by_index("MAP", 3))
+            self.assertEqual(b"palette", archive.data_for_entry("BLOOD.PAL"))
+
+    def test_pads_short_extensions(self):
+        with rff.RFFWriter(self._path) as writer:
+            writer.add_entry("FOO.MP", b"map")
+            writer.add_entry("X.A", b"a")
+            writer.add_entry("SOUND.SFX", b"sfx", index=3)
+
+        with rff.RFF(self._path) as archive:
+            self.assertEqual(["FOO.MP", "X.A", "SOUND.SFX"], archive.file_listing())
+            self.assertEqual(b"map", archive.data_for_entry("FOO.MP"))
+            self.assertEqual(["X.A"], list(archive.find_matching_entries("*.A")))
+            self.assertEqual(b"sfx", archive.data_for_entry_by_index("SFX", 3))
+
+    def test_can_close_more_than_once(self):
+        writer = rff.RFFWriter(self._path)
+        writer.add_entry("BLOOD.PAL", b"palette")
+        writer.close()
+        writer.close()
+
+        with rff.RFF(self._path) as archive:
+            self.assertEqual(b"palette", archive.data_for_entry("BLOOD.PAL"))
+
+    def test_failed_writes_leave_the_original_archive(self):
+        with rff.RFFWriter(self._path) as writer:
+            writer.add_entry("BLOOD.PAL", b"palette")
+
+        with self.assertRaises(OSError):
+            with rff.RFFWriter(self._path) as writer:
+                writer.add_entry("SOUND.RAW", b"sound")
+                writer.add_file(os.path.join(self._source, "MISSING.RAW"))
+
+        writer = rff.RFFWriter(self._path)
+        with mock.patch.object(writer, "_write_directory", side_effect=OSError):
+            with self.assertRaises(OSError):
+                writer.close()
+
+        with rff.RFF(self._path) as archive:
+            self.assertEqual(["BLOOD.PAL"], archive.file_listing())
+        self.assertEqual(
+            ["TEST.RFF", "source"], sorted(os.listdir(self._directory.name))
+        )
+
+    def test_rejects_names_that_do_not_fit(self):
+        with rff.RFFWriter(self._path) as writer:
+            for name in ["TOOLONGNAME.MAP", "SOUND.WAVE", "NOEXTENSION"]:
+                with self.assertRaises(ValueError):
+                    writer.add_entry(name, b"data")
@@ -0,0 +1,64 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import unittest
+
+from panda3d import core
+
+from ..tiles import texture_cache
+
+
+def _texture(size: int):
+    texture = core.Texture()
+    texture.setup_2d_texture(
+        size, 1, core.Texture.T_unsigned_byte, core.Texture.F_luminance
+    )
+    return texture
+
+
+class TestTextureCache(unittest.TestCase):
+    def test_repeated_lookups_are_hits(self):
+        cache = texture_cache.TextureCache(1000)
+        self.assertIsNone(cache.get((1, 0)))
+
+        texture = _texture(400)
+        cache.add((1, 0), texture)
+        self.assertIs(texture, cache.get((1, 0)))
+        self.assertEqual(
+            texture_cache.CacheStats(
+                hits=1, misses=1, evictions=0, resident_bytes=400, capacity=1000
+            ),
+            cache.stats,
+        )
+
+    def test_evicts_least_recently_used_textures(self):
+        cache = texture_cache.TextureCache(1000)
+        cache.add((1, 0), _texture(400))
+        cache.add((2, 0), _texture(400))
+        cache.get((1, 0))
+        cache.add((3, 0), _texture(400))
+
+        self.assertIn((1, 0), cache)
+        self.assertNotIn((2, 0), cache)
+        self.assertIn((3, 0), cache)
+        self.assertEqual(1, cache.stats.evictions)
+        self.assertEqual(800, cache.stats.resident_bytes)
+
+    def test_skips_textures_used_by_geometry(self):
+        cache = texture_cache.TextureCache(1000)
+        geometry = core.NodePath("geometry")
+        geometry.set_texture(_texture(400))
+        cache.add((1, 0), geometry.get_texture())
+        cache.add((2, 0), _texture(400))
+        cache.add((3, 0), _texture(400))
+
+        self.assertIn((1, 0), cache)
+        self.assertNotIn((2, 0), cache)
+
+        geometry.clear_texture()
+        # Panda releases unused render states once per frame.
+        core.RenderState.garbage_collect()
+        core.RenderAttrib.garbage_collect()
+        cache.add((4, 0), _texture(400))
+        self.assertNotIn((1, 0), cache)
+        self.assertEqual(800, cache.stats.resident_bytes)
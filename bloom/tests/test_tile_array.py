@@ -0,0 +1,53 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import unittest
+
+import numpy
+
+from ..tiles import tile_array
+
+
+def _image(value: int):
+    return numpy.full((2, 3, 4), value, dtype=numpy.uint8)
+
+
+class TestTileArray(unittest.TestCase):
+    def test_same_key_reuses_layer(self):
+        array = tile_array.TileArray(3, 2)
+        self.assertEqual(0, array.get_layer((1, b"a"), lambda: _image(1)))
+        self.assertEqual(1, array.get_layer((2, b"a"), lambda: _image(2)))
+        self.assertEqual(0, array.get_layer((1, b"a"), lambda: _image(3)))
+        self.assertEqual(2, array.layer_count)
+
+    def test_growing_keeps_existing_layers(self):
+        array = tile_array.TileArray(3, 2)
+        texture = array.texture
+        for layer in range(20):
+            array.get_layer(layer, lambda: _image(layer))
+
+        self.assertIs(texture, array.texture)
+        self.assertGreaterEqual(texture.get_z_size(), 20)
+
+        pages = numpy.frombuffer(texture.get_ram_image(), dtype=numpy.uint8)
+        pages = pages.reshape(texture.get_z_size(), -1)
+        for layer in range(20):
+            self.assertTrue((pages[layer] == layer).all())
+
+    def test_tiles_share_square_buckets(self):
+        self.assertEqual((64, 64), tile_array.bucket_size(64, 64))
+        self.assertEqual((128, 128), tile_array.bucket_size(64, 128))
+        self.assertEqual((128, 128), tile_array.bucket_size(100, 70))
+        self.assertEqual((8, 256), tile_array.bucket_size(8, 256))
+
+    def test_smaller_tiles_repeat_across_their_layer(self):
+        array = tile_array.TileArray(4, 4)
+        image = numpy.arange(2 * 3 * 4, dtype=numpy.uint8).reshape((2, 3, 4))
+        array.get_layer(1, lambda: image)
+
+        texture = array.texture
+        pages = numpy.frombuffer(texture.get_ram_image(), dtype=numpy.uint8)
+        layer = pages.reshape(texture.get_z_size(), 4, 4, 4)[0]
+        self.assertTrue((layer[:2, :3] == image).all())
+        self.assertTrue((layer[2:, :3] == image).all())
+        self.assertTrue((layer[:2, 3] == image[:, 0]).all())
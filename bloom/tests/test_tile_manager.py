@@ -0,0 +1,151 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import time
+import unittest
+from unittest import mock
+
+import numpy
+from panda3d import core
+
+from ..tiles import manager
+
+
+class TestTileManager(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(manager.art, "ArtManager")
+        art_manager_type = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self._art_manager = art_manager_type.return_value
+        self._art_manager.load_tile_image.side_effect = self._load_tile_image
+        self._art_manager.get_tile_variant_signature.side_effect = self._signature
+        self._art_manager.get_tile_dimensions.side_effect = self._tile_dimensions
+        self._art_manager.has_tile.side_effect = lambda picnum: 0 <= picnum < 16
+        self._tile_manager = manager.Manager("", mock.Mock(), mock.MagicMock())
+        self.addCleanup(self._tile_manager.shutdown)
+
+    @staticmethod
+    def _load_tile_image(picnum: int, lookup: int):
+        return numpy.full((2, picnum + 1, 4), lookup, dtype=numpy.uint8)
+
+    @staticmethod
+    def _tile_dimensions(picnum: int):
+        return (picnum + 1, 2)
+
+    @staticmethod
+    def _signature(picnum: int, lookup: int):
+        # Lookups 0 and 1 leave every colour these tiles use alone.
+        return bytes([max(lookup, 1)])
+
+    def _wait_for_tiles(self, loaded: dict, count: int):
+        deadline = time.time() + 5
+        while len(loaded) < count and time.time() < deadline:
+            self._tile_manager._process_loading_tiles()
+            time.sleep(0.001)
+
+    def test_decodes_tiles_in_the_background(self):
+        loaded = {}
+        for picnum in range(8):
+            self._tile_manager.get_tile_async(
+                picnum, 3, lambda tile, picnum=picnum: loaded.update({picnum: tile})
+            )
+        self._wait_for_tiles(loaded, 8)
+
+        self.assertEqual(set(range(8)), set(loaded.keys()))
+        for picnum, tile in loaded.items():
+            self.assertEqual(picnum + 1, tile.get_x_size())
+            self.assertIs(tile, self._tile_manager.get_tile(picnum, 3))
+
+    def test_reprioritised_tiles_are_decoded_first(self):
+        self._tile_manager._decode_executor = mock.Mock()
+        for picnum in range(4):
+            self._tile_manager.get_tile_async(picnum, 0, lambda tile: None, picnum)
+
+        self._tile_manager.reprioritise_tiles({(3, 0): -1, (0, 0): 5, (1, 1): -2})
+        for _ in range(4):
+            self._tile_manager._decode_next_tile()
+
+        self.assertEqual(
+            [3, 1, 2, 0],
+            [call[0][0] for call in self._art_manager.load_tile_image.call_args_list],
+        )
+
+    def test_cached_tiles_are_not_decoded_again(self):
+        tile = self._tile_manager.get_tile(5, 0)
+
+        loaded = {}
+        self._tile_manager.get_tile_async(5, 0, lambda tile: loaded.update({5: tile}))
+        self._wait_for_tiles(loaded, 1)
+
+        self.assertIs(tile, loaded[5])
+        self.assertEqual(1, self._art_manager.load_tile_image.call_count)
+
+    def test_identical_variants_share_a_texture(self):
+        tile = self._tile_manager.get_tile(3, 0)
+
+        self.assertIs(tile, self._tile_manager.get_tile(3, 1))
+        self.assertIsNot(tile, self._tile_manager.get_tile(3, 2))
+        self.assertEqual(
+            manager.VariantStats(variants=2, shared_textures=1, saved_bytes=32),
+            self._tile_manager.variant_stats,
+        )
+
+    def test_prefetches_each_missing_tile_once(self):
+        self._tile_manager.get_tile(1, 0)
+
+        self.assertFalse(self._tile_manager.prefetch_tile(1, 0))
+        self.assertFalse(self._tile_manager.prefetch_tile(-1, 0))
+        self.assertTrue(self._tile_manager.prefetch_tile(2, 0))
+        self.assertFalse(self._tile_manager.prefetch_tile(2, 0))
+
+        deadline = time.time() + 5
+        while self._tile_manager._prefetching and time.time() < deadline:
+            self._tile_manager._process_loading_tiles()
+            time.sleep(0.001)
+
+        self.assertIn(self._tile_manager._variant_key(2, 0), self._tile_manager._tiles)
+        self.assertFalse(self._tile_manager.prefetch_tile(2, 0))
+
+    def test_tiles_bind_over_a_placeholder(self):
+        node_path = core.NodePath("tile")
+        self._tile_manager.set_tile_async(node_path, 4, 0)
+        placeholder = node_path.get_texture()
+        self.assertEqual(1, placeholder.get_x_size())
+
+        deadline = time.time() + 5
+        while node_path.get_texture() == placeholder and time.time() < deadline:
+            self._tile_manager._process_loading_tiles()
+            time.sleep(0.001)
+
+        self.assertEqual(self._tile_manager.get_tile(4, 0), node_path.get_texture())
+
+    def test_stale_tiles_do_not_replace_newer_ones(self):
+        node_path = core.NodePath("tile")
+        self._tile_manager.set_tile_async(node_path, 4, 2)
+        self._tile_manager.set_tile(node_path, 6, 0)
+
+        loaded = {}
+        self._tile_manager.get_tile_async(4, 2, lambda tile: loaded.update({4: tile}))
+        self._wait_for_tiles(loaded, 1)
+
+        self.assertEqual(self._tile_manager.get_tile(6, 0), node_path.get_texture())
+
+    def test_failed_tiles_still_finish_their_requests(self):
+        self._art_manager.load_tile_image.side_effect = ValueError("corrupt tile")
+
+        node_path = core.NodePath("tile")
+        with self.assertLogs(manager.logger, "ERROR"):
+            self._tile_manager.set_tile_async(node_path, 4, 0)
+            self.assertTrue(self._tile_manager.prefetch_tile(5, 0))
+
+            deadline = time.time() + 5
+            while (
+                node_path.has_python_tag(self._tile_manager._PENDING_TILE_TAG)
+                or self._tile_manager._prefetching
+            ) and time.time() < deadline:
+                self._tile_manager._process_loading_tiles()
+                time.sleep(0.001)
+
+        self.assertEqual("error", node_path.get_texture().get_name())
+        self.assertFalse(self._tile_manager._prefetching)
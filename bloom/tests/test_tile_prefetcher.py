@@ -0,0 +1,42 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import unittest
+from unittest import mock
+
+from ..editor import tile_prefetcher
+
+
+def _sectors(count: int):
+    sectors = [mock.Mock(name=f"sector_{index}") for index in range(count)]
+    for index, sector in enumerate(sectors):
+        sector.get_tile_references.return_value = [(index, 0)]
+        sector.adjacent_sectors.return_value = [
+            sectors[adjacent]
+            for adjacent in [index - 1, index + 1]
+            if 0 <= adjacent < count
+        ]
+    return sectors
+
+
+class TestTilePrefetcher(unittest.TestCase):
+    def setUp(self):
+        self._tile_manager = mock.Mock()
+        self._tile_manager.prefetch_tile.return_value = True
+        self._prefetcher = tile_prefetcher.TilePrefetcher(self._tile_manager)
+
+    def test_prefetches_two_portal_hops_ahead(self):
+        sectors = _sectors(6)
+
+        self.assertEqual(3, self._prefetcher.prefetch([sectors[1]]))
+        self.assertEqual(
+            [mock.call(0, 0, 1), mock.call(2, 0, 1), mock.call(3, 0, 2)],
+            sorted(self._tile_manager.prefetch_tile.call_args_list),
+        )
+
+    def test_unchanged_visible_sets_are_skipped(self):
+        sectors = _sectors(3)
+
+        self._prefetcher.prefetch([sectors[0]])
+        self.assertEqual(0, self._prefetcher.prefetch([sectors[0]]))
+        self.assertEqual(2, self._tile_manager.prefetch_tile.call_count)
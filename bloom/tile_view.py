@@ -13,6 +13,8 @@ from .utils import gui
 
 
 class TileView:
+    _TILE_SIZE = 0.2
+
     def __init__(
         self,
         parent: DirectGui.DirectFrame,
@@ -23,6 +25,9 @@ class TileView:
         self._tile_manager = tile_manager
         self._on_tile_selected = on_tile_selected
         self._tile_indices: typing.Optional[typing.List[int]] = None
+        self._visible_rows = max(
+            math.ceil((frame_size[3] - frame_size[2]) / self._TILE_SIZE), 1
+        )
 
         self._frame = DirectGui.DirectScrolledFrame(
             parent=parent,
@@ -37,6 +42,13 @@ class TileView:
 
         self._selected_tile: DirectGui.DirectFrame = None
         self._tile_frames: typing.Dict[int, DirectGui.DirectFrame] = {}
+        self._tile_rows: typing.List[typing.List[int]] = []
+        self._tile_row_numbers: typing.Dict[int, int] = {}
+        self._first_visible_row: typing.Optional[int] = None
+        self._tile_images: typing.Dict[int, DirectGui.DirectButton] = {}
+        self._loading_tiles: typing.Set[int] = set()
+        self._wanted_tiles: typing.Set[int] = set()
+        self._scroll_bar["command"] = self._update_visible_tiles
 
     def load_tiles(self, tile_indices: typing.List[int] = None):
         if tile_indices is None:
@@ -52,27 +64,79 @@ class TileView:
 
         tile_count = len(tile_indices)
         row_count = math.ceil(tile_count / 10)
+        self._tile_rows = []
+        self._tile_row_numbers = {}
+        self._first_visible_row = None
 
         self._top = 0.2
         for y in range(row_count):
             self._top -= 0.2
-            for x in range(10):
+            row = tile_indices[y * 10 : (y + 1) * 10]
+            for x, picnum in enumerate(row):
                 left = x * 0.2
-                picnum_index = y * 10 + x
-                if picnum_index >= tile_count:
-                    break
-
-                picnum = tile_indices[picnum_index]
-
                 frame = self._get_tile_frame(picnum)
                 frame.set_pos(core.Vec3(left, 0, self._top))
                 frame.show()
+                self._tile_row_numbers[picnum] = y
+            self._tile_rows.append(row)
         self._top = min(-1, self._top)
 
         frame_size = list(self._frame["canvasSize"])
         frame_size[2] = self._top
         self._frame["canvasSize"] = frame_size
 
+        self._update_visible_tiles()
+
+    def _update_visible_tiles(self):
+        # Only rows on screen, and a page either side of them, show their
+        # tile. Textures of rows further away are let go so the tile cache
+        # is free to evict them.
+        row_count = len(self._tile_rows)
+        first_visible_row = int(
+            self._scroll_bar.getValue() * max(row_count - self._visible_rows, 0)
+        )
+        first_row = max(first_visible_row - self._visible_rows, 0)
+        last_row = min(first_visible_row + 2 * self._visible_rows, row_count)
+
+        wanted_tiles: typing.Set[int] = set()
+        for y in range(first_row, last_row):
+            priority = self._row_priority(y, first_visible_row)
+            for picnum in self._tile_rows[y]:
+                wanted_tiles.add(picnum)
+                if picnum in self._tile_images or picnum in self._loading_tiles:
+                    continue
+
+                self._loading_tiles.add(picnum)
+                callback = self._make_tile_callback(self._tile_frames[picnum], picnum)
+                self._tile_manager.get_tile_async(picnum, 0, callback, priority)
+
+        for picnum in list(self._tile_images.keys()):
+            if picnum not in wanted_tiles:
+                self._tile_images.pop(picnum).destroy()
+        self._wanted_tiles = wanted_tiles
+
+        if first_visible_row != self._first_visible_row:
+            self._first_visible_row = first_visible_row
+            self._reprioritise_loading_tiles(first_visible_row)
+
+    def _reprioritise_loading_tiles(self, first_visible_row: int):
+        # Tiles requested before a scroll still carry the priority of where
+        # the view was, move them to match where it is now.
+        priorities = {
+            (picnum, 0): self._row_priority(
+                self._tile_row_numbers[picnum], first_visible_row
+            )
+            for picnum in self._loading_tiles
+            if picnum in self._tile_row_numbers
+        }
+        if priorities:
+            self._tile_manager.reprioritise_tiles(priorities)
+
+    def _row_priority(self, row: int, first_visible_row: int):
+        if row < first_visible_row:
+            return first_visible_row - row
+        return max(row - first_visible_row - self._visible_rows + 1, 0)
+
     def _get_tile_frame(self, picnum: int):
         if picnum not in self._tile_frames:
             frame = DirectGui.DirectButton(
@@ -87,9 +151,6 @@ class TileView:
             self._bind_scroll(frame)
             self._tile_frames[picnum] = frame
 
-            callback = self._make_tile_callback(frame, picnum)
-            self._tile_manager.get_tile_async(picnum, 0, callback)
-
         return self._tile_frames[picnum]
 
     def set_selected(self, picnum: int):
@@ -119,7 +180,8 @@ class TileView:
 
     def _make_tile_callback(self, parent_frame: DirectGui.DirectFrame, picnum: int):
         def _callback(texture: core.Texture):
-            if parent_frame.is_empty():
+            self._loading_tiles.discard(picnum)
+            if parent_frame.is_empty() or picnum not in self._wanted_tiles:
                 return
 
             frame_size = gui.size_inside_square_for_texture(texture, 0.2)
@@ -136,6 +198,7 @@ class TileView:
                 extraArgs=[picnum],
             )
             self._bind_scroll(tile)
+            self._tile_images[picnum] = tile
 
             tile_number = DirectGui.DirectLabel(
                 parent=tile,
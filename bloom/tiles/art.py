@@ -1,14 +1,20 @@
 # Copyright 2020 Thomas Rogers
 # SPDX-License-Identifier: Apache-2.0
 
+import hashlib
+import os
 import os.path
 import pickle
+import threading
 import typing
 
 import numpy
 
 from .. import data_loading, game_map
 from ..rff import RFF
+from . import image_cache
+
+T = typing.TypeVar("T")
 
 
 class Header(data_loading.CustomStruct):
@@ -43,6 +49,10 @@ class Tile:
     def animation_data(self):
         return self._animation_data
 
+    @property
+    def data_offset(self):
+        return self._data_offset
+
     @property
     def data_size(self):
         return self._width * self._height
@@ -63,16 +73,22 @@ class Tile:
     def y_offset(self):
         return self._animation_data.offset_y
 
-    def load(self, unpacker: data_loading.Unpacker, palette, palette_lookup):
-        unpacker.seek(self._data_offset)
-        indices = (
-            numpy.frombuffer(unpacker.get_bytes(self.data_size), dtype="uint8")
-            .reshape((self._width, self._height))
-            .T
+    def load(self, unpacker: data_loading.Unpacker, colour_table: numpy.ndarray):
+        # ART stores tiles column major, taking through the transposed indices
+        # writes each pixel straight into its row major slot with no
+        # intermediate copies.
+        image = numpy.empty((self._height, self._width), dtype=numpy.uint32)
+        numpy.take(colour_table, self.load_indices(unpacker), out=image, mode="clip")
+        return image.view(numpy.uint8).reshape((self._height, self._width, 4))
+
+    def load_indices(self, unpacker: data_loading.Unpacker):
+        # Slice the buffer rather than seeking so tiles can be decoded from
+        # several threads at once.
+        data = unpacker.buffer[self._data_offset : self._data_offset + self.data_size]
+        return (
+            numpy.frombuffer(data, dtype="uint8").reshape((self._width, self._height)).T
         )
 
-        return palette[palette_lookup[indices]]
-
 
 class ArtData(typing.NamedTuple):
     widths: typing.List[int]
@@ -81,11 +97,115 @@ class ArtData(typing.NamedTuple):
     data_offset: int
 
 
+class PaletteSet:
+    LOOKUP_COUNT = 128
+    _SHADE_COUNT = 64
+    _DEFAULT_PALETTE = "BLOOD.PAL"
+
+    def __init__(self, rff: RFF):
+        self._rff = rff
+        self._palettes: typing.Dict[str, numpy.ndarray] = {}
+        for palette_entry in rff.find_matching_entries("*.pal"):
+            self._palettes[palette_entry] = self._load_palette(
+                rff.data_for_entry(palette_entry)
+            )
+
+        self._lookups: typing.Dict[int, numpy.ndarray] = {}
+        self._colour_tables: typing.Dict[int, numpy.ndarray] = {}
+        self._lookup_identities: typing.Dict[int, bytes] = {}
+        self._lookup_lock = threading.Lock()
+
+    @property
+    def default_palette(self) -> numpy.ndarray:
+        return self._palettes[self._DEFAULT_PALETTE]
+
+    @property
+    def loaded_lookup_count(self):
+        return len(self._lookups)
+
+    def get_palette(self, palette_name: str) -> numpy.ndarray:
+        return self._palettes[palette_name]
+
+    def get_lookup(self, lookup: int) -> numpy.ndarray:
+        lookup = self._normalise_lookup(lookup)
+
+        with self._lookup_lock:
+            result = self._lookups.get(lookup)
+            if result is None:
+                result = self._load_lookup(lookup)
+                self._lookups[lookup] = result
+            return result
+
+    def get_colour_table(self, lookup: int) -> numpy.ndarray:
+        lookup = self._normalise_lookup(lookup)
+        palette_lookup = self.get_lookup(lookup)
+        with self._lookup_lock:
+            result = self._colour_tables.get(lookup)
+            if result is None:
+                colours = numpy.ascontiguousarray(
+                    self.default_palette[palette_lookup[0]]
+                )
+                result = colours.view(numpy.uint32).reshape(256)
+                result.setflags(write=False)
+                self._colour_tables[lookup] = result
+            return result
+
+    def lookup_identity(self, lookup: int) -> bytes:
+        lookup = self._normalise_lookup(lookup)
+        palette_lookup = self.get_lookup(lookup)
+        with self._lookup_lock:
+            identity = self._lookup_identities.get(lookup)
+            if identity is None:
+                digest = hashlib.blake2b(digest_size=16)
+                digest.update(self.default_palette.tobytes())
+                digest.update(palette_lookup.tobytes())
+                identity = digest.digest()
+                self._lookup_identities[lookup] = identity
+            return identity
+
+    def _normalise_lookup(self, lookup: int):
+        if lookup < 0 or lookup >= self.LOOKUP_COUNT:
+            return 0
+        return lookup
+
+    @staticmethod
+    def _load_palette(palette_data: bytes):
+        rgb = numpy.frombuffer(palette_data, dtype=numpy.uint8).reshape((256, 3))
+
+        palette = numpy.empty((256, 4), dtype=numpy.uint8)
+        palette[:, :3] = rgb[:, ::-1]
+        palette[:, 3] = 255
+        palette[255, 3] = 0
+        palette.setflags(write=False)
+        return palette
+
+    def _load_lookup(self, lookup: int):
+        lookup_data = self._rff.data_for_entry_by_index("PLU", lookup)
+        if lookup_data is None:
+            result = numpy.zeros((self._SHADE_COUNT, 256), dtype=numpy.uint8)
+        else:
+            result = numpy.frombuffer(lookup_data, dtype=numpy.uint8).reshape(
+                (self._SHADE_COUNT, 256)
+            )
+            result = result.copy()
+            result[:, 255] = 255
+        result.setflags(write=False)
+        return result
+
+
 class Art:
-    def __init__(self, rff: RFF, path: str):
+    def __init__(
+        self,
+        palettes: PaletteSet,
+        path: str,
+        image_cache: "image_cache.TileImageCache" = None,
+    ):
+        self._path = path
+        self._image_cache = image_cache
         with open(path, "rb") as file:
             tile_data = file.read()
         self._unpacker = data_loading.Unpacker(tile_data)
+        self._identity = self._get_identity(path, tile_data)
 
         self._header = self._unpacker.read_struct(Header)
         self._count = self._header.tile_end - self._header.tile_start + 1
@@ -103,32 +223,37 @@ class Art:
 
             data_offset += tile.data_size
 
-        self._palettes = {}
-        for palette_entry in rff.find_matching_entries("*.pal"):
-            palette = numpy.frombuffer(
-                rff.data_for_entry(palette_entry), dtype="uint8"
-            ).reshape((256, 3))
-            b, g, r = palette[:, 0], palette[:, 1], palette[:, 2]
-            a = [255] * 255 + [0]
-            palette = numpy.array(list(zip(r, g, b, a))).astype("uint8")
-            self._palettes[palette_entry] = palette
-
-        self._lookups = []
-        for lookup_index in range(128):
-            lookup_data = rff.data_for_entry_by_index("PLU", lookup_index)
-            if lookup_data is None:
-                lookup = numpy.zeros((64, 256))
-            else:
-                lookup = numpy.frombuffer(lookup_data, dtype="uint8").reshape((64, 256))
-                lookup = numpy.array(lookup)
-                lookup[:, 255] = 255
-            self._lookups.append(lookup)
-
-        self._default_palette = self._palettes["BLOOD.PAL"]
+        self._palettes = palettes
+        self._used_indices: typing.Dict[int, numpy.ndarray] = {}
+
+    @staticmethod
+    def _get_identity(path: str, tile_data: bytes):
+        # Hashing a whole ART file takes a while, the hash is kept for as long
+        # as the file has the same path, size and modification time.
+        stat = os.stat(path)
+        file_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        art_name = os.path.basename(path)
+        cache_path = f"cache/{art_name}.identity.bin"
+
+        if os.path.exists(cache_path):
+            with open(cache_path, "rb") as file:
+                cached_key, identity = pickle.load(file)
+            if cached_key == file_key:
+                return identity
+
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+        digest.update(tile_data)
+        identity = digest.digest()
+
+        with open(cache_path, "w+b") as file:
+            pickle.dump((file_key, identity), file)
+
+        return identity
 
     def _load_art_data(self, path: str):
         art_name = os.path.basename(path)
-        cache_path = f"cache/{art_name}.data.bin"
+        cache_path = f"cache/{art_name}.{self._identity.hex()}.data.bin"
 
         if os.path.exists(cache_path):
             with open(cache_path, "rb") as file:
@@ -148,6 +273,30 @@ class Art:
     def count(self):
         return len(self._tiles)
 
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def identity(self):
+        return self._identity
+
+    @property
+    def palettes(self):
+        return self._palettes
+
+    @property
+    def tile_dimensions(self):
+        return [(tile.width, tile.height) for tile in self._tiles]
+
+    @property
+    def tile_start(self):
+        return self._header.tile_start
+
+    @property
+    def tile_end(self):
+        return self._header.tile_end
+
     def get_tile_indices(self):
         return [
             index for index in range(self._header.tile_start, self._header.tile_end)
@@ -171,24 +320,91 @@ class Art:
         return (tile.x_offset, tile.y_offset)
 
     def load_tile_image(self, tile_number: int, lookup: int):
-        if lookup >= len(self._lookups):
-            lookup = self._lookups[0]
-        else:
-            lookup = self._lookups[lookup]
+        if self._image_cache is not None:
+            return self._image_cache.load_tile_image(self, tile_number, lookup)
+        return self.decode_tile_image(tile_number, lookup)
+
+    def decode_tile_image(self, tile_number: int, lookup: int):
         return self.get_tile(tile_number).load(
-            self._unpacker, self._default_palette, lookup[0]
+            self._unpacker, self._palettes.get_colour_table(lookup)
         )
 
+    def load_tile_indices(self, tile_number: int):
+        return self.get_tile(tile_number).load_indices(self._unpacker)
+
+    def get_tile_variant_signature(self, tile_number: int, lookup: int) -> bytes:
+        used_indices = self._used_indices.get(tile_number)
+        if used_indices is None:
+            used_indices = numpy.unique(self.load_tile_indices(tile_number))
+            self._used_indices[tile_number] = used_indices
+
+        # Two lookups give identical pixels exactly when they send every colour
+        # the tile uses to the same palette entry.
+        colour_table = self._palettes.get_colour_table(lookup)
+        return colour_table[used_indices].tobytes()
+
     def get_tile(self, tile_number: int):
         return self._tiles[tile_number - self._header.tile_start]
 
 
+class TileTable(typing.NamedTuple):
+    """
+    Per tile values indexed by picnum, None where no ART file has the tile.
+
+    The getters are hit constantly by geometry and animation, and indexing a
+    list is much cheaper than unboxing NumPy scalars.
+    """
+
+    art: typing.List[typing.Optional[Art]]
+    dimensions: typing.List[typing.Optional[typing.Tuple[int, int]]]
+    offsets: typing.List[typing.Optional[typing.Tuple[int, int]]]
+    animation_data: typing.List[typing.Optional[AnimationData]]
+
+    @staticmethod
+    def build(art: typing.List[Art]):
+        tile_count = max((art_file.tile_end + 1 for art_file in art), default=0)
+        table = TileTable(
+            art=[None] * tile_count,
+            dimensions=[None] * tile_count,
+            offsets=[None] * tile_count,
+            animation_data=[None] * tile_count,
+        )
+
+        # Earlier files win where ranges overlap, matching the old linear scan.
+        for art_file in reversed(art):
+            for tile_number in range(art_file.tile_start, art_file.tile_end + 1):
+                tile = art_file.get_tile(tile_number)
+                table.art[tile_number] = art_file
+                table.dimensions[tile_number] = (tile.width, tile.height)
+                table.offsets[tile_number] = (tile.x_offset, tile.y_offset)
+                table.animation_data[tile_number] = tile.animation_data
+
+        return table
+
+
 class ArtManager:
     MAX_TILES = 4096
 
-    def __init__(self, rff: RFF, paths: typing.List[str]):
-        self._art = [Art(rff, path) for path in paths]
-        self._art = self._art
+    def __init__(self, rff: RFF, paths: typing.List[str], image_cache_path: str = None):
+        self._palettes = PaletteSet(rff)
+        if image_cache_path is None:
+            self._image_cache = None
+        else:
+            self._image_cache = image_cache.TileImageCache(image_cache_path)
+        self._art = [Art(self._palettes, path, self._image_cache) for path in paths]
+        self._table = TileTable.build(self._art)
+
+    @property
+    def palettes(self):
+        return self._palettes
+
+    @property
+    def table(self):
+        return self._table
+
+    @property
+    def image_cache(self):
+        return self._image_cache
 
     def get_tile_indices(self):
         return [
@@ -198,21 +414,40 @@ class ArtManager:
             if index < self.MAX_TILES
         ]
 
+    def has_tile(self, tile_number: int):
+        return (
+            0 <= tile_number < len(self._table.art)
+            and self._table.art[tile_number] is not None
+        )
+
     def get_tile_animation_data(self, tile_number: int):
-        return self._get_art(tile_number).get_tile_animation_data(tile_number)
+        return self._tile_value(self._table.animation_data, tile_number)
 
     def get_tile_dimensions(self, tile_number: int):
-        return self._get_art(tile_number).get_tile_dimensions(tile_number)
+        return self._tile_value(self._table.dimensions, tile_number)
 
     def get_tile_offsets(self, tile_number: int):
-        return self._get_art(tile_number).get_tile_offsets(tile_number)
+        return self._tile_value(self._table.offsets, tile_number)
 
     def load_tile_image(self, tile_number: int, lookup: int):
         return self._get_art(tile_number).load_tile_image(tile_number, lookup)
 
-    def _get_art(self, tile_number: int):
-        for art in self._art:
-            if art.has_tile(tile_number):
-                return art
+    def load_tile_indices(self, tile_number: int):
+        return self._get_art(tile_number).load_tile_indices(tile_number)
+
+    def get_tile_variant_signature(self, tile_number: int, lookup: int):
+        return self._get_art(tile_number).get_tile_variant_signature(
+            tile_number, lookup
+        )
+
+    def _get_art(self, tile_number: int) -> Art:
+        return self._tile_value(self._table.art, tile_number)
+
+    @staticmethod
+    def _tile_value(values: typing.List[T], tile_number: int) -> T:
+        if 0 <= tile_number < len(values):
+            value = values[tile_number]
+            if value is not None:
+                return value
 
         raise ValueError(f"Tile {tile_number} not available")
@@ -0,0 +1,233 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import hashlib
+import logging
+import mmap
+import os
+import os.path
+import threading
+import typing
+
+import numpy
+
+from .. import data_loading
+
+logger = logging.getLogger(__name__)
+
+
+class Header(data_loading.CustomStruct):
+    magic: data_loading.Magic
+    version: data_loading.UInt32
+    digest: data_loading.SizedType(bytes, 16)
+    tile_start: data_loading.UInt32
+    tile_count: data_loading.UInt32
+
+
+class CacheStats(typing.NamedTuple):
+    mapped_files: int
+    built_files: int
+    stale_files: int
+    decoded_tiles: int
+
+
+class _TileLayout(typing.NamedTuple):
+    dimensions: typing.List[typing.Tuple[int, int]]
+    sizes: numpy.ndarray
+    data_start: int
+
+    @staticmethod
+    def for_art(art):
+        # The header is followed by the offset of every tile, zero until the
+        # tile is decoded. Tiles are appended as they are decoded, so the file
+        # only ever holds the tiles that were used.
+        dimensions = art.tile_dimensions
+        sizes = numpy.array(
+            [width * height * 4 for width, height in dimensions], dtype=numpy.int64
+        )
+        return _TileLayout(dimensions, sizes, Header.size() + len(dimensions) * 8)
+
+    def offsets(self, data) -> numpy.ndarray:
+        return numpy.frombuffer(
+            data, dtype="<u8", count=len(self.dimensions), offset=Header.size()
+        )
+
+
+class _MappedTiles:
+    def __init__(self, path: str, tile_start: int, layout: _TileLayout):
+        self._path = path
+        self._tile_start = tile_start
+        self._layout = layout
+        self._lock = threading.Lock()
+        self._map(os.path.getsize(path))
+
+        offsets = self._offsets.astype(numpy.int64)
+        stored = offsets != 0
+        self._end = int(
+            max((offsets + layout.sizes)[stored].max(initial=0), layout.data_start)
+        )
+
+    def image(self, tile_number: int) -> typing.Optional[numpy.ndarray]:
+        index = tile_number - self._tile_start
+        with self._lock:
+            offset = int(self._offsets[index])
+            if offset == 0:
+                return None
+            return self._tile_view(index, offset)
+
+    def store(self, tile_number: int, image: numpy.ndarray):
+        index = tile_number - self._tile_start
+        size = int(self._layout.sizes[index])
+        with self._lock:
+            # Two threads racing on the same tile decoded the same pixels. Only
+            # one editor is expected to append to a cache file at a time.
+            if self._offsets[index] != 0:
+                return
+
+            offset = self._end
+            if offset + size > len(self._data):
+                self._map(max(offset + size, len(self._data) * 3 // 2))
+            self._tile_view(index, offset)[:] = image
+            self._offsets[index] = offset
+            self._end = offset + size
+
+    def _map(self, size: int):
+        # Images handed out earlier keep the previous mapping alive, it stays
+        # valid as the file only ever grows.
+        with open(self._path, "r+b") as file:
+            if size > os.path.getsize(self._path):
+                file.truncate(size)
+            mapping = mmap.mmap(file.fileno(), 0)
+        self._data = numpy.frombuffer(mapping, dtype=numpy.uint8)
+        self._offsets = self._layout.offsets(self._data)
+
+    def _tile_view(self, index: int, offset: int):
+        width, height = self._layout.dimensions[index]
+        return self._data[offset : offset + width * height * 4].reshape(
+            (height, width, 4)
+        )
+
+
+class TileImageCache:
+    MAGIC = b"BTIC"
+    VERSION = 3
+
+    def __init__(self, directory: str):
+        self._directory = directory
+        self._files: typing.Dict[typing.Tuple[str, int], _MappedTiles] = {}
+        self._file_locks: typing.Dict[typing.Tuple[str, int], threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._built_files = 0
+        self._stale_files = 0
+        self._decoded_tiles = 0
+
+    @property
+    def stats(self):
+        with self._lock:
+            return CacheStats(
+                len(self._files),
+                self._built_files,
+                self._stale_files,
+                self._decoded_tiles,
+            )
+
+    def load_tile_image(self, art, tile_number: int, lookup: int) -> numpy.ndarray:
+        mapped = self._mapped_tiles(art, lookup)
+        image = mapped.image(tile_number)
+        if image is not None:
+            return image
+
+        # Tiles are decoded the first time they are asked for, two threads
+        # racing on the same tile both write the same pixels.
+        image = art.decode_tile_image(tile_number, lookup)
+        mapped.store(tile_number, image)
+        with self._lock:
+            self._decoded_tiles += 1
+        return image
+
+    def _mapped_tiles(self, art, lookup: int):
+        key = (art.path, lookup)
+        with self._lock:
+            mapped = self._files.get(key)
+            if mapped is not None:
+                return mapped
+            file_lock = self._file_locks.setdefault(key, threading.Lock())
+
+        # Only requests for the same file wait while it is mapped.
+        with file_lock:
+            with self._lock:
+                mapped = self._files.get(key)
+            if mapped is None:
+                mapped = self._map_tiles(art, lookup)
+                with self._lock:
+                    self._files[key] = mapped
+        return mapped
+
+    def _map_tiles(self, art, lookup: int):
+        art_name = os.path.basename(art.path)
+        path = os.path.join(self._directory, f"{art_name}.{lookup}.tiles")
+        digest = self._digest(art, lookup)
+        layout = _TileLayout.for_art(art)
+
+        if os.path.exists(path):
+            if self._is_current(path, digest, layout):
+                return _MappedTiles(path, art.tile_start, layout)
+
+            logger.info(f"Tile image cache {path} is stale, rebuilding")
+            with self._lock:
+                self._stale_files += 1
+
+        self._build(path, art, digest, layout)
+        with self._lock:
+            self._built_files += 1
+        return _MappedTiles(path, art.tile_start, layout)
+
+    def _digest(self, art, lookup: int):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.VERSION.to_bytes(4, "little"))
+        digest.update(art.identity)
+        digest.update(art.palettes.lookup_identity(lookup))
+        return digest.digest()
+
+    def _is_current(self, path: str, digest: bytes, layout: _TileLayout):
+        with open(path, "rb") as file:
+            header_data = file.read(layout.data_start)
+        if len(header_data) < layout.data_start:
+            return False
+
+        header = Header.codec().unpack_from(header_data)
+        if (
+            header.magic != self.MAGIC
+            or header.version != self.VERSION
+            or header.digest != digest
+            or header.tile_count != len(layout.dimensions)
+        ):
+            return False
+
+        offsets = layout.offsets(header_data).astype(numpy.int64)
+        stored = offsets != 0
+        ends = (offsets + layout.sizes)[stored]
+        return bool(
+            (offsets[stored] >= layout.data_start).all()
+            and (ends <= os.path.getsize(path)).all()
+        )
+
+    def _build(self, path: str, art, digest: bytes, layout: _TileLayout):
+        os.makedirs(self._directory, exist_ok=True)
+
+        header = Header(
+            magic=self.MAGIC,
+            version=self.VERSION,
+            digest=digest,
+            tile_start=art.tile_start,
+            tile_count=len(layout.dimensions),
+        )
+
+        # Only the header and an empty offset for every tile are written, tiles
+        # are appended as they are decoded. Write next to the destination and
+        # swap it in, so a concurrent launch never maps a half written file.
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(header.codec().pack(header))
+            file.write(bytes(layout.data_start - Header.size()))
+        os.replace(temporary_path, path)
@@ -1,16 +1,26 @@
 # Copyright 2020 Thomas Rogers
 # SPDX-License-Identifier: Apache-2.0
 
+import heapq
+import itertools
+import logging
+import os.path
 import queue
+import threading
 import time
 import typing
+from collections import defaultdict
+from concurrent import futures
 from glob import glob
 
+import numpy
 from panda3d import core
 
-from .. import constants, edit_mode
+from .. import constants, edit_mode, find_resource
 from ..rff import RFF
-from . import art
+from . import art, texture_cache, tile_array
+
+logger = logging.getLogger(__name__)
 
 
 class AnimationData(typing.NamedTuple):
@@ -19,20 +29,77 @@ class AnimationData(typing.NamedTuple):
     animation_count: int
 
 
+class _TileRequest(typing.NamedTuple):
+    priority: int
+    sequence: int
+    picnum: int
+    lookup: int
+    callback: typing.Callable[[core.Texture], None]
+
+
+class VariantStats(typing.NamedTuple):
+    variants: int
+    shared_textures: int
+    saved_bytes: int
+
+
+class _DecodedTile(typing.NamedTuple):
+    picnum: int
+    lookup: int
+    key: typing.Tuple[int, bytes]
+    image: typing.Any
+    callback: typing.Callable[[core.Texture], None]
+
+
 class Manager:
+    _DECODE_WORKERS = 4
+    _PENDING_TILE_TAG = "pending_tile"
+
     def __init__(
         self, blood_path: str, rff: RFF, edit_mode_selector: edit_mode.EditMode
     ):
         self._edit_mode_selector = edit_mode_selector
-        self._tiles: typing.Dict[int, typing.Dict[int, core.Texture]] = {}
-        self._tile_loads: "queue.Queue[typing.Tuple[int,int,typing.Callable[[core.Texture], None]]]" = (
-            queue.Queue()
+        self._tiles = texture_cache.TextureCache(constants.TILE_CACHE_SIZE)
+        self._lookup_textures: typing.Dict[int, core.Texture] = {}
+        self._palette_texture: core.Texture = None
+        self._placeholder_texture: core.Texture = None
+        self._error_texture: core.Texture = None
+        self._indexed_tile_shader: core.Shader = None
+        self._tile_arrays: typing.Dict[typing.Tuple[int, int], tile_array.TileArray] = (
+            {}
+        )
+        self._batched_tile_shader: core.Shader = None
+        self._tile_requests: typing.List[_TileRequest] = []
+        self._tile_request_lock = threading.Lock()
+        self._request_sequence = itertools.count()
+        self._decoded_tiles: "queue.Queue[_DecodedTile]" = queue.Queue()
+        self._variant_keys: typing.Dict[
+            typing.Tuple[int, int], typing.Tuple[int, bytes]
+        ] = {}
+        self._variant_lookups: typing.Dict[
+            typing.Tuple[int, bytes], typing.Set[int]
+        ] = defaultdict(set)
+        self._variant_lock = threading.Lock()
+        self._prefetching: typing.Set[typing.Tuple[int, int]] = set()
+        self._decode_executor = futures.ThreadPoolExecutor(
+            max_workers=self._DECODE_WORKERS
         )
 
         art_paths = glob(f"{blood_path}/*.[aA][rR][tT]")
-        self._art_manager = art.ArtManager(rff, art_paths)
+        if constants.TILE_IMAGE_CACHE_ENABLED:
+            image_cache_path = os.path.join(constants.CACHE_PATH, "tiles")
+        else:
+            image_cache_path = None
+        self._art_manager = art.ArtManager(rff, art_paths, image_cache_path)
         self._edit_mode_selector.always_run(self._process_loading_tiles)
 
+    def shutdown(self):
+        # Drop anything still queued, only the tiles already decoding are
+        # waited for.
+        with self._tile_request_lock:
+            self._tile_requests.clear()
+        self._decode_executor.shutdown()
+
     def get_all_tiles(self) -> typing.List[int]:
         return sorted(self._art_manager.get_tile_indices())
 
@@ -44,26 +111,222 @@ class Manager:
         x_offset, y_offset = self._art_manager.get_tile_offsets(picnum)
         return core.Vec2(x_offset, y_offset)
 
-    def get_tile(self, picnum: int, lookup: int):
-        if lookup not in self._tiles:
-            self._tiles[lookup] = {}
+    @property
+    def cache_stats(self):
+        return self._tiles.stats
+
+    @property
+    def variant_stats(self):
+        shared_textures = 0
+        saved_bytes = 0
+        with self._variant_lock:
+            for (picnum, _), lookups in self._variant_lookups.items():
+                width, height = self._art_manager.get_tile_dimensions(picnum)
+                shared_textures += len(lookups) - 1
+                saved_bytes += (len(lookups) - 1) * width * height * 4
+            return VariantStats(
+                len(self._variant_lookups), shared_textures, saved_bytes
+            )
 
-        lookup_tiles = self._tiles[lookup]
-        if picnum not in lookup_tiles:
+    def get_tile(self, picnum: int, lookup: int):
+        key = self._variant_key(picnum, lookup)
+        tile = self._tiles.get(key)
+        if tile is None:
             image = self._art_manager.load_tile_image(picnum, lookup)
-            buffer = image.tobytes()
-
-            tile = core.Texture()
-            tile.setup_2d_texture(
-                image.shape[1],
-                image.shape[0],
-                core.Texture.T_unsigned_byte,
-                core.Texture.F_rgba8,
+            tile = self._new_tile_texture(key, image)
+
+        return tile
+
+    def _variant_key(self, picnum: int, lookup: int):
+        with self._variant_lock:
+            key = self._variant_keys.get((picnum, lookup))
+        if key is not None:
+            return key
+
+        signature = self._art_manager.get_tile_variant_signature(picnum, lookup)
+        key = (picnum, signature)
+        with self._variant_lock:
+            self._variant_keys[(picnum, lookup)] = key
+            self._variant_lookups[key].add(lookup)
+        return key
+
+    def _new_tile_texture(self, key: typing.Tuple[int, bytes], image):
+        tile = core.Texture()
+        tile.setup_2d_texture(
+            image.shape[1],
+            image.shape[0],
+            core.Texture.T_unsigned_byte,
+            core.Texture.F_rgba8,
+        )
+        tile.set_ram_image(numpy.ascontiguousarray(image))
+        self._tiles.add(key, tile)
+
+        return tile
+
+    @property
+    def indexed_textures(self):
+        return constants.INDEXED_TEXTURES
+
+    @property
+    def batched_geometry(self):
+        return constants.BATCHED_GEOMETRY
+
+    def get_tile_layer(
+        self, picnum: int, lookup: int
+    ) -> typing.Optional[typing.Tuple[core.Texture, int, core.Vec2]]:
+        width, height = self._art_manager.get_tile_dimensions(picnum)
+        if width < 1 or height < 1:
+            return None
+
+        size = tile_array.bucket_size(width, height)
+        array = self._tile_arrays.get(size)
+        if array is None:
+            array = tile_array.TileArray(*size)
+            self._tile_arrays[size] = array
+
+        layer = array.get_layer(
+            self._variant_key(picnum, lookup),
+            lambda: self._art_manager.load_tile_image(picnum, lookup),
+        )
+        return array.texture, layer, core.Vec2(width / size[0], height / size[1])
+
+    def set_tile_array(
+        self, node_path: core.NodePath, texture: core.Texture, priority=0
+    ):
+        node_path.set_texture(texture, priority)
+        node_path.set_shader(self._get_batched_tile_shader(), priority)
+
+    def set_tile_async(
+        self, node_path: core.NodePath, picnum: int, lookup: int, priority=0
+    ):
+        with self._variant_lock:
+            key = self._variant_keys.get((picnum, lookup))
+        if self.indexed_textures or (key is not None and key in self._tiles):
+            self.set_tile(node_path, picnum, lookup, priority)
+            return
+
+        request = (picnum, lookup)
+        node_path.set_texture(self._get_placeholder_texture(), priority)
+        node_path.set_python_tag(self._PENDING_TILE_TAG, request)
+
+        def _bind_tile(tile: core.Texture):
+            # The node may have been removed or given another tile while this
+            # one was decoding.
+            if node_path.is_empty():
+                return
+            if node_path.get_python_tag(self._PENDING_TILE_TAG) != request:
+                return
+            node_path.clear_python_tag(self._PENDING_TILE_TAG)
+            node_path.set_texture(tile, priority)
+
+        self.get_tile_async(picnum, lookup, _bind_tile)
+
+    def set_tile(self, node_path: core.NodePath, picnum: int, lookup: int, priority=0):
+        if node_path.has_python_tag(self._PENDING_TILE_TAG):
+            node_path.clear_python_tag(self._PENDING_TILE_TAG)
+
+        if not self.indexed_textures:
+            node_path.set_texture(self.get_tile(picnum, lookup), priority)
+            return
+
+        node_path.set_texture(self.get_indexed_tile(picnum), priority)
+        node_path.set_shader(self._get_indexed_tile_shader(), priority)
+        node_path.set_shader_input("palette", self._get_palette_texture(), priority)
+        node_path.set_shader_input("lookup", self.get_lookup_texture(lookup), priority)
+
+    def get_indexed_tile(self, picnum: int):
+        key = (picnum, None)
+        tile = self._tiles.get(key)
+        if tile is None:
+            indices = self._art_manager.load_tile_indices(picnum)
+            tile = self._new_index_texture(f"tile_{picnum}", indices)
+            self._tiles.add(key, tile)
+
+        return tile
+
+    def get_lookup_texture(self, lookup: int):
+        if lookup not in self._lookup_textures:
+            palette_lookup = self._art_manager.palettes.get_lookup(lookup)
+            self._lookup_textures[lookup] = self._new_index_texture(
+                f"lookup_{lookup}", palette_lookup
+            )
+
+        return self._lookup_textures[lookup]
+
+    def _get_palette_texture(self):
+        if self._palette_texture is None:
+            palette = self._art_manager.palettes.default_palette
+
+            self._palette_texture = core.Texture("palette")
+            self._palette_texture.setup_2d_texture(
+                palette.shape[0], 1, core.Texture.T_unsigned_byte, core.Texture.F_rgba8
             )
-            tile.set_ram_image(buffer)
-            lookup_tiles[picnum] = tile
+            self._set_nearest_sampling(self._palette_texture)
+            self._palette_texture.set_ram_image(palette.tobytes())
 
-        return lookup_tiles[picnum]
+        return self._palette_texture
+
+    def _get_placeholder_texture(self):
+        if self._placeholder_texture is None:
+            self._placeholder_texture = core.Texture("placeholder")
+            self._placeholder_texture.setup_2d_texture(
+                1, 1, core.Texture.T_unsigned_byte, core.Texture.F_rgba8
+            )
+            self._placeholder_texture.set_ram_image(bytes([128, 128, 128, 255]))
+
+        return self._placeholder_texture
+
+    def _get_error_texture(self):
+        if self._error_texture is None:
+            self._error_texture = core.Texture("error")
+            self._error_texture.setup_2d_texture(
+                1, 1, core.Texture.T_unsigned_byte, core.Texture.F_rgba8
+            )
+            self._error_texture.set_ram_image(bytes([255, 0, 255, 255]))
+
+        return self._error_texture
+
+    def _get_indexed_tile_shader(self):
+        if self._indexed_tile_shader is None:
+            self._indexed_tile_shader = self._load_shader("indexed_tile")
+
+        return self._indexed_tile_shader
+
+    def _get_batched_tile_shader(self):
+        if self._batched_tile_shader is None:
+            self._batched_tile_shader = self._load_shader("batched_tile")
+
+        return self._batched_tile_shader
+
+    @staticmethod
+    def _load_shader(name: str):
+        return core.Shader.load(
+            core.Shader.SL_GLSL,
+            vertex=core.Filename.from_os_specific(
+                find_resource(f"shaders/{name}.vert")
+            ),
+            fragment=core.Filename.from_os_specific(
+                find_resource(f"shaders/{name}.frag")
+            ),
+        )
+
+    @staticmethod
+    def _new_index_texture(name: str, indices):
+        texture = core.Texture(name)
+        texture.setup_2d_texture(
+            indices.shape[1],
+            indices.shape[0],
+            core.Texture.T_unsigned_byte,
+            core.Texture.F_luminance,
+        )
+        Manager._set_nearest_sampling(texture)
+        texture.set_ram_image(indices.tobytes())
+        return texture
+
+    @staticmethod
+    def _set_nearest_sampling(texture: core.Texture):
+        texture.set_minfilter(core.SamplerState.FT_nearest)
+        texture.set_magfilter(core.SamplerState.FT_nearest)
 
     def get_animation_data(self, picnum: int):
         animation_data = self._art_manager.get_tile_animation_data(picnum)
@@ -73,16 +336,100 @@ class Manager:
             )
 
     def get_tile_async(
-        self, picnum: int, lookup: int, callback: typing.Callable[[core.Texture], None]
+        self,
+        picnum: int,
+        lookup: int,
+        callback: typing.Callable[[core.Texture], None],
+        priority=0,
     ):
-        self._tile_loads.put((picnum, lookup, callback))
+        with self._variant_lock:
+            key = self._variant_keys.get((picnum, lookup))
+        if key is not None and key in self._tiles:
+            self._decoded_tiles.put(_DecodedTile(picnum, lookup, key, None, callback))
+            return
+
+        request = _TileRequest(
+            priority, next(self._request_sequence), picnum, lookup, callback
+        )
+        with self._tile_request_lock:
+            heapq.heappush(self._tile_requests, request)
+        self._decode_executor.submit(self._decode_next_tile)
+
+    def reprioritise_tiles(self, priorities: typing.Dict[typing.Tuple[int, int], int]):
+        """
+        Move tiles that are still waiting to be decoded to a new priority,
+        priorities are keyed by (picnum, lookup).
+        """
+        with self._tile_request_lock:
+            self._tile_requests = [
+                request._replace(
+                    priority=priorities.get(
+                        (request.picnum, request.lookup), request.priority
+                    )
+                )
+                for request in self._tile_requests
+            ]
+            heapq.heapify(self._tile_requests)
+
+    def prefetch_tile(self, picnum: int, lookup: int, priority=0):
+        if self.indexed_textures or not self._art_manager.has_tile(picnum):
+            return False
+
+        request = (picnum, lookup)
+        if request in self._prefetching:
+            return False
+
+        with self._variant_lock:
+            key = self._variant_keys.get(request)
+        if key is not None and key in self._tiles:
+            return False
+
+        self._prefetching.add(request)
+        self.get_tile_async(
+            picnum, lookup, lambda _: self._prefetching.discard(request), priority
+        )
+        return True
+
+    def _decode_next_tile(self):
+        with self._tile_request_lock:
+            if not self._tile_requests:
+                return
+            request = heapq.heappop(self._tile_requests)
+
+        try:
+            key = self._variant_key(request.picnum, request.lookup)
+            image = self._art_manager.load_tile_image(request.picnum, request.lookup)
+        except Exception:
+            # The main thread retries the tile and falls back to an error
+            # texture, so callbacks are always called.
+            logger.exception(f"Unable to decode tile {request.picnum}")
+            key = None
+            image = None
+
+        self._decoded_tiles.put(
+            _DecodedTile(request.picnum, request.lookup, key, image, request.callback)
+        )
 
     def _process_loading_tiles(self):
         with self._edit_mode_selector.track_performance_stats("process_loading_tiles"):
             now = time.time()
             while (time.time() - now) < constants.TICK_RATE / 2:
-                if self._tile_loads.empty():
+                if self._decoded_tiles.empty():
                     break
 
-                tile_to_load, lookup, callback = self._tile_loads.get_nowait()
-                callback(self.get_tile(tile_to_load, lookup))
+                decoded = self._decoded_tiles.get_nowait()
+                decoded.callback(self._decoded_tile_texture(decoded))
+
+    def _decoded_tile_texture(self, decoded: _DecodedTile):
+        if decoded.key is not None:
+            tile = self._tiles.get(decoded.key)
+            if tile is not None:
+                return tile
+            if decoded.image is not None:
+                return self._new_tile_texture(decoded.key, decoded.image)
+
+        try:
+            return self.get_tile(decoded.picnum, decoded.lookup)
+        except Exception:
+            logger.exception(f"Unable to load tile {decoded.picnum}")
+            return self._get_error_texture()
@@ -0,0 +1,85 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import typing
+from collections import OrderedDict
+
+from panda3d import core
+
+
+class CacheStats(typing.NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    resident_bytes: int
+    capacity: int
+
+
+class TextureCache:
+    def __init__(self, capacity: int):
+        self._capacity = capacity
+        self._textures: "OrderedDict[typing.Hashable, core.Texture]" = OrderedDict()
+        self._sizes: typing.Dict[typing.Hashable, int] = {}
+        self._resident_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self):
+        return len(self._textures)
+
+    def __contains__(self, key: typing.Hashable):
+        return key in self._textures
+
+    @property
+    def stats(self):
+        return CacheStats(
+            self._hits,
+            self._misses,
+            self._evictions,
+            self._resident_bytes,
+            self._capacity,
+        )
+
+    def get(self, key: typing.Hashable) -> typing.Optional[core.Texture]:
+        texture = self._textures.get(key)
+        if texture is None:
+            self._misses += 1
+            return None
+
+        self._textures.move_to_end(key)
+        self._hits += 1
+        return texture
+
+    def add(self, key: typing.Hashable, texture: core.Texture):
+        self.remove(key)
+
+        size = texture.get_expected_ram_image_size()
+        self._textures[key] = texture
+        self._sizes[key] = size
+        self._resident_bytes += size
+        self._evict()
+
+    def remove(self, key: typing.Hashable):
+        texture = self._textures.pop(key, None)
+        if texture is not None:
+            self._resident_bytes -= self._sizes.pop(key)
+
+    def _evict(self):
+        if self._resident_bytes <= self._capacity:
+            return
+
+        for key in list(self._textures.keys()):
+            if self._is_pinned(self._textures[key]):
+                continue
+
+            self.remove(key)
+            self._evictions += 1
+            if self._resident_bytes <= self._capacity:
+                break
+
+    @staticmethod
+    def _is_pinned(texture: core.Texture):
+        # The cache itself holds one reference, anything beyond that is
+        # geometry (or a GUI card) that is still drawing with the texture.
+        return texture.get_ref_count() > 1
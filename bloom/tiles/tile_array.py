@@ -0,0 +1,100 @@
+# Copyright 2020 Thomas Rogers
+# SPDX-License-Identifier: Apache-2.0
+
+import math
+import typing
+
+import numpy
+from panda3d import core
+
+
+def bucket_size(width: int, height: int) -> typing.Tuple[int, int]:
+    """
+    The size of the array layer a tile is stored in.
+
+    Tiles share square power of two layers as long as they fill at least a
+    quarter of them, very thin tiles keep their own power of two width and
+    height.
+    """
+    side = _next_power_of_two(max(width, height))
+    if width * height * 4 >= side * side:
+        return side, side
+    return _next_power_of_two(width), _next_power_of_two(height)
+
+
+def _next_power_of_two(value: int):
+    return 1 << max(math.ceil(math.log2(value)), 0)
+
+
+class TileArray:
+    _INITIAL_CAPACITY = 16
+
+    def __init__(self, width: int, height: int):
+        self._width = width
+        self._height = height
+        self._layers: typing.Dict[typing.Hashable, int] = {}
+
+        self._texture = core.Texture(f"tiles_{width}x{height}")
+        self._capacity = 0
+        self._resize(self._INITIAL_CAPACITY)
+
+    @property
+    def texture(self):
+        return self._texture
+
+    @property
+    def layer_count(self):
+        return len(self._layers)
+
+    def get_layer(
+        self, key: typing.Hashable, load_image: typing.Callable[[], numpy.ndarray]
+    ) -> int:
+        layer = self._layers.get(key)
+        if layer is not None:
+            return layer
+
+        layer = len(self._layers)
+        if layer >= self._capacity:
+            self._resize(self._capacity * 2)
+
+        page_size = self._texture.get_expected_ram_page_size()
+        pages = memoryview(self._texture.modify_ram_image())
+        pages[layer * page_size : (layer + 1) * page_size] = numpy.ascontiguousarray(
+            self._fill_layer(load_image())
+        ).reshape(-1)
+        self._layers[key] = layer
+
+        return layer
+
+    def _fill_layer(self, image: numpy.ndarray):
+        # Smaller tiles are repeated across the whole layer, so filtering at
+        # the edge of the tile blends with its wrapped neighbour.
+        height, width = image.shape[:2]
+        if (width, height) == (self._width, self._height):
+            return image
+
+        repeats = (
+            math.ceil(self._height / height),
+            math.ceil(self._width / width),
+            1,
+        )
+        return numpy.tile(image, repeats)[: self._height, : self._width]
+
+    def _resize(self, capacity: int):
+        old_pages = None
+        if self._capacity > 0:
+            old_pages = bytes(self._texture.get_ram_image())
+
+        # Resizing in place keeps every node already bound to this texture
+        # valid, they pick up the new pages on the next upload.
+        self._texture.setup_2d_texture_array(
+            self._width,
+            self._height,
+            capacity,
+            core.Texture.T_unsigned_byte,
+            core.Texture.F_rgba8,
+        )
+        self._texture.make_ram_image()
+        if old_pages is not None:
+            memoryview(self._texture.modify_ram_image())[: len(old_pages)] = old_pages
+        self._capacity = capacity